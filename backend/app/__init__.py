@@ -1,11 +1,15 @@
 from flask import Flask, send_from_directory, jsonify
 from flask_cors import CORS # type: ignore
-from flask_session import Session # type: ignore
 from flask_socketio import SocketIO # type: ignore
 from flask_migrate import Migrate # type: ignore
 from datetime import timedelta
 from config import config
-from app.extensions import db, migrate, jwt
+from app.extensions import db, migrate, jwt, init_db
+from app.utils.chat_writer import chat_writer
+from app.utils.session import init_session
+from app.utils.json_provider import FastJSONProvider
+from app.utils.compression import init_compression
+from app.utils.distances import init_distances
 from dotenv import load_dotenv
 import os 
 
@@ -15,23 +19,18 @@ socketio = SocketIO(cors_allowed_origins="*")
 def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.json = FastJSONProvider(app)  # jsonify 以 orjson 編碼，直接支援 datetime 與 Decimal
     
-    # Session 配置
+    # Session 配置（後端由 SESSION_BACKEND 決定）
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'your-secret-key-here'  # 添加預設值
-    app.config['SESSION_TYPE'] = 'filesystem'
     app.config['SESSION_PERMANENT'] = True
-    app.config['SESSION_USE_SIGNER'] = True
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
-    app.config['SESSION_FILE_DIR'] = os.path.join(os.path.dirname(app.instance_path), 'flask_session')
     
     # 確保 Cookie 設置正確
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['SESSION_COOKIE_SECURE'] = False  # 開發環境設為 False，生產環境設為 True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
     
-    # 初始化 Session
-    Session(app)  
-    
     # 初始化 CORS
     CORS(app, 
         supports_credentials=True, 
@@ -55,10 +54,14 @@ def create_app(config_name='default'):
         })
     
     # 初始化其他擴展
-    db.init_app(app)
+    init_db(app)  # SQLite 檔案資料庫會套用 WAL 等連線設定
     migrate.init_app(app, db)
     jwt.init_app(app)  # 即使不使用 JWT，保留此行也沒有害處
+    init_session(app)  # Session 後端可能使用資料庫，需在 db 初始化之後
+    init_compression(app)  # 依 Accept-Encoding 壓縮 JSON 回應
+    init_distances(app)  # 房源到各地點的距離與 recompute-distances 指令
     socketio.init_app(app)
+    chat_writer.init_app(app, socketio)
     
     # 註冊藍圖
     from app.api import api_bp, comments_bp
@@ -1,22 +1,38 @@
 import os
 import datetime
+import numpy as np
 from flask import request, jsonify, current_app, session
+from sqlalchemy import and_, or_ # type: ignore
 from werkzeug.utils import secure_filename
 from app.api import api_bp
-from app.models.accommodation import Accommodation, AccommodationImage, Favorite
-from functools import wraps
-from app.models.user import User
+from app.models.accommodation import Accommodation, AccommodationImage, AccommodationDistance, Favorite
+from app.schemas.accommodation import (
+    serialize_accommodations, render_accommodations_json, splice_json,
+    load_images, primary_image_url
+)
 from app.extensions import db
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.auth import login_required, current_user
+from app.utils.compression import cache_compressed
+from app.utils.search import get_search_index
+from app.utils.facets import get_facet_index, FACETS
+from app.utils.geo import covering_cells, prefix_ranges, bbox_around, haversine, cluster_points
+from app.utils.distances import points_of_interest
+from app.utils.http_cache import (
+    make_etag, not_modified, with_etag, PUBLIC_REVALIDATE, PRIVATE_REVALIDATE, PRIVATE_NO_STORE
+)
 
-# 用戶身份驗證裝飾器
-def login_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({"message": "請先登入"}), 401
-        
-        return f(*args, **kwargs)
-    return decorated
+# 游標分頁的排序方式：(排序欄位, 主鍵)
+ACCOMMODATION_KEYSET_ORDERS = {
+    'price_low': [(Accommodation.rent_price, 'asc'), (Accommodation.accommodation_id, 'asc')],
+    'price_high': [(Accommodation.rent_price, 'desc'), (Accommodation.accommodation_id, 'desc')],
+    'distance': [(Accommodation.distance_to_university, 'asc'), (Accommodation.accommodation_id, 'asc')],
+    'newest': [(Accommodation.created_at, 'desc'), (Accommodation.accommodation_id, 'desc')],
+}
+
+def listing_page_etag(accommodations, fields):
+    """列表頁的 ETag：由分頁資訊與各房源的 version、updated_at 計算"""
+    return make_etag(fields, [(acc.accommodation_id, acc.version, acc.updated_at) for acc in accommodations])
 
 def allowed_file(filename):
     """檢查檔案是否為允許的類型"""
@@ -31,10 +47,33 @@ def get_accommodations():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 100, type=int)
         sort_by = request.args.get('sort_by', 'newest')
+        cursor = request.args.get('cursor')
         
         # 準備查詢
         query = Accommodation.query.filter_by(status='available')
         
+        # 游標分頁模式（?cursor=，第一頁傳空字串）
+        if cursor is not None:
+            include_total = request.args.get('include_total', 'false').lower() == 'true'
+            try:
+                result = keyset_paginate(
+                    query, ACCOMMODATION_KEYSET_ORDERS.get(sort_by, ACCOMMODATION_KEYSET_ORDERS['newest']),
+                    cursor=cursor, per_page=per_page, with_total=include_total
+                )
+            except InvalidCursor as e:
+                return jsonify({"success": False, "message": str(e)}), 400
+            
+            fields = {"success": True, "next_cursor": result.next_cursor, "has_next": result.has_next}
+            if include_total:
+                fields["total"] = result.total
+            etag = listing_page_etag(result.items, fields)
+            cached = not_modified(etag, PUBLIC_REVALIDATE)
+            if cached is not None:
+                return cached
+            body = splice_json("items", render_accommodations_json(result.items), **fields)
+            response = current_app.response_class(body, status=200, mimetype='application/json')
+            return cache_compressed(with_etag(response, etag, PUBLIC_REVALIDATE))
+        
         # 應用排序
         if sort_by == 'price_low':
             query = query.order_by(Accommodation.rent_price.asc())
@@ -42,6 +81,12 @@ def get_accommodations():
             query = query.order_by(Accommodation.rent_price.desc())
         elif sort_by == 'distance':
             query = query.order_by(Accommodation.distance_to_university.asc())
+        elif sort_by.startswith('distance_') and sort_by[len('distance_'):] in points_of_interest():
+            # 依到指定地點的距離排序，例如 sort_by=distance_library
+            query = query.join(AccommodationDistance, and_(
+                AccommodationDistance.accommodation_id == Accommodation.accommodation_id,
+                AccommodationDistance.poi == sort_by[len('distance_'):]
+            )).order_by(AccommodationDistance.distance.asc(), AccommodationDistance.accommodation_id.asc())
         else:  # newest
             query = query.order_by(Accommodation.created_at.desc())
         
@@ -49,79 +94,20 @@ def get_accommodations():
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         accommodations = pagination.items
         
-        # 格式化結果
-        result = []
-        for acc in accommodations:
-            # 獲取房源圖片
-            images = AccommodationImage.query.filter_by(accommodation_id=acc.accommodation_id).all()
-            image_urls = [{"id": img.image_id, "url": img.image_url, "is_primary": img.is_primary} for img in images]
-            
-            # 獲取設備
-            amenities = []
-            for amenity in acc.amenities:
-                amenities.append({
-                    "id": amenity.amenity_id,
-                    "name": amenity.name,
-                    "category": amenity.category
-                })
-                
-            room_info = {
-                "studio": {
-                    "total": acc.studio_count or 0,
-                    "available": acc.studio_available or 0,
-                    "area": float(acc.studio_area) if acc.studio_area else (float(acc.area) if acc.area else None)
-                },
-                "single": {
-                    "total": acc.single_count or 0,
-                    "available": acc.single_available or 0,
-                    "area": float(acc.single_area) if acc.single_area else (float(acc.area) if acc.area else None)
-                }
-            }
-            
-            # 房源基本信息
-            acc_data = {
-                "accommodation_id": acc.accommodation_id,
-                "owner_id": acc.owner_id,
-                "title": acc.title,
-                "description": acc.description,
-                "property_type": acc.property_type,
-                "rent_price": float(acc.rent_price),
-                "deposit": float(acc.deposit) if acc.deposit else None,
-                "address": acc.address,
-                "district": acc.district,
-                "city": acc.city,
-                "room_count": acc.room_count,
-                "bathroom_count": acc.bathroom_count,
-                "studio_count": acc.studio_count,
-                "studio_available": acc.studio_available,
-                "single_count": acc.single_count,
-                "single_available": acc.single_available,
-                "contact_info": acc.contact_info,
-                "area": float(acc.area) if acc.area else None,
-                "studio_area": float(acc.studio_area) if acc.studio_area else None,
-                "single_area": float(acc.single_area) if acc.single_area else None,
-                "distance_to_university": acc.distance_to_university,
-                "images": image_urls,
-                "amenities": amenities,
-                "room_info": room_info,
-                "is_furnished": acc.is_furnished,
-                "has_water_bill": acc.has_water_bill,
-                "has_electricity_bill": acc.has_electricity_bill,
-                "has_internet": acc.has_internet,
-                "created_at": acc.created_at.isoformat(),
-                "updated_at": acc.updated_at.isoformat() if acc.updated_at else None
-            }
-            
-            result.append(acc_data)
+        # 頁面內容未變更時直接回傳 304，不做序列化
+        fields = {"success": True, "total": pagination.total, "pages": pagination.pages, "page": pagination.page}
+        etag = listing_page_etag(accommodations, fields)
+        cached = not_modified(etag, PUBLIC_REVALIDATE)
+        if cached is not None:
+            return cached
         
-        # 返回結果
-        return jsonify({
-            "success": True,
-            "items": result,
-            "total": pagination.total,
-            "pages": pagination.pages,
-            "page": pagination.page
-        }), 200
+        # 格式化結果：重用快取中已編碼的房源片段，只對未命中的房源批次載入圖片與設備
+        fragments = render_accommodations_json(accommodations)
+        body = splice_json("items", fragments, **fields)
+        
+        # 返回結果（內容相同的頁面重用已壓縮的結果）
+        response = current_app.response_class(body, status=200, mimetype='application/json')
+        return cache_compressed(with_etag(response, etag, PUBLIC_REVALIDATE))
         
     except Exception as e:
         current_app.logger.error(f"獲取房源列表時出錯: {str(e)}")
@@ -130,12 +116,176 @@ def get_accommodations():
             "message": "獲取房源列表時發生錯誤"
         }), 500
 
+@api_bp.route('/accommodations/search', methods=['GET'])
+def search_accommodations():
+    """以關鍵字搜尋可用的房源（標題、描述、地址、行政區），依相關度排序"""
+    keyword = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    if not keyword:
+        return jsonify({"success": False, "message": "請輸入搜尋關鍵字"}), 400
+    
+    try:
+        total, ids = get_search_index().search(keyword, offset=(page - 1) * per_page, limit=per_page)
+        
+        # 依搜尋結果的順序排列房源
+        rows = {acc.accommodation_id: acc for acc in Accommodation.query.filter(
+            Accommodation.accommodation_id.in_(ids), Accommodation.status == 'available'
+        ).all()} if ids else {}
+        accommodations = [rows[i] for i in ids if i in rows]
+        
+        body = splice_json(
+            "items", render_accommodations_json(accommodations),
+            success=True,
+            total=total,
+            pages=(total + per_page - 1) // per_page,
+            page=page
+        )
+        return cache_compressed(current_app.response_class(body, status=200, mimetype='application/json'))
+        
+    except Exception as e:
+        current_app.logger.error(f"搜尋房源時出錯: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "搜尋房源時發生錯誤"
+        }), 500
+
+def _multi_arg(name):
+    """可重複或以逗號分隔的查詢參數，例如 ?district=中壢區,平鎮區"""
+    return [value for raw in request.args.getlist(name) for value in raw.split(',') if value]
+
+@api_bp.route('/accommodations/filter', methods=['GET'])
+def filter_accommodations():
+    """依條件篩選可用的房源，並回傳各篩選值在目前條件下的筆數"""
+    try:
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+        sort_by = request.args.get('sort_by', 'newest')
+        selected = {facet: _multi_arg(facet) for facet in FACETS}
+        
+        total, ids, facets = get_facet_index().query(
+            selected,
+            min_price=request.args.get('min_price', type=float),
+            max_price=request.args.get('max_price', type=float),
+            sort_by=sort_by,
+            offset=(page - 1) * per_page,
+            limit=per_page
+        )
+        
+        rows = {acc.accommodation_id: acc for acc in Accommodation.query.filter(
+            Accommodation.accommodation_id.in_(ids)
+        ).all()} if ids else {}
+        accommodations = [rows[i] for i in ids if i in rows]
+        
+        body = splice_json(
+            "items", render_accommodations_json(accommodations),
+            success=True,
+            total=total,
+            pages=(total + per_page - 1) // per_page,
+            page=page,
+            facets=facets
+        )
+        return cache_compressed(current_app.response_class(body, status=200, mimetype='application/json'))
+        
+    except Exception as e:
+        current_app.logger.error(f"篩選房源時出錯: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "篩選房源時發生錯誤"
+        }), 500
+
+def _geo_candidates(south, west, north, east):
+    """以 geohash 前綴區間取出範圍內的房源（id, 標題, 租金, 緯度, 經度）"""
+    # 每個區間各自帶上狀態條件，SQLite 才能對每個區間使用 (status, geohash) 索引
+    ranges = [
+        and_(Accommodation.status == 'available', Accommodation.geohash >= low, Accommodation.geohash < high)
+        for low, high in prefix_ranges(covering_cells(south, west, north, east))
+    ]
+    return db.session.query(
+        Accommodation.accommodation_id, Accommodation.title, Accommodation.rent_price,
+        Accommodation.latitude, Accommodation.longitude
+    ).filter(or_(*ranges)).all()
+
+@api_bp.route('/accommodations/geo', methods=['GET'])
+def geo_accommodations():
+    """
+    地圖查詢：bbox=south,west,north,east 範圍內，或 radius（公尺）內距離中心（預設中央大學）的房源
+    
+    指定 zoom 時以網格分群，只回傳群組與單獨的房源標記
+    """
+    radius = request.args.get('radius', type=float)
+    zoom = request.args.get('zoom', type=int)
+    limit = min(max(request.args.get('limit', 200, type=int), 1), 1000)
+    
+    if radius is not None:
+        if not 0 < radius <= current_app.config['GEO_MAX_RADIUS']:
+            return jsonify({"success": False, "message": f"radius 需介於 0 與 {current_app.config['GEO_MAX_RADIUS']} 公尺之間"}), 400
+        campus_lat, campus_lng = current_app.config['CAMPUS_LOCATION']
+        center = (request.args.get('lat', campus_lat, type=float), request.args.get('lng', campus_lng, type=float))
+        bbox = bbox_around(*center, radius)
+    else:
+        try:
+            bbox = tuple(float(value) for value in request.args.get('bbox', '').split(','))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            return jsonify({"success": False, "message": "請提供 bbox=south,west,north,east 或 radius"}), 400
+    
+    try:
+        rows = _geo_candidates(*bbox)
+        south, west, north, east = bbox
+        lat = np.array([float(row.latitude) for row in rows], dtype=np.float64)
+        lng = np.array([float(row.longitude) for row in rows], dtype=np.float64)
+        mask = (lat >= south) & (lat <= north) & (lng >= west) & (lng <= east)
+        distance = None
+        if radius is not None:
+            distance = haversine(lat, lng, *center)
+            mask &= distance <= radius
+        
+        selected = np.flatnonzero(mask)
+        if distance is not None:
+            selected = selected[np.argsort(distance[selected], kind='stable')]
+        
+        def marker(i):
+            row = rows[i]
+            item = {
+                "id": row.accommodation_id,
+                "title": row.title,
+                "rent_price": float(row.rent_price),
+                "latitude": lat[i],
+                "longitude": lng[i],
+            }
+            if distance is not None:
+                item["distance"] = round(float(distance[i]), 1)
+            return item
+        
+        result = {"success": True, "total": len(selected)}
+        markers = selected
+        if zoom is not None:
+            # 同一格中只有一間房源時直接回傳標記，其餘回傳群組中心與數量
+            groups, counts, center_lat, center_lng = cluster_points(lat[selected], lng[selected], zoom)
+            result["clusters"] = [
+                {"latitude": center_lat[g], "longitude": center_lng[g], "count": int(counts[g])}
+                for g in np.flatnonzero(counts > 1)
+            ]
+            markers = selected[counts[groups] == 1]
+        result["items"] = [marker(i) for i in markers[:limit]]
+        result["truncated"] = len(markers) > limit
+        return jsonify(result), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"地圖查詢房源時出錯: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": "地圖查詢房源時發生錯誤"
+        }), 500
+
 @api_bp.route('/accommodations', methods=['POST'])
 @login_required
 def create_accommodation():
     """新增房源"""
     user_id = session.get('user_id')
-    user = User.query.get(user_id)
+    user = current_user()
     
     if not user or user.user_role not in ['landlord', 'admin']:
         return jsonify({'message': '只有房東或管理員可以新增房源'}), 403
@@ -214,82 +364,32 @@ def get_accommodation_detail(id):
         except:
             return jsonify({'message': '此房源不可用'}), 404
     
-    # 獲取所有圖片
-    images = [
-        {'id': img.image_id, 'url': img.image_url, 'is_primary': img.is_primary}
-        for img in acc.images
-    ]
-    
-    # 獲取設施
-    amenities = [
-        {'id': a.amenity_id, 'name': a.name, 'category': a.category}
-        for a in acc.amenities
-    ]
-    
-    # 格式化結果
-    result = {
+    # 內容未變更時直接回傳 304（擁有者查看非公開房源時不允許共用快取）
+    owner = acc.owner
+    cache_control = PUBLIC_REVALIDATE if acc.status == 'available' else PRIVATE_REVALIDATE
+    etag = make_etag(acc.accommodation_id, acc.version, acc.updated_at, owner.user_id, owner.updated_at)
+    cached = not_modified(etag, cache_control)
+    if cached is not None:
+        return cached
+    
+    # 格式化結果（與列表共用序列化及快取）
+    result = serialize_accommodations([acc])[0]
+    result.update({
         'id': acc.accommodation_id,
-        'title': acc.title,
-        'description': acc.description,
-        'property_type': acc.property_type,
-        'room_count': acc.room_count,
-        'bathroom_count': acc.bathroom_count,
-        'studio_count': acc.studio_count,
-        'studio_available': acc.studio_available,
-        'single_count': acc.single_count,
-        'single_available': acc.single_available,
-        'contact_info': acc.contact_info,
         'area': acc.area,
-        'studio_area': float(acc.studio_area) if acc.studio_area else None,
-        'single_area': float(acc.single_area) if acc.single_area else None,
-        'rent_price': float(acc.rent_price),
-        'deposit': float(acc.deposit) if acc.deposit else None,
-        'is_furnished': acc.is_furnished,
-        'has_water_bill': acc.has_water_bill,
-        'has_electricity_bill': acc.has_electricity_bill,
-        'has_internet': acc.has_internet,
-        'address': acc.address,
-        'city': acc.city,
-        'district': acc.district,
         'latitude': float(acc.latitude) if acc.latitude else None,
         'longitude': float(acc.longitude) if acc.longitude else None,
-        'distance_to_university': acc.distance_to_university,
         'available_from': acc.available_from.isoformat() if acc.available_from else None,
-        'images': images,
-        'amenities': amenities,
-        'room_info': {
-            'studio': {
-                'total': acc.studio_count or 0,
-                'available': acc.studio_available or 0,
-                'area': float(acc.studio_area) if acc.studio_area else (float(acc.area) if acc.area else None)
-            },
-            'single': {
-                'total': acc.single_count or 0,
-                'available': acc.single_available or 0,
-                'area': float(acc.single_area) if acc.single_area else (float(acc.area) if acc.area else None)
-            }
-        },
         'owner': {
             'id': acc.owner.user_id,
-            'name': f"{acc.owner.first_name} {acc.owner.last_name}" if acc.owner.first_name and acc.owner.last_name else acc.owner.username,
+            'name': f"{acc.owner.first_name} {acc.owner.last_name}" if getattr(acc.owner, 'first_name', None) and getattr(acc.owner, 'last_name', None) else acc.owner.username,
             'is_verified': acc.owner.is_verified
         },
-        'created_at': acc.created_at.isoformat(),
-        'updated_at': acc.updated_at.isoformat(),
         'last_verified': acc.last_verified.isoformat() if acc.last_verified else None
-    }
-    
-    # 如果已登入，檢查是否已收藏
-    try:
-        user_id = session.get('user_id')
-        is_favorited = Favorite.query.filter_by(
-            user_id=user_id, accommodation_id=id
-        ).first() is not None
-        result['is_favorited'] = is_favorited
-    except:
-        result['is_favorited'] = False
+    })
     
-    return jsonify(result), 200
+    # 收藏狀態因用戶而異，改由 /accommodations/favorites/status/<id> 取得，詳情內容可共用快取
+    return with_etag(jsonify(result), etag, cache_control), 200
 
 @api_bp.route('/accommodations/favorites', methods=['GET'])
 @login_required
@@ -300,15 +400,14 @@ def get_favorites():
         Accommodation, Favorite.accommodation_id == Accommodation.accommodation_id
     ).filter(Favorite.user_id == user_id).all()
     
+    # 一次載入所有收藏房源的圖片
+    images_map = load_images([accommodation.accommodation_id for _, accommodation in favorites])
+    
     # 格式化結果
     result = []
     for favorite, accommodation in favorites:
         # 獲取主要圖片
-        primary_image = AccommodationImage.query.filter_by(
-            accommodation_id=accommodation.accommodation_id, is_primary=True
-        ).first()
-        
-        image_url = primary_image.image_url if primary_image else None
+        image_url = primary_image_url(images_map.get(accommodation.accommodation_id, []))
         
         result.append({
             'id': accommodation.accommodation_id,
@@ -452,7 +551,9 @@ def check_favorite_status(accommodation_id):
         user_id=user_id, accommodation_id=accommodation_id
     ).first()
     
-    return jsonify({
+    response = jsonify({
         'success': True,
         'is_favorited': existing is not None
-    }), 200
\ No newline at end of file
+    })
+    response.headers['Cache-Control'] = PRIVATE_NO_STORE
+    return response, 200
\ No newline at end of file
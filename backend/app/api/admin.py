@@ -9,47 +9,15 @@ from app.models.sublet import Sublet
 from app.models.lease import Lease
 from app.models.comments import Comment, Reply, Report, CommentLike
 from app.extensions import db
-from sqlalchemy import inspect, text # type: ignore
+from sqlalchemy import inspect, text, select, Table, MetaData # type: ignore
 from sqlalchemy.sql import func # type: ignore
-from functools import wraps
+from sqlalchemy.orm import selectinload # type: ignore
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.auth import admin_required
 import datetime
 from datetime import timedelta
 import traceback
 
-# 管理員身份驗證裝飾器
-def admin_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({"message": "請先登入"}), 401
-        
-        # 獲取用戶
-        user_id = session.get('user_id')
-        user = User.query.get(user_id)
-        
-        if not user or not user.is_admin():
-            return jsonify({"message": "需要管理員權限"}), 403
-        
-        return f(*args, **kwargs)
-    return decorated
-
-# 超級管理員身份驗證裝飾器
-def superuser_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({"message": "請先登入"}), 401
-        
-        # 獲取用戶
-        user_id = session.get('user_id')
-        user = User.query.get(user_id)
-        
-        if not user or not user.is_superuser():
-            return jsonify({"message": "需要超級管理員權限"}), 403
-        
-        return f(*args, **kwargs)
-    return decorated
-
 # 獲取所有資料表名稱
 @api_bp.route('/admin/tables', methods=['GET'])
 @admin_required
@@ -88,6 +56,34 @@ def get_table_structure(table_name):
         "columns": column_info
     }), 200
 
+# 後台評論表格顯示的欄位
+COMMENT_TABLE_COLUMNS = [
+    {'key': 'id', 'label': 'ID'},
+    {'key': 'property_title', 'label': '住所名稱'},
+    {'key': 'user_name', 'label': '用戶名稱'},
+    {'key': 'content', 'label': '評論內容'},
+    {'key': 'rating', 'label': '評分'},
+    {'key': 'created_at', 'label': '創建時間'},
+    {'key': 'updated_at', 'label': '更新時間'}
+]
+
+def _serialize_row(row):
+    """將查詢結果的一列轉為適合 JSON 的字典（日期轉為 ISO 格式）"""
+    processed_row = {}
+    for key, value in row._mapping.items():
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            processed_row[key] = value.isoformat()
+        else:
+            processed_row[key] = value
+    return processed_row
+
+def _comment_table_row(comment, user_name, property_title):
+    comment_dict = comment.to_dict()
+    # 添加關聯數據
+    comment_dict['user_name'] = user_name
+    comment_dict['property_title'] = property_title
+    return comment_dict
+
 # 獲取表數據 (分頁)
 @api_bp.route('/admin/tables/<table_name>/data', methods=['GET'])
 @admin_required
@@ -100,6 +96,10 @@ def get_table_data(table_name):
     per_page = min(request.args.get('per_page', 20, type=int), 100)
     sort_by = request.args.get('sort_by')
     sort_direction = request.args.get('sort_direction', 'asc')
+    direction = 'desc' if sort_direction == 'desc' else 'asc'
+    # 游標分頁模式（?cursor=，第一頁傳空字串），全部使用綁定參數
+    cursor = request.args.get('cursor')
+    include_total = request.args.get('include_total', 'false').lower() == 'true'
 
     # 處理評論
     if table_name == 'comments':
@@ -114,67 +114,90 @@ def get_table_data(table_name):
             Accommodation, Comment.property_id == Accommodation.accommodation_id
         )
         
+        if cursor is not None:
+            # 依 (建立時間, ID) 由新到舊；附帶這兩個欄位讓游標可由每列取得
+            try:
+                page_result = keyset_paginate(
+                    query.add_columns(Comment.created_at, Comment.id),
+                    [(Comment.created_at, 'desc'), (Comment.id, 'desc')],
+                    cursor=cursor, per_page=per_page, with_total=include_total
+                )
+            except InvalidCursor as e:
+                return jsonify({"message": str(e)}), 400
+            
+            result = {
+                'success': True,
+                'data': [_comment_table_row(*row[:3]) for row in page_result.items],
+                'per_page': per_page,
+                'next_cursor': page_result.next_cursor,
+                'has_next': page_result.has_next,
+                'columns': COMMENT_TABLE_COLUMNS
+            }
+            if include_total:
+                result['total'] = page_result.total
+            return jsonify(result)
+        
         # 執行分頁查詢
         pagination = query.paginate(page=page, per_page=per_page)
         
-        # 轉換結果為字典列表
-        results = []
-        for comment, user_name, property_title in pagination.items:
-            comment_dict = comment.to_dict()
-            # 添加關聯數據
-            comment_dict['user_name'] = user_name
-            comment_dict['property_title'] = property_title
-            results.append(comment_dict)
-            
         # 返回結果
         return jsonify({
             'success': True,
-            'data': results,
+            'data': [_comment_table_row(*row) for row in pagination.items],
             'total': pagination.total,
             'pages': pagination.pages,
             'current_page': page,
-            'columns': [
-                {'key': 'id', 'label': 'ID'},
-                {'key': 'property_title', 'label': '住所名稱'},
-                {'key': 'user_name', 'label': '用戶名稱'},
-                {'key': 'content', 'label': '評論內容'},
-                {'key': 'rating', 'label': '評分'},
-                {'key': 'created_at', 'label': '創建時間'},
-                {'key': 'updated_at', 'label': '更新時間'}
-            ]
+            'columns': COMMENT_TABLE_COLUMNS
         })
     
-    # 構建查詢
-    query = f"SELECT * FROM {table_name}"
+    # 以反射取得的資料表建立查詢，排序欄位必須是資料表中的欄位
+    table = Table(table_name, MetaData(), autoload_with=db.engine)
+    if sort_by and sort_by not in table.columns:
+        return jsonify({"message": "無效的排序欄位"}), 400
+    
+    # 游標分頁：以 (排序欄位, 主鍵) 定位
+    if cursor is not None:
+        pk_columns = list(table.primary_key.columns)
+        if len(pk_columns) != 1:
+            return jsonify({"message": "游標分頁僅支援單一主鍵的資料表"}), 400
+        
+        order = [(pk_columns[0], direction)]
+        if sort_by and sort_by != pk_columns[0].name:
+            order.insert(0, (table.columns[sort_by], direction))
+        
+        try:
+            page_result = keyset_paginate(
+                db.session.query(table), order,
+                cursor=cursor, per_page=per_page, with_total=include_total
+            )
+        except InvalidCursor as e:
+            return jsonify({"message": str(e)}), 400
+        
+        result = {
+            "success": True,
+            "data": [_serialize_row(row) for row in page_result.items],
+            "per_page": per_page,
+            "next_cursor": page_result.next_cursor,
+            "has_next": page_result.has_next
+        }
+        if include_total:
+            result["total"] = page_result.total
+        return jsonify(result), 200
     
-    # 添加排序
+    # 構建查詢（頁碼分頁）
+    query = select(table)
     if sort_by:
-        query += f" ORDER BY {sort_by} {sort_direction}"
-    
-    # 添加分頁
-    query += f" LIMIT {per_page} OFFSET {(page-1)*per_page}"
-    
-    # 執行查詢
-    result = db.session.execute(text(query)).fetchall()
+        column = table.columns[sort_by]
+        query = query.order_by(column.desc() if direction == 'desc' else column.asc())
+    query = query.limit(per_page).offset(max(page - 1, 0) * per_page)
     
-    # 獲取總行數
-    count_query = f"SELECT COUNT(*) AS count FROM {table_name}"
-    total = db.session.execute(text(count_query)).scalar()
-    
-    # 處理數據（將日期等轉換為適合 JSON 的格式）
-    rows = []
-    for row in result:
-        processed_row = {}
-        for key, value in row._mapping.items():
-            if isinstance(value, (datetime.date, datetime.datetime)):
-                processed_row[key] = value.isoformat()
-            else:
-                processed_row[key] = value
-        rows.append(processed_row)
+    # 執行查詢並獲取總行數
+    result = db.session.execute(query).fetchall()
+    total = db.session.execute(select(func.count()).select_from(table)).scalar()
     
     return jsonify({
         "success": True,
-        "data": rows,
+        "data": [_serialize_row(row) for row in result],
         "total": total,
         "page": page,
         "per_page": per_page,
@@ -362,6 +385,21 @@ def get_dashboard_data():
         }
     }), 200
     
+# 格式化用戶列表項目
+def format_admin_user(user):
+    return {
+        "user_id": user.user_id,
+        "username": user.username,
+        "email": user.email,
+        "user_role": user.user_role,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "last_login": user.last_login.isoformat() if user.last_login else None,
+        "is_active": user.is_active,
+        "is_verified": user.is_verified,
+        "portal_id": user.portal_id if hasattr(user, 'portal_id') else None,
+        "has_portal_id": bool(user.portal_id) if hasattr(user, 'portal_id') else False
+    }
+
 # 獲取用戶列表
 @api_bp.route('/admin/users', methods=['GET'])
 @admin_required
@@ -387,6 +425,30 @@ def get_users():
                 )
             )
         
+        # 游標分頁模式（?cursor=，第一頁傳空字串）
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            include_total = request.args.get('include_total', 'false').lower() == 'true'
+            sort_column = getattr(User, sort_by) if sort_by in User.__table__.columns else User.created_at
+            direction = 'desc' if sort_direction == 'desc' else 'asc'
+            try:
+                page_result = keyset_paginate(
+                    query, [(sort_column, direction), (User.user_id, direction)],
+                    cursor=cursor, per_page=per_page, with_total=include_total
+                )
+            except InvalidCursor as e:
+                return jsonify({"message": str(e)}), 400
+            
+            result = {
+                "success": True,
+                "items": [format_admin_user(user) for user in page_result.items],
+                "next_cursor": page_result.next_cursor,
+                "has_next": page_result.has_next
+            }
+            if include_total:
+                result["total"] = page_result.total
+            return jsonify(result)
+        
         # 添加排序
         if sort_direction == 'desc':
             query = query.order_by(db.desc(getattr(User, sort_by, User.created_at)))
@@ -397,20 +459,7 @@ def get_users():
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         
         # 格式化結果
-        users = []
-        for user in pagination.items:
-            users.append({
-                "user_id": user.user_id,
-                "username": user.username,
-                "email": user.email,
-                "user_role": user.user_role,
-                "created_at": user.created_at.isoformat() if user.created_at else None,
-                "last_login": user.last_login.isoformat() if user.last_login else None,
-                "is_active": user.is_active,
-                "is_verified": user.is_verified,
-                "portal_id": user.portal_id if hasattr(user, 'portal_id') else None,
-                "has_portal_id": bool(user.portal_id) if hasattr(user, 'portal_id') else False
-            })
+        users = [format_admin_user(user) for user in pagination.items]
         
         return jsonify({
             "success": True,
@@ -568,6 +617,28 @@ def get_all_reports():
     if status:
         query = query.filter_by(status=status)
     
+    # 游標分頁模式（?cursor=，第一頁傳空字串）
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        try:
+            page_result = keyset_paginate(
+                query, [(Report.created_at, 'desc'), (Report.id, 'desc')],
+                cursor=cursor, per_page=per_page, with_total=include_total
+            )
+        except InvalidCursor as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        result = {
+            'success': True,
+            'reports': [report.to_dict() for report in page_result.items],
+            'next_cursor': page_result.next_cursor,
+            'has_next': page_result.has_next
+        }
+        if include_total:
+            result['total'] = page_result.total
+        return jsonify(result)
+    
     query = query.order_by(Report.created_at.desc())
     reports_pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
@@ -626,6 +697,88 @@ def update_report_status(report_id):
         }), 500
         
 # 評論管理相關 API
+def _report_counts(comment_ids):
+    """以單一查詢取得多則評論的舉報數：{comment_id: reports}（讚數與回覆數直接讀取評論的計數欄位）"""
+    if not comment_ids:
+        return {}
+
+    rows = db.session.query(Report.content_id, func.count()).filter(
+        Report.content_type == 'comment', Report.content_id.in_(comment_ids)
+    ).group_by(Report.content_id).all()
+    return dict(rows)
+
+def _admin_comment_dicts(comments):
+    """
+    組合管理頁面的評論資料（含用戶、房源、統計與回覆）
+
+    不論評論筆數多少，固定只有舉報數、回覆、用戶、房源四次查詢。
+    用戶先以一次查詢載入 session，之後 to_dict() 存取 comment.user / reply.user 時
+    會直接從 identity map 取得，不會再逐筆查詢。
+    """
+    if not comments:
+        return []
+
+    comment_ids = [comment.id for comment in comments]
+    report_counts = _report_counts(comment_ids)
+
+    replies_map = {}
+    replies = Reply.query.filter(Reply.comment_id.in_(comment_ids)) \
+        .order_by(Reply.created_at.asc(), Reply.id.asc()).all()
+    for reply in replies:
+        replies_map.setdefault(reply.comment_id, []).append(reply)
+
+    user_ids = {comment.user_id for comment in comments} | {reply.user_id for reply in replies}
+    user_ids.discard(None)
+    users = {
+        user.user_id: user
+        for user in User.query.filter(User.user_id.in_(user_ids)).all()
+    } if user_ids else {}
+
+    property_ids = {comment.property_id for comment in comments}
+    properties = {
+        row.accommodation_id: row
+        for row in db.session.query(
+            Accommodation.accommodation_id, Accommodation.title, Accommodation.address
+        ).filter(Accommodation.accommodation_id.in_(property_ids)).all()
+    }
+
+    result = []
+    for comment in comments:
+        comment_dict = comment.to_dict()
+
+        # 添加用戶信息
+        user = users.get(comment.user_id)
+        if user:
+            comment_dict['user_name'] = user.username
+            comment_dict['user_avatar'] = user.profile_image
+            comment_dict['user_email'] = user.email
+
+        # 添加住所信息
+        accommodation = properties.get(comment.property_id)
+        if accommodation:
+            comment_dict['property_title'] = accommodation.title
+            comment_dict['property_address'] = accommodation.address
+
+        # 添加統計信息
+        comment_dict['likes_count'] = comment.like_count or 0
+        comment_dict['replies_count'] = comment.reply_count or 0
+        comment_dict['reports_count'] = report_counts.get(comment.id, 0)
+
+        # 添加回覆及回覆用戶信息
+        replies_list = []
+        for reply in replies_map.get(comment.id, []):
+            reply_dict = reply.to_dict()
+            reply_user = users.get(reply.user_id)
+            if reply_user:
+                reply_dict['user_name'] = reply_user.username
+                reply_dict['user_avatar'] = reply_user.profile_image
+            replies_list.append(reply_dict)
+        comment_dict['replies'] = replies_list
+
+        result.append(comment_dict)
+
+    return result
+
 @api_bp.route('/admin/comments', methods=['GET'])
 @admin_required
 def get_comments():
@@ -649,22 +802,23 @@ def get_comments():
         query = query.filter(Comment.rating == rating)
     
     if property_type:
-        query = query.join(Accommodation, Comment.property_id == Accommodation.id)
+        query = query.join(Accommodation, Comment.property_id == Accommodation.accommodation_id) \
+            .filter(Accommodation.property_type == property_type)
     
     if date_from:
-        date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
+        date_from_obj = datetime.datetime.strptime(date_from, '%Y-%m-%d')
         query = query.filter(Comment.created_at >= date_from_obj)
     
     if date_to:
-        date_to_obj = datetime.strptime(date_to, '%Y-%m-%d')
+        date_to_obj = datetime.datetime.strptime(date_to, '%Y-%m-%d')
         date_to_obj = date_to_obj + timedelta(days=1)  # 包括當天
         query = query.filter(Comment.created_at < date_to_obj)
     
     if search:
         search_term = f"%{search}%"
-        query = query.join(User, Comment.user_id == User.id) \
+        query = query.join(User, Comment.user_id == User.user_id) \
             .filter(
-                or_(
+                db.or_(
                     Comment.content.ilike(search_term),
                     User.username.ilike(search_term),
                     User.email.ilike(search_term)
@@ -672,58 +826,20 @@ def get_comments():
             )
     
     # 排序：最新的評論優先
-    query = query.order_by(Comment.created_at.desc())
+    query = query.order_by(Comment.created_at.desc(), Comment.id.desc())
     
+    if not include_relations:
+        # 作者以一次查詢預先載入，避免 to_dict() 逐筆查詢
+        query = query.options(selectinload(Comment.user))
+
     # 執行分頁查詢
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     # 處理結果
-    comments_result = []
-    
-    for comment in pagination.items:
-        comment_dict = comment.to_dict()
-        
-        # 如果需要包含關聯數據
-        if include_relations:
-            # 添加用戶信息
-            user = User.query.get(comment.user_id)
-            if user:
-                comment_dict['user_name'] = user.username
-                comment_dict['user_avatar'] = user.profile_image
-                comment_dict['user_email'] = user.email
-            
-            # 添加住所信息
-            accommodation = Accommodation.query.get(comment.property_id)
-            if accommodation:
-                comment_dict['property_title'] = accommodation.title
-                comment_dict['property_address'] = accommodation.address
-            
-            # 添加統計信息
-            comment_dict['likes_count'] = CommentLike.query.filter_by(comment_id=comment.id).count()
-            comment_dict['replies_count'] = Reply.query.filter_by(comment_id=comment.id).count()
-            comment_dict['reports_count'] = Report.query.filter_by(
-                content_type='comment', content_id=comment.id
-            ).count()
-            
-            # 獲取回覆
-            replies = Reply.query.filter_by(comment_id=comment.id) \
-                .order_by(Reply.created_at.asc()).all()
-            
-            replies_list = []
-            for reply in replies:
-                reply_dict = reply.to_dict()
-                
-                # 添加回覆用戶信息
-                reply_user = User.query.get(reply.user_id)
-                if reply_user:
-                    reply_dict['user_name'] = reply_user.username
-                    reply_dict['user_avatar'] = reply_user.profile_image
-                
-                replies_list.append(reply_dict)
-            
-            comment_dict['replies'] = replies_list
-        
-        comments_result.append(comment_dict)
+    if include_relations:
+        comments_result = _admin_comment_dicts(pagination.items)
+    else:
+        comments_result = [comment.to_dict() for comment in pagination.items]
     
     return jsonify({
         'success': True,
@@ -738,53 +854,14 @@ def get_comments():
 def get_comment_details(comment_id):
     """獲取評論詳情"""
     comment = Comment.query.get_or_404(comment_id)
-    comment_dict = comment.to_dict()
-    
-    # 添加用戶信息
-    user = User.query.get(comment.user_id)
-    if user:
-        comment_dict['user_name'] = user.username
-        comment_dict['user_avatar'] = user.profile_image
-        comment_dict['user_email'] = user.email
-    
-    # 添加住所信息
-    accommodation = Accommodation.query.get(comment.property_id)
-    if accommodation:
-        comment_dict['property_title'] = accommodation.title
-        comment_dict['property_address'] = accommodation.address
-    
-    # 添加統計信息
-    comment_dict['likes_count'] = CommentLike.query.filter_by(comment_id=comment.id).count()
-    comment_dict['replies_count'] = Reply.query.filter_by(comment_id=comment.id).count()
-    
-    # 獲取回覆
-    replies = Reply.query.filter_by(comment_id=comment.id) \
-        .order_by(Reply.created_at.asc()).all()
-    
-    replies_list = []
-    for reply in replies:
-        reply_dict = reply.to_dict()
-        
-        # 添加回覆用戶信息
-        reply_user = User.query.get(reply.user_id)
-        if reply_user:
-            reply_dict['user_name'] = reply_user.username
-            reply_dict['user_avatar'] = reply_user.profile_image
-        
-        replies_list.append(reply_dict)
-    
-    comment_dict['replies'] = replies_list
+    comment_dict = _admin_comment_dicts([comment])[0]
     
     # 獲取舉報信息
     reports = Report.query.filter_by(
         content_type='comment', content_id=comment.id
     ).order_by(Report.created_at.desc()).all()
     
-    reports_list = []
-    for report in reports:
-        reports_list.append(report.to_dict())
-    
-    comment_dict['reports'] = reports_list
+    comment_dict['reports'] = [report.to_dict() for report in reports]
     
     return jsonify({
         'success': True,
@@ -1,11 +1,15 @@
 import json
 import pytz
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, session
 from flask_socketio import SocketIO # type: ignore
 from app import socketio
 from app.api import api_bp
 from app.extensions import db
-from app.models.chat import Message
+from app.models.chat import Message, Conversation, make_conversation_key
+from app.models.user import User
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.chat_writer import chat_writer
+from app.utils.auth import login_required
 from datetime import datetime
 
 import logging
@@ -50,10 +54,8 @@ def handle_private_message(data):
 
     logging.info(f"User {sender_id} 發送訊息給 {receiver_id}: {message}")
 
-    # 存入資料庫
-    new_message = Message(sender_id=sender_id, receiver_id=receiver_id, message=message, time=time)
-    db.session.add(new_message)
-    db.session.commit()
+    # 先寫入本機日誌與緩衝區，由背景工作批次存入資料庫，推播不需等待資料庫寫入
+    chat_writer.enqueue(sender_id, receiver_id, message, time)
 
     socketio.emit("new_message", {
         "sender": sender_id,
@@ -68,26 +70,98 @@ def save_message(sender, receiver, message, time):
     db.session.add(new_message)
     db.session.commit()
 
-from sqlalchemy import or_, and_ # type: ignore
+from sqlalchemy import or_ # type: ignore
 
 @api_bp.route('/chat/history', methods=["GET"])
 def get_chat_history():
+    """取得兩位用戶間的聊天紀錄，由新到舊分頁（before 為上一頁回傳的 next_before）"""
     sender_id = int(request.args.get("sender_id", 0))
     receiver_id = int(request.args.get("receiver_id", 0))
-
-    # 從資料庫中找出符合條件的訊息
-    messages = Message.query.filter(
-        or_(
-            and_(Message.sender_id == sender_id, Message.receiver_id == receiver_id),
-            and_(Message.sender_id == receiver_id, Message.receiver_id == sender_id)
+    limit = min(request.args.get("limit", 50, type=int), 200)
+    before = request.args.get("before")
+
+    # 依對話鍵 + 時間索引查詢，不需掃描整張訊息表
+    query = Message.query.filter_by(conversation_key=make_conversation_key(sender_id, receiver_id))
+    try:
+        page = keyset_paginate(
+            query, [(Message.time, 'desc'), (Message.chat_id, 'desc')],
+            cursor=before, per_page=limit
         )
-    ).order_by(Message.time).all() # 訊息案時間排序
-    
-    return jsonify([
+    except InvalidCursor as e:
+        return jsonify({"message": str(e)}), 400
+
+    # 回傳時依時間由舊到新排序
+    history = [
         {
             "sender": msg.sender_id, 
             "receiver": msg.receiver_id,
             "text": msg.message, 
             "timestamp": msg.time.isoformat()}
-        for msg in messages
-    ])
\ No newline at end of file
+        for msg in reversed(page.items)
+    ]
+    
+    # 第一頁加上尚在寫入佇列中的訊息
+    if not before:
+        history.extend(
+            {
+                "sender": int(entry["sender_id"]),
+                "receiver": int(entry["receiver_id"]),
+                "text": entry["message"],
+                "timestamp": entry["time"].isoformat()}
+            for entry in chat_writer.pending(sender_id, receiver_id)
+        )
+    
+    return jsonify({
+        "messages": history,
+        "has_more": page.has_next,
+        "next_before": page.next_cursor
+    })
+
+
+@api_bp.route('/chat/conversations', methods=["GET"])
+@login_required
+def get_conversations():
+    """取得目前用戶的對話列表（收件匣），依最後訊息時間由新到舊排序"""
+    user_id = int(session['user_id'])
+
+    # 只讀取對話摘要，不需掃描訊息表
+    conversations = Conversation.query.filter(
+        or_(Conversation.user_low == user_id, Conversation.user_high == user_id)
+    ).order_by(Conversation.last_time.desc()).all()
+
+    other_ids = [conv.other_user_id(user_id) for conv in conversations]
+    users = {
+        user.user_id: user
+        for user in User.query.filter(User.user_id.in_(other_ids)).all()
+    } if other_ids else {}
+
+    items = []
+    for conv in conversations:
+        other_id = conv.other_user_id(user_id)
+        other = users.get(other_id)
+        items.append({
+            "conversation_key": conv.conversation_key,
+            "user_id": other_id,
+            "username": other.username if other else None,
+            "profile_image": other.profile_image if other else None,
+            "last_message": conv.last_message,
+            "last_sender_id": conv.last_sender_id,
+            "last_time": conv.last_time.isoformat() if conv.last_time else None,
+            "unread_count": conv.unread_for(user_id)
+        })
+
+    return jsonify({
+        "conversations": items,
+        "unread_total": sum(item["unread_count"] for item in items)
+    })
+
+@api_bp.route('/chat/conversations/<int:other_id>/read', methods=["POST"])
+@login_required
+def mark_conversation_read(other_id):
+    """將目前用戶與指定用戶的對話標記為已讀"""
+    user_id = int(session['user_id'])
+
+    Conversation.mark_read(user_id, other_id)
+    db.session.commit()
+
+    return jsonify({"success": True})
@@ -1,20 +1,18 @@
 from flask import Blueprint, request, jsonify, session
-from app.models.comments import Comment, Reply, CommentLike, ReplyLike, Report
+from app.models.comments import (
+    Comment, Reply, CommentLike, ReplyLike, Report, liked_comment_ids, liked_reply_ids
+)
 from app.extensions import db
 from sqlalchemy.exc import SQLAlchemyError # type: ignore
 from datetime import datetime
-from functools import wraps
 from app.api import comments_bp
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.auth import login_required
 
-# 用戶身份驗證裝飾器
-def login_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({"message": "請先登入"}), 401
-        
-        return f(*args, **kwargs)
-    return decorated
+def serialize_comments(comments):
+    """序列化評論列表，當前用戶的按讚狀態以單次查詢取得"""
+    liked = liked_comment_ids(session.get('user_id'), [comment.id for comment in comments])
+    return [comment.to_dict(liked) for comment in comments]
 
 # 評論相關 API
 @comments_bp.route('/property/<int:property_id>', methods=['GET'])
@@ -22,13 +20,36 @@ def get_property_comments(property_id):
     """獲取特定房源的所有評論"""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor')
+    
+    # 游標分頁模式（?cursor=，第一頁傳空字串）
+    if cursor is not None:
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        try:
+            page_result = keyset_paginate(
+                Comment.query.filter_by(property_id=property_id),
+                [(Comment.created_at, 'desc'), (Comment.id, 'desc')],
+                cursor=cursor, per_page=per_page, with_total=include_total
+            )
+        except InvalidCursor as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        result = {
+            'success': True,
+            'comments': serialize_comments(page_result.items),
+            'next_cursor': page_result.next_cursor,
+            'has_next': page_result.has_next
+        }
+        if include_total:
+            result['total'] = page_result.total
+        return jsonify(result)
     
     query = Comment.query.filter_by(property_id=property_id).order_by(Comment.created_at.desc())
     comments_pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     result = {
         'success': True,
-        'comments': [comment.to_dict() for comment in comments_pagination.items],
+        'comments': serialize_comments(comments_pagination.items),
         'total': comments_pagination.total,
         'pages': comments_pagination.pages,
         'current_page': page
@@ -106,7 +127,7 @@ def update_comment(comment_id):
         
         db.session.commit()
         
-        comment_dict = comment.to_dict()
+        comment_dict = comment.to_dict(liked_comment_ids(user_id, [comment.id]))
         return jsonify({
             'success': True,
             'message': '評論更新成功',
@@ -161,9 +182,13 @@ def get_replies(comment_id):
     query = Reply.query.filter_by(comment_id=comment_id).order_by(Reply.created_at.asc())
     replies_pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
+    user_id = session.get('user_id')
+    replies = replies_pagination.items
+    liked_replies = liked_reply_ids(user_id, [reply.id for reply in replies])
+    
     result = {
-        'comment': comment.to_dict(),
-        'replies': [reply.to_dict() for reply in replies_pagination.items],
+        'comment': comment.to_dict(liked_comment_ids(user_id, [comment.id])),
+        'replies': [reply.to_dict(liked_replies) for reply in replies],
         'total': replies_pagination.total,
         'pages': replies_pagination.pages,
         'current_page': page
@@ -225,7 +250,7 @@ def update_reply(reply_id):
         reply.content = data.get('content')
         db.session.commit()
         
-        reply_dict = reply.to_dict()
+        reply_dict = reply.to_dict(liked_reply_ids(user_id, [reply.id]))
         return jsonify({
             'success': True,
             'message': '回覆更新成功',
@@ -294,15 +319,11 @@ def like_comment(comment_id):
             
         db.session.commit()
         
-        # 重新查詢以獲取最新的點讚資訊
-        likes_count = CommentLike.query.filter_by(comment_id=comment_id).count()
-        liked_by = [like.user_id for like in CommentLike.query.filter_by(comment_id=comment_id).all()]
-        
+        # 讚數計數器已在同一交易中更新
         return jsonify({
             'success': True,  
             'message': message, 
-            'likes': likes_count,
-            'likedBy': liked_by,
+            'likes': comment.like_count,
             'isLiked': is_liked
         })
     except SQLAlchemyError as e:
@@ -339,15 +360,11 @@ def like_reply(reply_id):
             
         db.session.commit()
         
-        # 重新查詢以獲取最新的點讚資訊
-        likes_count = ReplyLike.query.filter_by(reply_id=reply_id).count()
-        liked_by = [like.user_id for like in ReplyLike.query.filter_by(reply_id=reply_id).all()]
-        
+        # 讚數計數器已在同一交易中更新
         return jsonify({
             'success': True, 
             'message': message, 
-            'like_count': likes_count,
-            'likes': liked_by,
+            'like_count': reply.like_count,
             'isLiked': is_liked
         })
     except SQLAlchemyError as e:
@@ -5,8 +5,48 @@ from app.models.sublet import Sublet
 from app.models.accommodation import Accommodation
 from app.models.user import User
 from app.extensions import db
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.auth import get_user_snapshot
 from datetime import datetime, date
 
+# 游標分頁的排序方式：(排序欄位, 主鍵)
+SUBLET_KEYSET_ORDERS = {
+    'price_low': [(Sublet.asking_price, 'asc'), (Sublet.sublet_id, 'asc')],
+    'price_high': [(Sublet.asking_price, 'desc'), (Sublet.sublet_id, 'desc')],
+    'date_asc': [(Sublet.available_from, 'asc'), (Sublet.sublet_id, 'asc')],
+    'date_desc': [(Sublet.available_from, 'desc'), (Sublet.sublet_id, 'desc')],
+    'created_at': [(Sublet.created_at, 'desc'), (Sublet.sublet_id, 'desc')],
+}
+
+def format_sublet(sublet):
+    """格式化轉租列表項目"""
+    # 獲取關聯住所資訊
+    accommodation = sublet.accommodation
+    
+    return {
+        'id': sublet.sublet_id,
+        'title': sublet.title,
+        'asking_price': float(sublet.asking_price),
+        'original_price': float(sublet.original_price) if sublet.original_price else None,
+        'available_from': sublet.available_from.isoformat() if sublet.available_from else None,
+        'available_to': sublet.available_to.isoformat() if sublet.available_to else None,
+        'status': sublet.status,
+        'accommodation': {
+            'id': accommodation.accommodation_id,
+            'title': accommodation.title,
+            'address': accommodation.address,
+            'property_type': accommodation.property_type,
+            'room_count': accommodation.room_count,
+            'bathroom_count': accommodation.bathroom_count
+        },
+        'poster': {
+            'id': sublet.poster.user_id,
+            'username': sublet.poster.username,
+            'is_verified': sublet.poster.is_verified
+        },
+        'created_at': sublet.created_at.isoformat()
+    }
+
 @api_bp.route('/sublets', methods=['GET'])
 def get_sublets():
     """獲取轉租房源列表，支援分頁和篩選"""
@@ -36,6 +76,28 @@ def get_sublets():
             
     # 排序
     sort_by = request.args.get('sort_by', 'created_at')
+    cursor = request.args.get('cursor')
+    
+    # 游標分頁模式（?cursor=，第一頁傳空字串）
+    if cursor is not None:
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        try:
+            page_result = keyset_paginate(
+                query, SUBLET_KEYSET_ORDERS.get(sort_by, SUBLET_KEYSET_ORDERS['created_at']),
+                cursor=cursor, per_page=per_page, with_total=include_total
+            )
+        except InvalidCursor as e:
+            return jsonify({'message': str(e)}), 400
+        
+        result = {
+            'items': [format_sublet(sublet) for sublet in page_result.items],
+            'next_cursor': page_result.next_cursor,
+            'has_next': page_result.has_next
+        }
+        if include_total:
+            result['total'] = page_result.total
+        return jsonify(result), 200
+    
     if sort_by == 'price_low':
         query = query.order_by(Sublet.asking_price.asc())
     elif sort_by == 'price_high':
@@ -59,32 +121,7 @@ def get_sublets():
     }
     
     for sublet in sublets.items:
-        # 獲取關聯住所資訊
-        accommodation = sublet.accommodation
-        
-        result['items'].append({
-            'id': sublet.sublet_id,
-            'title': sublet.title,
-            'asking_price': float(sublet.asking_price),
-            'original_price': float(sublet.original_price) if sublet.original_price else None,
-            'available_from': sublet.available_from.isoformat() if sublet.available_from else None,
-            'available_to': sublet.available_to.isoformat() if sublet.available_to else None,
-            'status': sublet.status,
-            'accommodation': {
-                'id': accommodation.accommodation_id,
-                'title': accommodation.title,
-                'address': accommodation.address,
-                'property_type': accommodation.property_type,
-                'room_count': accommodation.room_count,
-                'bathroom_count': accommodation.bathroom_count
-            },
-            'poster': {
-                'id': sublet.poster.user_id,
-                'username': sublet.poster.username,
-                'is_verified': sublet.poster.is_verified
-            },
-            'created_at': sublet.created_at.isoformat()
-        })
+        result['items'].append(format_sublet(sublet))
     
     return jsonify(result), 200
 
@@ -225,7 +262,7 @@ def update_sublet(id):
     sublet = Sublet.query.get_or_404(id)
     
     # 檢查是否是發布者或管理員
-    user = User.query.get(user_id)
+    user = get_user_snapshot(user_id)
     if sublet.poster_id != user_id and user.user_role != 'admin':
         return jsonify({'message': '您沒有權限修改此轉租房源'}), 403
     
@@ -290,7 +327,7 @@ def delete_sublet(id):
     sublet = Sublet.query.get_or_404(id)
     
     # 檢查是否是發布者或管理員
-    user = User.query.get(user_id)
+    user = get_user_snapshot(user_id)
     if sublet.poster_id != user_id and user.user_role != 'admin':
         return jsonify({'message': '您沒有權限刪除此轉租房源'}), 403
     
@@ -306,7 +343,7 @@ def delete_sublet(id):
 def verify_sublet(id):
     """審核轉租房源（管理員專用）"""
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_user_snapshot(user_id)
     
     # 檢查是否是管理員
     if user.user_role != 'admin':
@@ -389,7 +426,7 @@ def get_user_sublets():
 def admin_get_sublets():
     """管理員獲取所有轉租房源（包括待審核）"""
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_user_snapshot(user_id)
     
     # 檢查是否是管理員
     if user.user_role != 'admin':
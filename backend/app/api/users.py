@@ -3,34 +3,13 @@ from app.api import api_bp
 from app.models.user import User
 from app.extensions import db
 from werkzeug.security import generate_password_hash, check_password_hash
-from functools import wraps
+from app.utils.auth import login_required
 import datetime
 import os
 from werkzeug.utils import secure_filename
 import uuid
 import traceback
 
-# 用戶身份驗證裝飾器
-def login_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({"message": "請先登入"}), 401
-        
-        return f(*args, **kwargs)
-    return decorated
-
-# 檢查是否為本人或管理員
-def check_owner(user_id):
-    if 'user_id' not in session:
-        return False
-    
-    current_user_id = session.get('user_id')
-    current_user = User.query.get(current_user_id)
-    
-    # 檢查是否為本人或管理員
-    return str(current_user_id) == str(user_id) or (current_user and current_user.is_admin())
-
 # 獲取當前用戶個人資料
 @api_bp.route('/users/profile', methods=['GET'])
 @login_required
@@ -2,11 +2,81 @@ from flask_sqlalchemy import SQLAlchemy # type: ignore
 from flask_migrate import Migrate # type: ignore
 from flask_jwt_extended import JWTManager # type: ignore
 from flask import jsonify
+from sqlalchemy import event # type: ignore
+from sqlalchemy.engine import make_url # type: ignore
+from sqlalchemy.pool import QueuePool # type: ignore
+from app.utils.db_routing import RoutingSession, configure_replica, init_routing
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
 
+# SQLite 檔案資料庫的連線調校
+#
+# 預設的 rollback journal 在寫入時會鎖住整個資料庫，Socket.IO 寫入與 API 讀取同時進行時
+# 容易出現 database is locked。WAL 模式下讀取不會被寫入阻擋，寫入者之間則以 busy_timeout 等待，
+# 而不是立即失敗。PRAGMA 在每條新連線建立時套用（journal_mode 會保存在資料庫檔案中）。
+
+def _is_sqlite_file(uri):
+    if not uri:
+        return False
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def sqlite_engine_options(config):
+    """
+    SQLite 檔案資料庫的連線池設定
+
+    threading 與 eventlet 模式下同一條連線可能被不同執行緒（或 greenlet）取用，
+    因此關閉 check_same_thread；連線池大小對應同時處理的請求數。
+    """
+    return {
+        'poolclass': QueuePool,
+        'pool_size': config.get('SQLITE_POOL_SIZE', 10),
+        'max_overflow': config.get('SQLITE_MAX_OVERFLOW', 20),
+        'pool_timeout': config.get('SQLITE_POOL_TIMEOUT', 30),
+        'connect_args': {
+            'check_same_thread': False,
+            'timeout': config.get('SQLITE_PRAGMAS', {}).get('busy_timeout', 5000) / 1000,
+        },
+    }
+
+def _sqlite_pragma_listener(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+    return set_pragmas
+
+def init_db(app):
+    """
+    初始化資料庫；使用 SQLite 檔案資料庫且 SQLITE_TUNING 開啟時套用連線池設定與 PRAGMA
+
+    已在 SQLALCHEMY_ENGINE_OPTIONS 指定的選項優先於預設的連線池設定。
+    設定 REPLICA_DATABASE_URL 時啟用讀寫分離（見 app/utils/db_routing.py）。
+    """
+    configure_replica(app.config)
+    tuned = app.config.get('SQLITE_TUNING', True) and _is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI'])
+    if tuned:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **sqlite_engine_options(app.config),
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+        }
+
+    db.init_app(app)
+
+    if tuned:
+        pragmas = app.config.get('SQLITE_PRAGMAS', {})
+        with app.app_context():
+            for engine in db.engines.values():
+                if engine.dialect.name == 'sqlite' and _is_sqlite_file(engine.url):
+                    event.listen(engine, 'connect', _sqlite_pragma_listener(pragmas))
+
+    init_routing(app, db)
+
 # 詳細的 JWT 錯誤處理程序
 @jwt.invalid_token_loader
 def invalid_token_callback(error_message):
@@ -2,7 +2,7 @@
 from app.models.user import User, VerificationCode, PasswordReset
 from app.models.accommodation import (
     Accommodation, AccommodationImage, Amenity, 
-    AccommodationAmenity, Favorite
+    AccommodationAmenity, AccommodationDistance, Favorite
 )
 from app.models.review import Review
 from app.models.sublet import Sublet
@@ -10,5 +10,7 @@ from app.models.lease import Lease
 from app.models.maintenance import MaintenanceRequest, MaintenanceImage
 from app.models.notification import Notification
 from app.models.fraud import FraudReport
-from app.models.chat import Message
-from app.models.comments import Comment, Reply, CommentLike, ReplyLike, Report
\ No newline at end of file
+from app.models.chat import Message, Conversation
+from app.models.comments import Comment, Reply, CommentLike, ReplyLike, Report
+from app.models.session import ServerSession
+from app.models.sync import SyncTombstone
@@ -1,5 +1,7 @@
 from datetime import datetime
+from sqlalchemy import event # type: ignore
 from app.extensions import db
+from app.utils.geo import encode_geohash
 
 class Accommodation(db.Model):
     __tablename__ = 'accommodations'
@@ -32,6 +34,7 @@ class Accommodation(db.Model):
     district = db.Column(db.String(50))
     latitude = db.Column(db.Numeric(10, 8))
     longitude = db.Column(db.Numeric(11, 8))
+    geohash = db.Column(db.String(12))  # 由經緯度計算，用於地圖範圍查詢（見 app/utils/geo.py）
     distance_to_university = db.Column(db.Float)
     available_from = db.Column(db.Date)
     minimum_stay = db.Column(db.Integer)
@@ -41,6 +44,17 @@ class Accommodation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_verified = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # 房源、圖片或設備每次變更加一，用於 ETag
+    
+    # 列表依狀態篩選後以各種排序分頁（見 ACCOMMODATION_KEYSET_ORDERS）
+    __table_args__ = (
+        db.Index('ix_accommodations_status_created', 'status', 'created_at', 'accommodation_id'),
+        db.Index('ix_accommodations_status_price', 'status', 'rent_price', 'accommodation_id'),
+        db.Index('ix_accommodations_status_distance', 'status', 'distance_to_university', 'accommodation_id'),
+        db.Index('ix_accommodations_created', 'created_at'),
+        db.Index('ix_accommodations_status_geohash', 'status', 'geohash'),
+        db.Index('ix_accommodations_version', 'version'),  # 索引比對 version 時不必讀整張表
+    )
     
     # 關聯
     images = db.relationship('AccommodationImage', backref='accommodation', lazy='dynamic',
@@ -68,6 +82,10 @@ class AccommodationImage(db.Model):
     is_primary = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_accommodation_images_accommodation', 'accommodation_id', 'image_id'),
+    )
+    
     def __repr__(self):
         return f'<AccommodationImage {self.image_id}>'
 
@@ -93,6 +111,21 @@ class AccommodationAmenity(db.Model):
                          primary_key=True)
 
 
+class AccommodationDistance(db.Model):
+    """房源到各地點（POINTS_OF_INTEREST）的距離，由 app/utils/distances.py 維護"""
+    __tablename__ = 'accommodation_distances'
+    
+    accommodation_id = db.Column(db.Integer, db.ForeignKey('accommodations.accommodation_id'), 
+                               primary_key=True)
+    poi = db.Column(db.String(32), primary_key=True)
+    distance = db.Column(db.Float, nullable=False)  # 公尺
+    
+    # 依地點距離排序與篩選
+    __table_args__ = (
+        db.Index('ix_accommodation_distances_poi_distance', 'poi', 'distance', 'accommodation_id'),
+    )
+
+
 class Favorite(db.Model):
     __tablename__ = 'favorites'
     
@@ -102,4 +135,34 @@ class Favorite(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<Favorite user_id={self.user_id} accommodation_id={self.accommodation_id}>'
\ No newline at end of file
+        return f'<Favorite user_id={self.user_id} accommodation_id={self.accommodation_id}>'
+
+# 房源本身、圖片或設備變更時遞增 version 並更新 updated_at（在同一個交易中以 UPDATE 維護）
+@event.listens_for(Accommodation, 'before_update')
+def _bump_version(mapper, connection, target):
+    # 只修改設備集合時欄位沒有變動，同樣需要遞增
+    target.version = (target.version or 0) + 1
+
+@event.listens_for(Accommodation, 'before_insert')
+@event.listens_for(Accommodation, 'before_update')
+def _set_geohash(mapper, connection, target):
+    if target.latitude is None or target.longitude is None:
+        target.geohash = None
+    else:
+        target.geohash = encode_geohash(float(target.latitude), float(target.longitude))
+
+def _touch_accommodation(connection, accommodation_id):
+    table = Accommodation.__table__
+    connection.execute(
+        table.update()
+        .where(table.c.accommodation_id == accommodation_id)
+        .values(version=table.c.version + 1, updated_at=datetime.utcnow())
+    )
+
+@event.listens_for(AccommodationImage, 'after_insert')
+@event.listens_for(AccommodationImage, 'after_update')
+@event.listens_for(AccommodationImage, 'after_delete')
+@event.listens_for(AccommodationAmenity, 'after_insert')
+@event.listens_for(AccommodationAmenity, 'after_delete')
+def _related_changed(mapper, connection, target):
+    _touch_accommodation(connection, target.accommodation_id)
@@ -1,5 +1,11 @@
 from app.extensions import db
 from datetime import datetime
+from sqlalchemy import event, update, select, func, case, exists, literal, or_ # type: ignore
+
+def make_conversation_key(user_a, user_b):
+    """兩位用戶的對話鍵：依 ID 大小排序，(a, b) 與 (b, a) 得到相同的鍵"""
+    low, high = sorted((int(user_a), int(user_b)))
+    return f"{low}:{high}"
 
 class Message(db.Model):
     __tablename__ = 'chat_message'
@@ -7,8 +13,135 @@ class Message(db.Model):
     chat_id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, nullable=False)
     receiver_id = db.Column(db.Integer, nullable=False)
+    conversation_key = db.Column(db.String(41))  # "較小ID:較大ID"
     message = db.Column(db.Text, nullable=False)
     time = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_chat_message_conversation_time', 'conversation_key', 'time'),
+    )
+
     def __repr__(self):
         return f'<Message {self.chat_id}>'
+
+# 寫入時自動補上對話鍵
+@event.listens_for(Message, 'before_insert')
+def _set_conversation_key(mapper, connection, target):
+    if not target.conversation_key:
+        target.conversation_key = make_conversation_key(target.sender_id, target.receiver_id)
+
+
+class Conversation(db.Model):
+    """對話摘要（收件匣）：每組用戶一列，記錄最後一則訊息與雙方未讀數"""
+    __tablename__ = 'chat_conversations'
+
+    conversation_key = db.Column(db.String(41), primary_key=True)
+    user_low = db.Column(db.Integer, nullable=False)  # ID 較小的用戶
+    user_high = db.Column(db.Integer, nullable=False)  # ID 較大的用戶
+    last_message = db.Column(db.Text)
+    last_sender_id = db.Column(db.Integer)
+    last_time = db.Column(db.DateTime)
+    unread_low = db.Column(db.Integer, default=0, nullable=False)  # user_low 的未讀數
+    unread_high = db.Column(db.Integer, default=0, nullable=False)  # user_high 的未讀數
+
+    __table_args__ = (
+        db.Index('ix_chat_conversations_low_time', 'user_low', 'last_time'),
+        db.Index('ix_chat_conversations_high_time', 'user_high', 'last_time'),
+    )
+
+    def other_user_id(self, user_id):
+        return self.user_high if int(user_id) == self.user_low else self.user_low
+
+    def unread_for(self, user_id):
+        return self.unread_low if int(user_id) == self.user_low else self.unread_high
+
+    @classmethod
+    def mark_read(cls, user_id, other_id):
+        """以原子 UPDATE 將 user_id 在與 other_id 的對話中的未讀數歸零，回傳是否有此對話"""
+        column = cls.unread_low if int(user_id) <= int(other_id) else cls.unread_high
+        result = db.session.execute(
+            update(cls).where(cls.conversation_key == make_conversation_key(user_id, other_id)).values({column: 0})
+        )
+        return result.rowcount > 0
+
+    @classmethod
+    def apply_messages(cls, entries):
+        """
+        依一批新訊息更新對話摘要（需在同一交易中提交）
+
+        未讀數以原子 UPDATE 累加，不會覆蓋同時發生的已讀標記或其他程序的寫入。
+
+        Args:
+            entries: [{'sender_id', 'receiver_id', 'message', 'time'}, ...]，依發送順序排列
+        """
+        grouped = {}
+        for entry in entries:
+            key = make_conversation_key(entry['sender_id'], entry['receiver_id'])
+            grouped.setdefault(key, []).append(entry)
+
+        table = cls.__table__
+        connection = db.session.connection()
+        for key, messages in grouped.items():
+            low, high = (int(v) for v in key.split(':'))
+            last = messages[-1]
+            values = {
+                'last_message': last['message'],
+                'last_sender_id': int(last['sender_id']),
+                'last_time': last['time'],
+            }
+            received = {}
+            for user_id, column in ((low, 'unread_low'), (high, 'unread_high')):
+                # 發送者顯然已讀過此對話：只計算最後一次發送之後收到的訊息（自己傳給自己不計）
+                count, sent = 0, False
+                for entry in messages:
+                    if int(entry['sender_id']) == user_id:
+                        count, sent = 0, True
+                    elif int(entry['receiver_id']) == user_id:
+                        count += 1
+                received[column] = count
+                values[column] = count if sent else table.c[column] + count
+
+            result = connection.execute(
+                table.update().where(table.c.conversation_key == key).values(values)
+            )
+            if result.rowcount == 0:
+                connection.execute(table.insert().values(
+                    conversation_key=key, user_low=low, user_high=high,
+                    **{**values, **received}
+                ))
+
+    @classmethod
+    def backfill_from_messages(cls):
+        """
+        以每組對話的最後一則訊息補上摘要（用於不經過 ORM 事件的批次匯入）
+
+        沒有摘要的對話新增一列（已讀狀態未知，未讀數從 0 開始）；
+        已有摘要但有較新訊息的對話只更新最後一則訊息，保留未讀數。
+        """
+        table = cls.__table__
+        messages = Message.__table__
+        latest = select(
+            messages.c.conversation_key, func.max(messages.c.chat_id).label('last_id')
+        ).where(messages.c.conversation_key.isnot(None)).group_by(messages.c.conversation_key).subquery()
+        last = select(
+            messages.c.conversation_key, messages.c.sender_id, messages.c.receiver_id,
+            messages.c.message, messages.c.time
+        ).join(latest, messages.c.chat_id == latest.c.last_id).subquery()
+
+        connection = db.session.connection()
+        connection.execute(
+            table.update()
+            .where(table.c.conversation_key == last.c.conversation_key)
+            .where(or_(table.c.last_time.is_(None), table.c.last_time < last.c.time))
+            .values(last_message=last.c.message, last_sender_id=last.c.sender_id, last_time=last.c.time)
+        )
+        low = case((last.c.sender_id < last.c.receiver_id, last.c.sender_id), else_=last.c.receiver_id)
+        high = case((last.c.sender_id < last.c.receiver_id, last.c.receiver_id), else_=last.c.sender_id)
+        connection.execute(table.insert().from_select(
+            ['conversation_key', 'user_low', 'user_high', 'last_message', 'last_sender_id', 'last_time',
+             'unread_low', 'unread_high'],
+            select(
+                last.c.conversation_key, low, high, last.c.message, last.c.sender_id, last.c.time,
+                literal(0), literal(0)
+            ).where(~exists().where(table.c.conversation_key == last.c.conversation_key))
+        ))
@@ -1,7 +1,7 @@
 from datetime import datetime
 from app.extensions import db
 from sqlalchemy.sql import func # type: ignore
-from sqlalchemy import event # type: ignore
+from sqlalchemy import event, select # type: ignore
 
 class Comment(db.Model):
     """房源評論表"""
@@ -14,13 +14,21 @@ class Comment(db.Model):
     rating = db.Column(db.Integer, nullable=False)  # 評分 1-5
     created_at = db.Column(db.DateTime, default=func.now())
     updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
+    like_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # 讚數（與 comment_likes 同步維護）
+    reply_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # 回覆數（與 replies 同步維護）
+    
+    __table_args__ = (
+        db.Index('ix_comments_property_created', 'property_id', 'created_at', 'id'),  # 房源評論列表
+        db.Index('ix_comments_created', 'created_at', 'id'),  # 後台評論列表
+    )
     
     # 關聯
     user = db.relationship('User', backref=db.backref('comments', lazy='dynamic'))
     replies = db.relationship('Reply', backref='comment', lazy='dynamic', cascade='all, delete-orphan')
     likes = db.relationship('CommentLike', backref='comment', lazy='dynamic', cascade='all, delete-orphan')
     
-    def to_dict(self):
+    def to_dict(self, liked_ids=None):
+        """liked_ids: 當前用戶按過讚的評論 ID 集合，用於產生 isLiked"""
         return {
             'id': self.id,
             'property_id': self.property_id,
@@ -30,9 +38,9 @@ class Comment(db.Model):
             'rating': self.rating,
             'date': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'likes': self.likes.count(),
-            'replyCount': self.replies.count(),
-            'likedBy': [like.user_id for like in self.likes.all()]
+            'likes': self.like_count or 0,
+            'replyCount': self.reply_count or 0,
+            'isLiked': self.id in liked_ids if liked_ids else False
         }
 
 
@@ -46,12 +54,18 @@ class Reply(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=func.now())
     updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
+    like_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # 讚數（與 reply_likes 同步維護）
+    
+    __table_args__ = (
+        db.Index('ix_replies_comment_created', 'comment_id', 'created_at', 'id'),
+    )
     
     # 關聯
     user = db.relationship('User', backref=db.backref('replies', lazy='dynamic'))
     likes = db.relationship('ReplyLike', backref='reply', lazy='dynamic', cascade='all, delete-orphan')
     
-    def to_dict(self):
+    def to_dict(self, liked_ids=None):
+        """liked_ids: 當前用戶按過讚的回覆 ID 集合，用於產生 isLiked"""
         return {
             'id': self.id,
             'comment_id': self.comment_id,
@@ -60,8 +74,8 @@ class Reply(db.Model):
             'content': self.content,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'like_count': self.likes.count(),
-            'likes': [like.user_id for like in self.likes.all()]
+            'like_count': self.like_count or 0,
+            'isLiked': self.id in liked_ids if liked_ids else False
         }
 
 
@@ -90,6 +104,74 @@ class ReplyLike(db.Model):
     # 確保每個使用者只能對一條回覆按一次讚
     __table_args__ = (db.UniqueConstraint('reply_id', 'user_id', name='unique_reply_like'),)
 
+# 讚數與回覆數計數器：在新增 / 刪除的同一個交易中以原子 UPDATE 維護
+def _adjust_counter(connection, table, column, row_id, delta):
+    connection.execute(
+        table.update()
+        .where(table.c.id == row_id)
+        .values({column: table.c[column] + delta})
+    )
+
+@event.listens_for(CommentLike, 'after_insert')
+def _comment_like_added(mapper, connection, target):
+    _adjust_counter(connection, Comment.__table__, 'like_count', target.comment_id, 1)
+
+@event.listens_for(CommentLike, 'after_delete')
+def _comment_like_removed(mapper, connection, target):
+    _adjust_counter(connection, Comment.__table__, 'like_count', target.comment_id, -1)
+
+@event.listens_for(ReplyLike, 'after_insert')
+def _reply_like_added(mapper, connection, target):
+    _adjust_counter(connection, Reply.__table__, 'like_count', target.reply_id, 1)
+
+@event.listens_for(ReplyLike, 'after_delete')
+def _reply_like_removed(mapper, connection, target):
+    _adjust_counter(connection, Reply.__table__, 'like_count', target.reply_id, -1)
+
+@event.listens_for(Reply, 'after_insert')
+def _reply_added(mapper, connection, target):
+    _adjust_counter(connection, Comment.__table__, 'reply_count', target.comment_id, 1)
+
+@event.listens_for(Reply, 'after_delete')
+def _reply_removed(mapper, connection, target):
+    _adjust_counter(connection, Comment.__table__, 'reply_count', target.comment_id, -1)
+
+def recount_counters(connection):
+    """由讚與回覆重新計算所有計數器（用於不經過 ORM 事件的批次匯入）"""
+    comments, replies = Comment.__table__, Reply.__table__
+    comment_likes, reply_likes = CommentLike.__table__, ReplyLike.__table__
+    connection.execute(comments.update().values(
+        like_count=select(func.count()).select_from(comment_likes)
+            .where(comment_likes.c.comment_id == comments.c.id).scalar_subquery(),
+        reply_count=select(func.count()).select_from(replies)
+            .where(replies.c.comment_id == comments.c.id).scalar_subquery()
+    ))
+    connection.execute(replies.update().values(
+        like_count=select(func.count()).select_from(reply_likes)
+            .where(reply_likes.c.reply_id == replies.c.id).scalar_subquery()
+    ))
+
+def liked_comment_ids(user_id, comment_ids):
+    """一次查詢用戶在指定評論中按過讚的評論 ID"""
+    if not user_id or not comment_ids:
+        return set()
+    rows = db.session.query(CommentLike.comment_id).filter(
+        CommentLike.user_id == user_id,
+        CommentLike.comment_id.in_(comment_ids)
+    ).all()
+    return {row[0] for row in rows}
+
+def liked_reply_ids(user_id, reply_ids):
+    """一次查詢用戶在指定回覆中按過讚的回覆 ID"""
+    if not user_id or not reply_ids:
+        return set()
+    rows = db.session.query(ReplyLike.reply_id).filter(
+        ReplyLike.user_id == user_id,
+        ReplyLike.reply_id.in_(reply_ids)
+    ).all()
+    return {row[0] for row in rows}
+
+
 class Report(db.Model):
     """內容舉報表"""
     __tablename__ = 'reports'
@@ -105,6 +187,13 @@ class Report(db.Model):
     updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
     resolved_at = db.Column(db.DateTime)
     
+    __table_args__ = (
+        db.Index('ix_reports_content', 'content_type', 'content_id'),  # 刪除內容時一併刪除舉報
+        db.Index('ix_reports_reporter_created', 'reporter_id', 'created_at'),  # 用戶的舉報紀錄與重複舉報檢查
+        db.Index('ix_reports_status_created', 'status', 'created_at', 'id'),  # 後台依狀態篩選
+        db.Index('ix_reports_created', 'created_at', 'id'),  # 後台舉報列表
+    )
+    
     # 關聯
     reporter = db.relationship('User', backref=db.backref('reports', lazy='dynamic'))
     
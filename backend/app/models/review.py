@@ -20,5 +20,9 @@ class Review(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_verified = db.Column(db.Boolean, default=False)
     
+    __table_args__ = (
+        db.Index('ix_reviews_accommodation', 'accommodation_id'),
+    )
+    
     def __repr__(self):
         return f'<Review {self.review_id}>'
\ No newline at end of file
@@ -0,0 +1,16 @@
+from app.extensions import db
+
+class ServerSession(db.Model):
+    """伺服器端 Session 資料（SESSION_BACKEND = 'sqlalchemy' 時使用）"""
+    __tablename__ = 'server_sessions'
+
+    session_id = db.Column(db.String(255), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    expiry = db.Column(db.DateTime, nullable=False)  # UTC，過期後由批次清理刪除
+
+    __table_args__ = (
+        db.Index('ix_server_sessions_expiry', 'expiry'),
+    )
+
+    def __repr__(self):
+        return f'<ServerSession {self.session_id[:8]}>'
@@ -20,5 +20,15 @@ class Sublet(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_verified = db.Column(db.Boolean, default=False)
     
+    # 列表依狀態篩選後以各種排序分頁（見 SUBLET_KEYSET_ORDERS）
+    __table_args__ = (
+        db.Index('ix_sublets_status_created', 'status', 'created_at', 'sublet_id'),
+        db.Index('ix_sublets_status_price', 'status', 'asking_price', 'sublet_id'),
+        db.Index('ix_sublets_status_available', 'status', 'available_from', 'sublet_id'),
+        db.Index('ix_sublets_poster_created', 'poster_id', 'created_at'),
+        db.Index('ix_sublets_accommodation_status', 'accommodation_id', 'status', 'created_at'),
+        db.Index('ix_sublets_created', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Sublet {self.title}>'
\ No newline at end of file
@@ -0,0 +1,42 @@
+import json
+from datetime import datetime
+from sqlalchemy import event # type: ignore
+from app.extensions import db
+
+class SyncTombstone(db.Model):
+    """刪除紀錄（墓碑）：增量快照以此將刪除同步到其他資料庫"""
+    __tablename__ = 'sync_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(64), nullable=False)
+    pk = db.Column(db.Text, nullable=False)  # 主鍵 JSON，例如 {"user_id": 1}
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # 使用 AUTOINCREMENT，清理舊紀錄後 ID 不會被重複使用（增量匯出以 ID 作為水位）
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    def to_dict(self):
+        return {
+            'table': self.table_name,
+            'pk': json.loads(self.pk),
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
+        }
+
+# 不記錄刪除的表格
+TOMBSTONE_EXCLUDED_TABLES = {'sync_tombstones', 'server_sessions'}
+
+# 透過 ORM 刪除任何模型時記錄墓碑（query.delete() 等批次刪除不會觸發）
+@event.listens_for(db.Model, 'after_delete', propagate=True)
+def _record_tombstone(mapper, connection, target):
+    table_name = mapper.local_table.name
+    if table_name in TOMBSTONE_EXCLUDED_TABLES:
+        return
+    pk = {
+        mapper.get_property_by_column(column).key: value
+        for column, value in zip(mapper.primary_key, mapper.primary_key_from_instance(target))
+    }
+    connection.execute(SyncTombstone.__table__.insert().values(
+        table_name=table_name,
+        pk=json.dumps(pk, default=str),
+        deleted_at=datetime.utcnow()
+    ))
@@ -23,6 +23,10 @@ class User(db.Model):
     is_email_verified = db.Column(db.Boolean, default=False)
     is_phone_verified = db.Column(db.Boolean, default=False)
     
+    __table_args__ = (
+        db.Index('ix_users_created', 'created_at', 'user_id'),  # 後台用戶列表與最近註冊
+    )
+    
     # 關聯
     accommodations = db.relationship('Accommodation', foreign_keys='Accommodation.owner_id',
                                    backref='owner', lazy='dynamic')
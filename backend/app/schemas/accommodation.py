@@ -0,0 +1,172 @@
+from collections import defaultdict
+from sqlalchemy import event # type: ignore
+from sqlalchemy.orm import object_session # type: ignore
+from app.extensions import db
+from app.models.accommodation import (
+    Accommodation, AccommodationImage, Amenity, AccommodationAmenity
+)
+from app.utils.cache import LRUCache
+from app.utils.json_provider import dumps
+from app.utils.tx_hooks import on_commit
+
+# 已序列化房源的快取：{accommodation_id: (updated_at, 資料 dict, JSON 片段)}
+LISTING_CACHE_SIZE = 5000
+listing_cache = LRUCache(maxsize=LISTING_CACHE_SIZE)
+
+def _to_float(value):
+    """Decimal / Float 欄位轉換，空值或 0 維持原本回傳 None 的行為"""
+    return float(value) if value else None
+
+def load_images(accommodation_ids):
+    """一次查詢取得多個房源的圖片，回傳 {accommodation_id: [圖片資料]}"""
+    images_map = defaultdict(list)
+    if not accommodation_ids:
+        return images_map
+
+    images = AccommodationImage.query.filter(
+        AccommodationImage.accommodation_id.in_(accommodation_ids)
+    ).order_by(AccommodationImage.image_id).all()
+
+    for img in images:
+        images_map[img.accommodation_id].append({
+            "id": img.image_id,
+            "url": img.image_url,
+            "is_primary": img.is_primary
+        })
+    return images_map
+
+def load_amenities(accommodation_ids):
+    """一次查詢取得多個房源的設備，回傳 {accommodation_id: [設備資料]}"""
+    amenities_map = defaultdict(list)
+    if not accommodation_ids:
+        return amenities_map
+
+    rows = db.session.query(AccommodationAmenity.accommodation_id, Amenity).join(
+        Amenity, AccommodationAmenity.amenity_id == Amenity.amenity_id
+    ).filter(
+        AccommodationAmenity.accommodation_id.in_(accommodation_ids)
+    ).order_by(Amenity.amenity_id).all()
+
+    for accommodation_id, amenity in rows:
+        amenities_map[accommodation_id].append({
+            "id": amenity.amenity_id,
+            "name": amenity.name,
+            "category": amenity.category
+        })
+    return amenities_map
+
+def primary_image_url(images):
+    """從圖片列表中取出主圖網址"""
+    for img in images:
+        if img["is_primary"]:
+            return img["url"]
+    return None
+
+def serialize_accommodation(acc, images, amenities):
+    """將房源轉換為列表 / 詳情共用的基本格式"""
+    return {
+        "accommodation_id": acc.accommodation_id,
+        "owner_id": acc.owner_id,
+        "title": acc.title,
+        "description": acc.description,
+        "property_type": acc.property_type,
+        "rent_price": float(acc.rent_price),
+        "deposit": _to_float(acc.deposit),
+        "address": acc.address,
+        "district": acc.district,
+        "city": acc.city,
+        "room_count": acc.room_count,
+        "bathroom_count": acc.bathroom_count,
+        "studio_count": acc.studio_count,
+        "studio_available": acc.studio_available,
+        "single_count": acc.single_count,
+        "single_available": acc.single_available,
+        "contact_info": acc.contact_info,
+        "area": _to_float(acc.area),
+        "studio_area": _to_float(acc.studio_area),
+        "single_area": _to_float(acc.single_area),
+        "distance_to_university": acc.distance_to_university,
+        "images": images,
+        "amenities": amenities,
+        "room_info": {
+            "studio": {
+                "total": acc.studio_count or 0,
+                "available": acc.studio_available or 0,
+                "area": _to_float(acc.studio_area) or _to_float(acc.area)
+            },
+            "single": {
+                "total": acc.single_count or 0,
+                "available": acc.single_available or 0,
+                "area": _to_float(acc.single_area) or _to_float(acc.area)
+            }
+        },
+        "is_furnished": acc.is_furnished,
+        "has_water_bill": acc.has_water_bill,
+        "has_electricity_bill": acc.has_electricity_bill,
+        "has_internet": acc.has_internet,
+        "created_at": acc.created_at.isoformat(),
+        "updated_at": acc.updated_at.isoformat() if acc.updated_at else None
+    }
+
+def _listing_entries(accommodations):
+    """取得房源的快取項目，只對未命中或已過期的房源載入圖片與設備"""
+    entries = {}
+    missing = []
+    for acc in accommodations:
+        cached = listing_cache.get(acc.accommodation_id)
+        if cached and cached[0] == acc.updated_at:
+            entries[acc.accommodation_id] = cached
+        else:
+            missing.append(acc)
+
+    if missing:
+        ids = [acc.accommodation_id for acc in missing]
+        images_map = load_images(ids)
+        amenities_map = load_amenities(ids)
+        for acc in missing:
+            data = serialize_accommodation(
+                acc,
+                images_map.get(acc.accommodation_id, []),
+                amenities_map.get(acc.accommodation_id, [])
+            )
+            entry = (acc.updated_at, data, dumps(data))
+            listing_cache.set(acc.accommodation_id, entry)
+            entries[acc.accommodation_id] = entry
+
+    return [entries[acc.accommodation_id] for acc in accommodations]
+
+def serialize_accommodations(accommodations):
+    """批次序列化房源：圖片與設備各只查詢一次，並重用快取中的結果"""
+    return [dict(entry[1]) for entry in _listing_entries(accommodations)]
+
+def render_accommodations_json(accommodations):
+    """回傳各房源已編碼的 JSON 片段，供列表頁直接拼接"""
+    return [entry[2] for entry in _listing_entries(accommodations)]
+
+def splice_json(items_key, fragments, **fields):
+    """將已編碼的 JSON 片段拼接為完整的回應內容"""
+    head = dumps(fields)[:-1]
+    separator = ',' if fields else ''
+    return f'{head}{separator}"{items_key}":[{",".join(fragments)}]}}'
+
+def invalidate_listing(accommodation_id):
+    """移除單一房源的快取"""
+    listing_cache.pop(accommodation_id)
+
+# 房源、圖片或設備變更時，交易提交後才清除快取，避免其他請求在提交前重新快取舊資料；
+# 回滾時也清除，丟棄本交易中序列化的未提交資料
+def _invalidate_listings(accommodation_ids):
+    for accommodation_id in accommodation_ids:
+        invalidate_listing(accommodation_id)
+
+@event.listens_for(Accommodation, 'after_update')
+@event.listens_for(Accommodation, 'after_delete')
+@event.listens_for(AccommodationImage, 'after_insert')
+@event.listens_for(AccommodationImage, 'after_update')
+@event.listens_for(AccommodationImage, 'after_delete')
+@event.listens_for(AccommodationAmenity, 'after_insert')
+@event.listens_for(AccommodationAmenity, 'after_update')
+@event.listens_for(AccommodationAmenity, 'after_delete')
+def _listing_changed(mapper, connection, target):
+    on_commit(object_session(target), 'listing_changes', [target.accommodation_id], _invalidate_listings,
+              on_rollback=True)
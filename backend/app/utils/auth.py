@@ -0,0 +1,122 @@
+from collections import namedtuple
+from functools import wraps
+from flask import g, session, jsonify # type: ignore
+from sqlalchemy import event # type: ignore
+from sqlalchemy.orm import object_session # type: ignore
+from app.extensions import db
+from app.models.user import User
+from app.utils.cache import TTLCache
+from app.utils.tx_hooks import on_commit
+
+# 共用的身份驗證層
+#
+# 目前登入的用戶每個請求只解析一次並存放在 g.current_user；
+# 解析結果來自短時間的用戶快照快取，User 資料變更的交易提交後立即失效，
+# 其他程序中的變更最多延遲 USER_CACHE_TTL 秒生效。
+
+USER_CACHE_TTL = 30  # 秒
+USER_CACHE_SIZE = 2048
+
+class UserSnapshot(namedtuple('UserSnapshot', [
+    'user_id', 'username', 'user_role', 'is_active', 'is_verified'
+])):
+    """權限檢查用的唯讀用戶資料，需要修改用戶時請另外查詢 User"""
+    __slots__ = ()
+
+    def is_admin(self):
+        return self.user_role in ['admin', 'superuser']
+
+    def is_superuser(self):
+        return self.user_role == 'superuser'
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+def get_user_snapshot(user_id):
+    """取得用戶快照，不存在時回傳 None"""
+    if user_id is None:
+        return None
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+
+    row = db.session.query(
+        User.user_id, User.username, User.user_role, User.is_active, User.is_verified
+    ).filter(User.user_id == user_id).first()
+    if row is None:
+        return None
+
+    snapshot = UserSnapshot(*row)
+    user_cache.set(user_id, snapshot)
+    return snapshot
+
+def invalidate_user(user_id):
+    """移除單一用戶的快照"""
+    user_cache.pop(user_id)
+
+def current_user():
+    """目前登入的用戶快照，同一請求中只解析一次；未登入時回傳 None"""
+    if 'current_user' not in g:
+        g.current_user = get_user_snapshot(session.get('user_id'))
+    return g.current_user
+
+def login_required(f):
+    """用戶身份驗證裝飾器"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({"message": "請先登入"}), 401
+
+        return f(*args, **kwargs)
+    return decorated
+
+def admin_required(f):
+    """管理員身份驗證裝飾器"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({"message": "請先登入"}), 401
+
+        user = current_user()
+        if not user or not user.is_admin():
+            return jsonify({"message": "需要管理員權限"}), 403
+
+        return f(*args, **kwargs)
+    return decorated
+
+def superuser_required(f):
+    """超級管理員身份驗證裝飾器"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({"message": "請先登入"}), 401
+
+        user = current_user()
+        if not user or not user.is_superuser():
+            return jsonify({"message": "需要超級管理員權限"}), 403
+
+        return f(*args, **kwargs)
+    return decorated
+
+def check_owner(user_id):
+    """檢查是否為本人或管理員"""
+    if 'user_id' not in session:
+        return False
+
+    user = current_user()
+    return str(session.get('user_id')) == str(user_id) or bool(user and user.is_admin())
+
+# 用戶資料變更或刪除時，交易提交後才清除快照，避免其他請求在提交前重新快取舊資料；
+# 回滾時也清除，丟棄本交易中快取的未提交資料
+def _invalidate_users(user_ids):
+    for user_id in user_ids:
+        invalidate_user(user_id)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    on_commit(object_session(target), 'user_changes', [target.user_id], _invalidate_users, on_rollback=True)
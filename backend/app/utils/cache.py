@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """執行緒安全的 LRU 快取，超過容量時淘汰最久未使用的項目"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """回傳快取統計資料，方便除錯與監控"""
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+class TTLCache(LRUCache):
+    """有存活時間的 LRU 快取，項目超過 ttl 秒後視為不存在"""
+
+    def __init__(self, maxsize=1024, ttl=60, timer=time.monotonic):
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self._timer = timer
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = super().get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= self._timer():
+                self._data.pop(key, None)
+                self.hits -= 1
+                self.misses += 1
+                return default
+            return value
+
+    def set(self, key, value):
+        super().set(key, (self._timer() + self.ttl, value))
+
+    def pop(self, key, default=None):
+        item = super().pop(key)
+        return default if item is None else item[1]
@@ -0,0 +1,341 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time as time_module
+from datetime import datetime
+from app.extensions import db
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 30  # 秒，連續寫入失敗時重試間隔的上限
+MAX_CONSECUTIVE_FAILURES = 3  # 逐筆寫入時連續失敗此筆數即停止
+
+def _try_lock(f):
+    """對日誌檔取得不等待的排他鎖，已被其他程序持有時回傳 False（關閉檔案即釋放）"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def _to_record(entry):
+    return {
+        'seq': entry['seq'],
+        'sender_id': entry['sender_id'],
+        'receiver_id': entry['receiver_id'],
+        'message': entry['message'],
+        'time': entry['time'].isoformat() if entry['time'] else None
+    }
+
+class ChatMessageWriter:
+    """
+    聊天訊息的延遲寫入（write-behind）佇列
+
+    訊息先寫入本機的附加式日誌（journal）並放進記憶體緩衝區，立即回傳讓 Socket.IO 推播，
+    再由背景工作依筆數或時間批次寫入資料庫，送達延遲不再受資料庫寫入延遲影響。
+
+    每個程序使用自己的日誌檔（CHAT_JOURNAL_PATH 加上 .<pid>），並在使用期間持有檔案鎖。
+    日誌格式為每行一筆 JSON：
+        {"seq": 1, "sender_id": ..., "receiver_id": ..., "message": ..., "time": ...}
+        {"committed": [1, 2, ...]}
+    資料庫提交成功後才會寫入 committed 標記並壓縮日誌。伺服器程序處理第一個請求或訊息時，
+    會接手未被任何程序鎖定的日誌（上次當機留下的訊息）；flask db 等指令不會重播日誌。
+    若在提交成功與寫入標記之間當機，重播時可能重複寫入該批訊息。
+
+    批次寫入失敗時改為逐筆寫入，只有失敗的訊息放回緩衝區並以遞增的間隔重試；
+    重試 CHAT_WRITE_MAX_RETRIES 次仍失敗的訊息移到失敗紀錄（CHAT_JOURNAL_PATH 加上 .dead），
+    不再阻擋其他訊息寫入。
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.batch_size = 100
+        self.flush_interval = 0.5
+        self.max_retries = 8
+        self.journal_path = None
+        self.fsync = False
+        self._buffer = []
+        self._seq = 0
+        self._failures = 0  # 連續發生寫入失敗的次數
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._journal = None
+        self._socketio = None
+        self._wakeup = threading.Event()
+        self._running = False
+
+    def init_app(self, app, socketio=None):
+        self.app = app
+        self.enabled = app.config.get('CHAT_WRITE_BEHIND', True)
+        self.batch_size = app.config.get('CHAT_WRITE_BATCH_SIZE', 100)
+        self.flush_interval = app.config.get('CHAT_WRITE_FLUSH_INTERVAL', 0.5)
+        self.max_retries = app.config.get('CHAT_WRITE_MAX_RETRIES', 8)
+        self.fsync = app.config.get('CHAT_JOURNAL_FSYNC', False)
+        self.journal_path = app.config.get('CHAT_JOURNAL_PATH') or \
+            os.path.join(os.path.dirname(app.instance_path), 'chat_journal.log')
+        self._socketio = socketio
+
+        if self.enabled:
+            # 只在實際處理請求的伺服器程序啟動，指令列工具建立 app 時不重播日誌
+            app.before_request(self.start)
+
+    def start(self):
+        """接手上次留下的日誌並啟動背景工作，重複呼叫時不做任何事"""
+        if self._running or not self.enabled:
+            return
+        with self._start_lock:
+            if self._running:
+                return
+            own_path = f'{self.journal_path}.{os.getpid()}'
+            self._journal = open(own_path, 'a+', encoding='utf-8')
+            if not _try_lock(self._journal):
+                self._journal.close()
+                self._journal = None
+                raise RuntimeError(f'聊天日誌 {own_path} 已被其他程序使用')
+
+            recovered = self._take_journal(self._journal)
+            for path in self._journal_files():
+                if path == own_path:
+                    continue
+                with open(path, 'a+', encoding='utf-8') as f:
+                    if not _try_lock(f):
+                        continue  # 其他程序仍在使用
+                    recovered.extend(self._take_journal(f))
+                os.remove(path)
+
+            with self._lock:
+                for entry in recovered:
+                    self._seq += 1
+                    entry['seq'] = self._seq
+                    self._write_journal(_to_record(entry))
+                    self._buffer.append(entry)
+            if recovered:
+                logger.info(f"已從聊天日誌接手 {len(recovered)} 筆未寫入的訊息")
+
+            self._running = True
+            if self._socketio is not None:
+                self._socketio.start_background_task(self._run, self._socketio.sleep)
+            else:
+                threading.Thread(target=self._run, args=(time_module.sleep,), daemon=True).start()
+            atexit.register(self.shutdown)
+
+    def enqueue(self, sender_id, receiver_id, message, time):
+        """加入一筆待寫入的訊息"""
+        if not self.enabled:
+            self._persist([{
+                'sender_id': sender_id,
+                'receiver_id': receiver_id,
+                'message': message,
+                'time': time
+            }])
+            return
+
+        self.start()
+        with self._lock:
+            self._seq += 1
+            entry = {
+                'seq': self._seq,
+                'sender_id': sender_id,
+                'receiver_id': receiver_id,
+                'message': message,
+                'time': time
+            }
+            self._write_journal(_to_record(entry))
+            self._buffer.append(entry)
+            # 寫入失敗期間依重試間隔寫入，不因緩衝區已滿而提前重試
+            should_flush = len(self._buffer) >= self.batch_size and not self._failures
+
+        if should_flush:
+            self._wakeup.set()
+
+    def pending(self, user_a, user_b):
+        """回傳兩位用戶之間尚未寫入資料庫的訊息"""
+        pair = {str(user_a), str(user_b)}
+        with self._lock:
+            return [
+                entry for entry in self._buffer
+                if {str(entry['sender_id']), str(entry['receiver_id'])} == pair
+            ]
+
+    def flush(self):
+        """將緩衝區的訊息以單一交易寫入資料庫，失敗時逐筆寫入以隔離有問題的訊息"""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._buffer
+                self._buffer = []
+            if not batch:
+                self._failures = 0
+                return 0
+
+            with self.app.app_context():
+                try:
+                    self._persist(batch)
+                    failed, untried = [], []
+                except Exception as e:
+                    logger.error(f"批次寫入聊天訊息失敗，改為逐筆寫入: {str(e)}")
+                    failed, untried = self._persist_each(batch)
+
+            retry, dead = [], []
+            for entry in failed:
+                entry['attempts'] = entry.get('attempts', 0) + 1
+                (dead if entry['attempts'] >= self.max_retries else retry).append(entry)
+            if dead:
+                self._dead_letter(dead)
+
+            retry = sorted(retry + untried, key=lambda entry: entry['seq'])
+            retry_seqs = {entry['seq'] for entry in retry}
+            with self._lock:
+                self._buffer = retry + self._buffer
+                self._failures = self._failures + 1 if failed else 0
+                self._write_journal({'committed': [
+                    entry['seq'] for entry in batch if entry['seq'] not in retry_seqs
+                ]})
+                self._compact_journal()
+            return len(batch) - len(failed) - len(untried)
+
+    def shutdown(self):
+        """停止背景工作並寫入所有剩餘訊息"""
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        self.flush()
+        with self._lock:
+            if self._journal:
+                # 仍有未寫入的訊息時保留日誌，下次啟動時接手
+                empty = not self._buffer
+                self._journal.close()
+                self._journal = None
+                if empty:
+                    os.remove(f'{self.journal_path}.{os.getpid()}')
+
+    def _run(self, sleep):
+        while self._running:
+            self._wakeup.wait(self._retry_delay())
+            self._wakeup.clear()
+            self.flush()
+            sleep(0)
+
+    def _retry_delay(self):
+        if not self._failures:
+            return self.flush_interval
+        return min(self.flush_interval * 2 ** self._failures, MAX_RETRY_DELAY)
+
+    def _persist(self, entries):
+        from app.models.chat import Message, Conversation
+        try:
+            Conversation.apply_messages(entries)
+            db.session.add_all([
+                Message(
+                    sender_id=entry['sender_id'],
+                    receiver_id=entry['receiver_id'],
+                    message=entry['message'],
+                    time=entry['time']
+                )
+                for entry in entries
+            ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _persist_each(self, entries):
+        """
+        逐筆寫入，回傳 (寫入失敗的訊息, 未嘗試的訊息)
+
+        連續 MAX_CONSECUTIVE_FAILURES 筆失敗時視為資料庫暫時無法使用，其餘訊息留待下次重試。
+        """
+        failed = []
+        consecutive = 0
+        for i, entry in enumerate(entries):
+            try:
+                self._persist([entry])
+                consecutive = 0
+            except Exception as e:
+                logger.error(f"寫入聊天訊息 {entry['seq']} 失敗: {str(e)}")
+                failed.append(entry)
+                consecutive += 1
+                if consecutive >= MAX_CONSECUTIVE_FAILURES:
+                    return failed, entries[i + 1:]
+        return failed, []
+
+    def _dead_letter(self, entries):
+        """將重試多次仍失敗的訊息附加到失敗紀錄，保留以便人工處理"""
+        with open(f'{self.journal_path}.dead', 'a', encoding='utf-8') as f:
+            for entry in entries:
+                record = {**_to_record(entry), 'attempts': entry['attempts'], 'pid': os.getpid()}
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        logger.error(f"{len(entries)} 筆聊天訊息重試 {self.max_retries} 次仍無法寫入，已移至 {self.journal_path}.dead")
+
+    def _journal_files(self):
+        """各程序的日誌檔（CHAT_JOURNAL_PATH 加上 .<pid>）"""
+        return [
+            path for path in glob.glob(f'{glob.escape(self.journal_path)}.*')
+            if path.rsplit('.', 1)[1].isdigit()
+        ]
+
+    def _write_journal(self, record):
+        if not self._journal:
+            return
+        self._journal.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _compact_journal(self):
+        """以仍在緩衝區中的訊息就地重寫日誌，重寫期間不釋放檔案鎖"""
+        if not self._journal:
+            return
+        self._journal.seek(0)
+        self._journal.truncate()
+        for entry in self._buffer:
+            self._journal.write(json.dumps(_to_record(entry), ensure_ascii=False) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _take_journal(self, f):
+        """讀出已鎖定日誌中尚未寫入資料庫的訊息，並清空該日誌"""
+        entries = []
+        committed = set()
+        f.seek(0)
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 當機時最後一行可能只寫了一半
+                logger.warning("略過聊天日誌中不完整的紀錄")
+                continue
+            if 'committed' in record:
+                committed.update(record['committed'])
+            else:
+                entries.append(record)
+
+        pending = [entry for entry in entries if entry['seq'] not in committed]
+        for entry in pending:
+            entry['time'] = datetime.fromisoformat(entry['time']) if entry['time'] else None
+        f.seek(0)
+        f.truncate()
+        f.flush()
+        return pending
+
+
+chat_writer = ChatMessageWriter()
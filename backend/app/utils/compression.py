@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+from flask import request # type: ignore
+from app.utils.cache import LRUCache
+
+try:
+    import brotli # type: ignore
+except ImportError:  # 未安裝時只提供 gzip
+    brotli = None
+
+# 回應壓縮
+#
+# 依 Accept-Encoding 協商 br / gzip，小於 COMPRESS_MIN_SIZE 的回應不壓縮（壓縮後反而可能更大）。
+# 由快取組成的回應（例如房源列表頁）以 cache_compressed() 標記，壓縮結果以內容雜湊為鍵快取，
+# 相同內容的熱門頁面只會壓縮一次。
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'image/svg+xml',
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+}
+
+ENCODINGS = ('br', 'gzip')
+
+compressed_cache = LRUCache(maxsize=256)
+
+def available_encodings():
+    """伺服器支援的編碼，依偏好排序"""
+    return [encoding for encoding in ENCODINGS if encoding != 'br' or brotli is not None]
+
+def compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config.get('COMPRESS_BROTLI_QUALITY', 5))
+    return gzip.compress(data, compresslevel=config.get('COMPRESS_GZIP_LEVEL', 6), mtime=0)
+
+def cache_compressed(response):
+    """標記回應內容可重複出現，壓縮結果會被快取"""
+    response.cache_compressed = True
+    return response
+
+def _should_compress(response):
+    return (
+        200 <= response.status_code < 300
+        and response.status_code != 206
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and 'Content-Encoding' not in response.headers
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+    )
+
+def compress_response(response, config):
+    """依請求的 Accept-Encoding 壓縮回應，回傳同一個 response"""
+    if request.method == 'HEAD' or not _should_compress(response):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    encoding = request.accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+
+    if getattr(response, 'cache_compressed', False):
+        key = (hashlib.blake2b(data, digest_size=16).digest(), encoding)
+        body = compressed_cache.get(key)
+        if body is None:
+            body = compress(data, encoding, config)
+            compressed_cache.set(key, body)
+    else:
+        body = compress(data, encoding, config)
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # 強 ETag 對應單一表示，壓縮後的內容使用不同的 ETag
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+def init_compression(app):
+    """註冊回應壓縮的 after_request 掛鉤"""
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+    compressed_cache.maxsize = app.config.get('COMPRESS_CACHE_SIZE', compressed_cache.maxsize)
+
+    @app.after_request
+    def compress_after_request(response):
+        return compress_response(response, app.config)
@@ -0,0 +1,508 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import datetime, date
+from decimal import Decimal
+import numpy as np
+from flask import current_app
+from sqlalchemy import inspect, select # type: ignore
+from app.extensions import db
+from app.utils.db_json import (
+    TableImportPlan, get_export_models, get_models_mapping, watermark_key,
+    open_snapshot, format_watermarks, stream_export_db_to_json, _iter_table_rows, _max_tombstone_id, _chunks,
+    WATERMARK_LAG
+)
+from app.utils.table_graph import supported_workers, run_tables
+from app.utils.json_provider import dumps
+
+# 欄式（columnar）快照格式
+#
+# 每個表格的每個欄位存成一個具型別的 NumPy 陣列，整個快照為未壓縮的 .npz（ZIP_STORED），
+# 讀取時直接以 np.memmap 對應到檔案中的位置並逐批解碼，不需要解析或複製整個檔案：
+#
+#   int / float / bool   int64 / float64 / bool，另有 .valid 標示非 NULL 的位置
+#   decimal              依欄位 scale 放大後存成 int64，還原時精確無誤差
+#   datetime / date      datetime64[us] / datetime64[D]，NULL 為 NaT
+#   str / bytes / json   Arrow 式的 .data（uint8）與 .offsets（int64）
+#
+# 欄位型別、筆數與 _metadata 以 JSON 存在 __schema__ 中。
+# 內容與 JSON 快照完全對應：同一份資料匯出成兩種格式，讀回的記錄相同，可以互相轉換。
+
+COLUMNAR_SUFFIX = '.npz'
+SCHEMA_MEMBER = '__schema__'
+TOMBSTONES = '_tombstones'
+
+CHUNK_ROWS = 10000  # 寫入與讀取時每批編碼 / 解碼的列數
+
+# 刪除紀錄的欄位（對應 SyncTombstone.to_dict）
+TOMBSTONE_KINDS = {'table': 'str', 'pk': 'json', 'deleted_at': 'datetime'}
+
+def is_columnar_snapshot(filepath):
+    return filepath.endswith(COLUMNAR_SUFFIX)
+
+def _column_kind(column):
+    """依欄位型別決定儲存方式"""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return 'json'
+    if python_type is bool:
+        return 'bool'
+    if python_type is int:
+        return 'int'
+    if python_type is float:
+        return 'float'
+    if python_type is Decimal:
+        scale = getattr(column.type, 'scale', None)
+        return f'decimal:{scale}' if scale is not None else 'decimal'
+    if python_type is datetime:
+        return 'datetime'
+    if python_type is date:
+        return 'date'
+    if python_type is str:
+        return 'str'
+    if python_type is bytes:
+        return 'bytes'
+    return 'json'
+
+def table_kinds(model_class):
+    """{欄位名稱: 儲存方式}，順序與 JSON 快照相同"""
+    return {attr.key: _column_kind(attr.columns[0]) for attr in inspect(model_class).column_attrs}
+
+def _encode_varlen(values, encode):
+    """變長欄位編碼為 data（所有值串接）與 offsets（每個值的起訖位置）"""
+    chunks = [b'' if value is None else encode(value) for value in values]
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.array([len(chunk) for chunk in chunks], dtype=np.int64))
+    data = np.frombuffer(b''.join(chunks), dtype=np.uint8)
+    return {'data': data, 'offsets': offsets}
+
+def _scaled_decimals(values, scale):
+    """依 scale 放大為整數；有任何值無法精確表示時回傳 None"""
+    scaled = []
+    for value in values:
+        if value is None:
+            scaled.append(0)
+            continue
+        shifted = Decimal(value).scaleb(scale)
+        if shifted != shifted.to_integral_value() or abs(shifted) >= 2 ** 63:
+            return None
+        scaled.append(int(shifted))
+    return np.array(scaled, dtype=np.int64)
+
+def encode_column(kind, values):
+    """
+    將一個欄位的值編碼為陣列
+
+    Returns:
+        (實際使用的儲存方式, {後綴: 陣列})；decimal 無法以整數表示時改以字串儲存
+    """
+    valid = np.array([value is not None for value in values], dtype=bool)
+    arrays = {}
+    if kind in ('int', 'float', 'bool'):
+        dtype = {'int': np.int64, 'float': np.float64, 'bool': np.bool_}[kind]
+        fill = dtype(0)
+        arrays['values'] = np.array([fill if value is None else value for value in values], dtype=dtype)
+    elif kind.startswith('decimal'):
+        scale = int(kind.split(':')[1]) if ':' in kind else None
+        scaled = _scaled_decimals(values, scale) if scale is not None else None
+        if scaled is None:
+            kind = 'decimal'
+            arrays.update(_encode_varlen(values, lambda value: str(value).encode('utf-8')))
+        else:
+            arrays['values'] = scaled
+    elif kind in ('datetime', 'date'):
+        unit = 'us' if kind == 'datetime' else 'D'
+        arrays['values'] = np.array(
+            [np.datetime64('NaT', unit) if value is None else np.datetime64(value, unit) for value in values],
+            dtype=f'datetime64[{unit}]'
+        )
+        # NaT 已表示 NULL
+        return kind, arrays
+    elif kind == 'bytes':
+        arrays.update(_encode_varlen(values, bytes))
+    elif kind == 'json':
+        arrays.update(_encode_varlen(values, lambda value: dumps(value).encode('utf-8')))
+    else:
+        arrays.update(_encode_varlen(values, lambda value: str(value).encode('utf-8')))
+    if not valid.all():
+        arrays['valid'] = valid
+    return kind, arrays
+
+def decode_column(kind, arrays):
+    """將陣列還原為 Python 值的清單（與從資料庫讀出的值相同）"""
+    if kind in ('datetime', 'date'):
+        return arrays['values'].tolist()
+
+    if 'values' in arrays:
+        values = arrays['values'].tolist()
+        if kind.startswith('decimal:'):
+            scale = -int(kind.split(':')[1])
+            values = [Decimal(value).scaleb(scale) for value in values]
+    else:
+        data = arrays['data'].tobytes()
+        offsets = arrays['offsets'].tolist()
+        values = [data[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+        # NULL 存成空字串，不是合法的 JSON 或 decimal，先依 .valid 略過
+        valid = arrays['valid'].tolist() if 'valid' in arrays else [True] * len(values)
+        if kind == 'json':
+            values = [json.loads(value) if ok else None for value, ok in zip(values, valid)]
+        elif kind == 'decimal':
+            values = [Decimal(value.decode('utf-8')) if ok else None for value, ok in zip(values, valid)]
+        elif kind != 'bytes':
+            values = [value.decode('utf-8') for value in values]
+
+    if 'valid' in arrays:
+        values = [value if ok else None for value, ok in zip(values, arrays['valid'].tolist())]
+    return values
+
+class ColumnEncoder:
+    """
+    依列分批編碼單一欄位
+
+    各成員陣列先附加到暫存檔，全部寫完後才知道長度，再加上 .npy 標頭寫入快照；
+    記憶體中只保留目前這一批的值。
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows = 0
+        self.has_null = False
+        self.data_size = 0  # 變長欄位已寫入的位元組數
+        self._files = {}  # 後綴 -> [暫存檔, dtype, 元素數]
+        self.append([])  # 沒有任何記錄時仍寫出各成員
+
+    def _append(self, suffix, array):
+        item = self._files.get(suffix)
+        if item is None:
+            item = self._files[suffix] = [tempfile.TemporaryFile(), array.dtype, 0]
+            if suffix == 'offsets':
+                item[0].write(np.zeros(1, dtype=np.int64).tobytes())
+                item[2] = 1
+        item[0].write(np.ascontiguousarray(array).tobytes())
+        item[2] += len(array)
+
+    def append(self, values):
+        kind, arrays = encode_column(self.kind, values)
+        if kind != self.kind:
+            self._decimals_to_text()
+            self.kind = kind
+        if kind not in ('datetime', 'date'):
+            valid = arrays.pop('valid', None)
+            if valid is None:
+                valid = np.ones(len(values), dtype=bool)
+            else:
+                self.has_null = True
+            self._append('valid', valid)
+        if 'offsets' in arrays:
+            self._append('data', arrays['data'])
+            self._append('offsets', arrays['offsets'][1:] + self.data_size)
+            self.data_size += len(arrays['data'])
+        else:
+            self._append('values', arrays['values'])
+        self.rows += len(values)
+
+    def _decimals_to_text(self):
+        """decimal 有值無法以整數表示時改以字串儲存：先將已寫入的整數值轉為字串"""
+        scale = -int(self.kind.split(':')[1])
+        values_file, _, _ = self._files.pop('values')
+        valid_file = self._files['valid'][0]
+        values_file.seek(0)
+        valid_file.seek(0)
+        scaled = np.fromfile(values_file, dtype=np.int64)
+        valid = np.fromfile(valid_file, dtype=bool)
+        valid_file.seek(0, os.SEEK_END)
+        values_file.close()
+        encoded = _encode_varlen(
+            [Decimal(value).scaleb(scale) if ok else None for value, ok in zip(scaled.tolist(), valid.tolist())],
+            lambda value: str(value).encode('utf-8')
+        )
+        self._append('data', encoded['data'])
+        self._append('offsets', encoded['offsets'][1:])
+        self.data_size = len(encoded['data'])
+
+    def write_members(self, archive, prefix):
+        """將各成員寫入快照並關閉暫存檔；沒有 NULL 時省略 .valid"""
+        for suffix, (f, dtype, count) in self._files.items():
+            if suffix != 'valid' or self.has_null:
+                with archive.open(f'{prefix}.{suffix}.npy', 'w', force_zip64=True) as out:
+                    np.lib.format.write_array_header_1_0(out, {
+                        'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (count,)
+                    })
+                    f.seek(0)
+                    shutil.copyfileobj(f, out)
+            f.close()
+        self._files = {}
+
+
+class TableEncoder:
+    """依列分批將表格記錄編碼為欄式"""
+
+    def __init__(self, kinds):
+        self.columns = {key: ColumnEncoder(kind) for key, kind in kinds.items()}
+        self.rows = 0
+
+    def append(self, records):
+        for key, column in self.columns.items():
+            column.append([record.get(key) for record in records])
+        self.rows += len(records)
+
+    def schema(self):
+        return {'rows': self.rows, 'columns': {key: column.kind for key, column in self.columns.items()}}
+
+
+def _write_member(archive, name, array):
+    with archive.open(f'{name}.npy', 'w', force_zip64=True) as f:
+        np.lib.format.write_array(f, np.ascontiguousarray(array), allow_pickle=False)
+
+class ColumnarWriter:
+    """依序寫入表格的 .npz 快照；成員不壓縮，才能在讀取時以記憶體對應"""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.schema = {'version': 1, 'tables': {}}
+        self.archive = zipfile.ZipFile(filepath, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+
+    def add_table(self, table_name, encoder):
+        """寫入已編碼完成的表格，回傳筆數"""
+        for key, column in encoder.columns.items():
+            column.write_members(self.archive, f'{table_name}/{key}')
+        self.schema['tables'][table_name] = encoder.schema()
+        return encoder.rows
+
+    def write_table(self, table_name, kinds, records, chunk_size=CHUNK_ROWS):
+        """將可迭代的記錄每 chunk_size 筆編碼一次後寫入，回傳筆數"""
+        encoder = TableEncoder(kinds)
+        for chunk in _chunks(records, chunk_size):
+            encoder.append(chunk)
+        return self.add_table(table_name, encoder)
+
+    def close(self, metadata):
+        self.schema['metadata'] = metadata
+        raw = dumps(self.schema).encode('utf-8')
+        _write_member(self.archive, SCHEMA_MEMBER, np.frombuffer(raw, dtype=np.uint8))
+        self.archive.close()
+
+
+def _slice_arrays(arrays, start, stop):
+    """取出欄位陣列中 [start, stop) 列的部分，變長欄位的 offsets 改為從 0 起算"""
+    sliced = {suffix: array[start:stop] for suffix, array in arrays.items() if suffix not in ('data', 'offsets')}
+    if 'offsets' in arrays:
+        offsets = np.asarray(arrays['offsets'][start:stop + 1])
+        sliced['data'] = arrays['data'][offsets[0]:offsets[-1]]
+        sliced['offsets'] = offsets - offsets[0]
+    return sliced
+
+class ColumnarSnapshot:
+    """
+    讀取 .npz 欄式快照
+
+    各欄位陣列以 np.memmap 直接對應到檔案中的位置，記錄逐批解碼，只有正在讀取的那一批會載入記憶體。
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        with zipfile.ZipFile(filepath) as archive:
+            with open(filepath, 'rb') as f:
+                self._offsets = {info.filename[:-len('.npy')]: self._array_location(f, info)
+                                 for info in archive.infolist()}
+        self.schema = json.loads(self.array(SCHEMA_MEMBER).tobytes())
+        self.metadata = self.schema.get('metadata', {})
+        self.tables = list(self.schema['tables'])
+        # {表格: {欄位: [成員後綴]}}
+        self._members = {}
+        for name in self._offsets:
+            if name != SCHEMA_MEMBER:
+                table_name, member = name.split('/', 1)
+                key, suffix = member.rsplit('.', 1)
+                self._members.setdefault(table_name, {}).setdefault(key, []).append(suffix)
+
+    @staticmethod
+    def _array_location(f, info):
+        """回傳成員中 .npy 陣列的 (dtype, shape, 檔案位移)"""
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"快照成員 {info.filename} 經過壓縮，無法以記憶體對應讀取")
+        # ZIP 本地檔頭：固定 30 bytes，之後是檔名與額外欄位
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = np.frombuffer(f.read(4), dtype='<u2').tolist()
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        if fortran_order:
+            raise ValueError(f"不支援的陣列排列方式: {info.filename}")
+        return dtype, shape, f.tell()
+
+    def array(self, name):
+        dtype, shape, offset = self._offsets[name]
+        if not shape or shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self.filepath, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+    def rows(self, table_name):
+        return self.schema['tables'][table_name]['rows']
+
+    def records(self, table_name, chunk_size=CHUNK_ROWS):
+        """逐筆產生表格記錄（與 JSON 快照載入後的結構相同，值為原始型別），每次解碼 chunk_size 列"""
+        columns = self.schema['tables'][table_name]['columns']
+        members = self._members.get(table_name, {})
+        arrays = {
+            key: {suffix: self.array(f'{table_name}/{key}.{suffix}') for suffix in members.get(key, ())}
+            for key in columns
+        }
+        keys = list(columns)
+        total = self.rows(table_name)
+        for start in range(0, total, chunk_size):
+            stop = min(start + chunk_size, total)
+            decoded = [decode_column(columns[key], _slice_arrays(arrays[key], start, stop)) for key in keys]
+            for row in zip(*decoded):
+                yield dict(zip(keys, row))
+
+
+class SnapshotTable:
+    """快照中的單一表格：len() 為筆數，迭代時才從記憶體對應的欄位逐批解碼"""
+
+    def __init__(self, snapshot, table_name):
+        self.snapshot = snapshot
+        self.table_name = table_name
+
+    def __len__(self):
+        return self.snapshot.rows(self.table_name)
+
+    def __iter__(self):
+        return self.snapshot.records(self.table_name)
+
+
+def load_snapshot(filepath):
+    """
+    依副檔名讀取 JSON（含 .gz / .zst）或 .npz 欄式快照
+
+    回傳 {表格: 記錄, '_metadata': ...}；欄式快照的表格為 SnapshotTable，迭代時才解碼，不會一次載入整份快照。
+    """
+    if is_columnar_snapshot(filepath):
+        snapshot = ColumnarSnapshot(filepath)
+        data = {name: SnapshotTable(snapshot, name) for name in snapshot.tables}
+        data['_metadata'] = snapshot.metadata
+        return data
+    with open_snapshot(filepath) as f:
+        return json.load(f)
+
+def stream_export_db_to_columnar(filepath, batch_size=1000, on_table=None, since=None, workers=1):
+    """
+    將資料庫匯出為 .npz 欄式快照，參數與回傳值與 stream_export_db_to_json 相同
+
+    每個表格依 batch_size 逐批讀取並編碼到暫存檔，記憶體用量與表格大小無關；
+    workers 大於 1 時同時編碼多個表格，再依序寫入快照。
+    """
+    from app.models.sync import SyncTombstone
+    os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+    kind = 'full' if since is None else 'delta'
+    models = {model_class.__tablename__: model_class for model_class in get_export_models()}
+    stats = {}
+
+    started = time.perf_counter()
+    writer = ColumnarWriter(filepath)
+    try:
+        # 先寫入刪除紀錄：匯出期間發生的刪除會留到下一份增量
+        if since is not None:
+            last_id = since.get(TOMBSTONES, 0)
+            stmt = select(SyncTombstone).where(SyncTombstone.id > last_id) \
+                .order_by(SyncTombstone.id).execution_options(yield_per=batch_size)
+            encoder = TableEncoder(TOMBSTONE_KINDS)
+            for chunk in _chunks(db.session.execute(stmt).scalars(), batch_size):
+                encoder.append([tombstone.to_dict() for tombstone in chunk])
+                last_id = chunk[-1].id
+            writer.add_table(TOMBSTONES, encoder)
+            stats[TOMBSTONES] = {'rows': encoder.rows, 'seconds': 0.0, 'watermark': last_id}
+        else:
+            stats[TOMBSTONES] = {'rows': 0, 'seconds': 0.0, 'watermark': _max_tombstone_id()}
+
+        def encode_table(table_name):
+            model_class = models[table_name]
+            key = watermark_key(model_class)
+            table_since = since.get(table_name) if since is not None and key else None
+            encoder = TableEncoder(table_kinds(model_class))
+            latest = None
+            for chunk in _chunks(_iter_table_rows(model_class, batch_size, table_since), batch_size):
+                encoder.append(chunk)
+                values = [record[key] for record in chunk if record[key] is not None] if key else []
+                if values:
+                    latest = max(values if latest is None else values + [latest])
+            return encoder, latest
+
+        app = current_app._get_current_object()
+        results = run_tables(app, list(models), encode_table, supported_workers(workers))
+        for table_name, ((encoder, latest), elapsed) in results.items():
+            rows = writer.add_table(table_name, encoder)
+            table_since = since.get(table_name) if since is not None else None
+            stats[table_name] = {
+                'rows': rows,
+                'seconds': elapsed,
+                'watermark': latest - WATERMARK_LAG if latest is not None else table_since
+            }
+            if on_table:
+                on_table(table_name, rows, elapsed)
+    finally:
+        metadata = {
+            'kind': kind,
+            'exported_at': datetime.now().isoformat(),
+            'tables': list(models)
+        }
+        if since is not None:
+            metadata['since'] = since
+        writer.close(metadata)
+
+    elapsed = time.perf_counter() - started
+    total_rows = sum(table['rows'] for table in stats.values())
+    return {
+        'kind': kind,
+        'tables': stats,
+        'watermarks': format_watermarks(stats),
+        'rows': total_rows,
+        'seconds': elapsed,
+        'rows_per_second': total_rows / elapsed if elapsed > 0 else 0.0
+    }
+
+def export_snapshot(filepath, **kwargs):
+    """依副檔名匯出 JSON（含 .gz / .zst）或 .npz 欄式快照"""
+    if is_columnar_snapshot(filepath):
+        return stream_export_db_to_columnar(filepath, **kwargs)
+    return stream_export_db_to_json(filepath, **kwargs)
+
+def convert_snapshot(source, target):
+    """
+    在 JSON 與 .npz 欄式快照之間轉換，內容不變
+
+    JSON 中的 Decimal 與時間以數字和字串表示，寫入欄式快照前依模型欄位型別還原。
+    """
+    data = load_snapshot(source)
+    metadata = data.pop('_metadata', {})
+    tombstones = data.pop(TOMBSTONES, None)
+
+    if is_columnar_snapshot(target):
+        models = get_models_mapping()
+        writer = ColumnarWriter(target)
+        try:
+            if tombstones is not None:
+                writer.write_table(TOMBSTONES, TOMBSTONE_KINDS, tombstones)
+            for table_name, records in data.items():
+                plan = TableImportPlan(models[table_name], table_name)
+                writer.write_table(table_name, table_kinds(plan.model_class),
+                                   (plan.convert(record) for record in records))
+        finally:
+            writer.close(metadata)
+        return
+
+    with open_snapshot(target, 'w') as f:
+        f.write('{')
+        if tombstones is not None:
+            data = {TOMBSTONES: tombstones, **data}
+        for table_name, records in data.items():
+            f.write(f'\n  {json.dumps(table_name)}: [')
+            for index, record in enumerate(records):
+                f.write((',\n    ' if index else '\n    ') + dumps(record))
+            f.write('\n  ],' if len(records) else '],')
+        f.write(f'\n  "_metadata": {dumps(metadata)}\n}}\n')
@@ -1,27 +1,21 @@
+import gzip
+import io
 import json
 import importlib
 import os
-from datetime import datetime, date
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from itertools import chain, islice
+from datetime import datetime, date, timedelta
 from decimal import Decimal
 from flask import current_app
-from sqlalchemy import inspect # type: ignore
+from sqlalchemy import inspect, select, delete, update, and_, or_, func, literal, String # type: ignore
 from app.extensions import db
-
-# 自定義 JSON 編碼器，處理特殊類型
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        # 處理 Decimal 類型
-        if isinstance(obj, Decimal):
-            return float(obj)
-        
-        # 處理日期和時間類型
-        if isinstance(obj, (datetime, date)):
-            return obj.isoformat()
-        
-        # 其他特殊類型處理可以在這裡添加
-        
-        # 默認行為
-        return super().default(obj)
+from app.utils.table_graph import dependency_levels, supported_workers, run_tables
+from app.utils.json_provider import dumps
+from app.utils.geo import encode_geohash
 
 # 將模型對象轉換為可序列化字典
 def serialize_model(model):
@@ -47,6 +41,242 @@ def serialize_model(model):
             
     return serialized
 
+# 快照檔壓縮格式：依副檔名判斷
+SNAPSHOT_COMPRESSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+# 不匯出的表格（執行期暫存資料）
+EXPORT_EXCLUDED_TABLES = {'server_sessions', 'sync_tombstones'}
+
+# 增量快照的水位欄位：有 updated_at 的表格以它判斷變更，
+# 只新增不修改的表格以建立時間判斷，其餘表格每次完整匯出
+APPEND_ONLY_WATERMARK_COLUMNS = {
+    'comment_likes': 'created_at',
+    'reply_likes': 'created_at',
+    'favorites': 'created_at',
+    'chat_message': 'time',
+}
+
+# 水位往回保留的時間，涵蓋匯出當下尚未提交的交易與延遲寫入的聊天訊息；
+# 邊界附近的記錄可能在下一份增量中重複出現，匯入時以主鍵更新，不影響結果
+WATERMARK_LAG = timedelta(seconds=30)
+
+def _compression_for(filepath):
+    for compression, suffix in SNAPSHOT_COMPRESSIONS.items():
+        if filepath.endswith(suffix):
+            return compression
+    return None
+
+def open_snapshot(filepath, mode='r'):
+    """
+    以文字模式開啟快照檔，依副檔名自動處理 gzip（.gz）或 zstd（.zst）壓縮
+
+    zstd 需要另外安裝 zstandard 套件。
+    """
+    compression = _compression_for(filepath)
+    if compression == 'gzip':
+        return gzip.open(filepath, mode + 't', encoding='utf-8')
+    if compression == 'zstd':
+        try:
+            import zstandard # type: ignore
+        except ImportError:
+            raise RuntimeError("使用 zstd 壓縮需要安裝 zstandard 套件")
+        return zstandard.open(filepath, mode + 't', encoding='utf-8')
+    return open(filepath, mode, encoding='utf-8')
+
+def get_table_models():
+    """從 SQLAlchemy registry 取得所有表格名稱到模型類的映射"""
+    importlib.import_module('app.models')  # 確保所有模型都已載入
+    return {mapper.local_table.name: mapper.class_ for mapper in db.Model.registry.mappers}
+
+def get_export_models():
+    """取得要匯出的模型類（依表名排序）"""
+    models = get_table_models()
+    return [models[name] for name in sorted(models) if name not in EXPORT_EXCLUDED_TABLES]
+
+def watermark_key(model_class):
+    """增量匯出判斷變更的欄位名稱，沒有時回傳 None（每次完整匯出）"""
+    if 'updated_at' in inspect(model_class).column_attrs:
+        return 'updated_at'
+    return APPEND_ONLY_WATERMARK_COLUMNS.get(model_class.__tablename__)
+
+def _changed_since(column, watermark):
+    cutoff = watermark.replace(microsecond=0)
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # SQLite 以字串比較時間，不含微秒的字串涵蓋同一秒內有無微秒的兩種儲存格式
+        return column >= literal(cutoff.strftime('%Y-%m-%d %H:%M:%S'), String)
+    return column >= cutoff
+
+def _iter_table_rows(model_class, batch_size, since=None):
+    """以 yield_per 逐批讀取表格，每次只保留一批資料在記憶體中；since 為增量匯出的水位"""
+    attrs = list(inspect(model_class).column_attrs)
+    keys = [attr.key for attr in attrs]
+    stmt = select(*[attr.columns[0] for attr in attrs])
+    if since is not None:
+        stmt = stmt.where(_changed_since(getattr(model_class, watermark_key(model_class)), since))
+    for row in db.session.execute(stmt.execution_options(yield_per=batch_size)):
+        yield dict(zip(keys, row))
+
+def _write_tombstones(stream, after_id, batch_size):
+    """寫入 ID 大於 after_id 的刪除紀錄，回傳 (筆數, 最大 ID)"""
+    from app.models.sync import SyncTombstone
+    rows = 0
+    last_id = after_id
+    stream.write('\n  "_tombstones": [')
+    stmt = select(SyncTombstone).where(SyncTombstone.id > after_id) \
+        .order_by(SyncTombstone.id).execution_options(yield_per=batch_size)
+    for tombstone in db.session.execute(stmt).scalars():
+        stream.write(',\n    ' if rows else '\n    ')
+        stream.write(dumps(tombstone.to_dict()))
+        rows += 1
+        last_id = tombstone.id
+    stream.write('\n  ],' if rows else '],')
+    return rows, last_id
+
+def _max_tombstone_id():
+    from app.models.sync import SyncTombstone
+    return db.session.query(func.max(SyncTombstone.id)).scalar() or 0
+
+def _write_table_rows(out, model_class, batch_size, since=None):
+    """寫入單一表格的記錄（不含外層括號），回傳 (筆數, 水位欄位的最大值)"""
+    key = watermark_key(model_class)
+    table_since = since.get(model_class.__tablename__) if since is not None and key else None
+    rows = 0
+    latest = None
+    for record in _iter_table_rows(model_class, batch_size, table_since):
+        out.write(',\n    ' if rows else '\n    ')
+        out.write(dumps(record))
+        rows += 1
+        if key and record[key] is not None and (latest is None or record[key] > latest):
+            latest = record[key]
+    return rows, latest
+
+def write_tables_json(stream, model_classes, batch_size=1000, on_table=None, since=None, metadata=None, workers=1):
+    """
+    將多個表格以串流方式寫成 JSON 快照（格式與 export_db_to_json 相同，每筆記錄一行）
+
+    Args:
+        stream: 可寫入的文字串流
+        model_classes: 要匯出的模型類
+        batch_size: 每批從資料庫讀取的筆數
+        on_table: 每個表格完成時的回呼 on_table(table_name, rows, seconds)
+        since: 增量匯出的水位 {table_name: datetime, '_tombstones': 墓碑 ID}，None 表示完整匯出
+        metadata: 額外寫入 _metadata 的資訊
+        workers: 同時匯出的表格數；大於 1 時各表格先寫入暫存檔，再依序合併
+
+    Returns:
+        {table_name: {'rows': 筆數, 'seconds': 秒數, 'watermark': 下次增量匯出的水位}}
+    """
+    stats = {}
+    stream.write('{')
+
+    # 先寫入刪除紀錄：匯出期間發生的刪除會留到下一份增量
+    if since is not None:
+        rows, last_id = _write_tombstones(stream, since.get('_tombstones', 0), batch_size)
+        stats['_tombstones'] = {'rows': rows, 'seconds': 0.0, 'watermark': last_id}
+    else:
+        stats['_tombstones'] = {'rows': 0, 'seconds': 0.0, 'watermark': _max_tombstone_id()}
+
+    models = {model_class.__tablename__: model_class for model_class in model_classes}
+    workers = supported_workers(workers)
+
+    def finish(table_name, rows, latest, elapsed):
+        table_since = since.get(table_name) if since is not None else None
+        stats[table_name] = {
+            'rows': rows,
+            'seconds': elapsed,
+            'watermark': latest - WATERMARK_LAG if latest is not None else table_since
+        }
+        if on_table:
+            on_table(table_name, rows, elapsed)
+
+    if workers <= 1:
+        for table_name, model_class in models.items():
+            started = time.perf_counter()
+            stream.write(f'\n  {json.dumps(table_name)}: [')
+            rows, latest = _write_table_rows(stream, model_class, batch_size, since)
+            stream.write('\n  ],' if rows else '],')
+            finish(table_name, rows, latest, time.perf_counter() - started)
+    else:
+        def export_table(table_name):
+            out = tempfile.TemporaryFile('w+', encoding='utf-8')
+            rows, latest = _write_table_rows(out, models[table_name], batch_size, since)
+            return out, rows, latest
+
+        results = run_tables(current_app._get_current_object(), list(models), export_table, workers)
+        for table_name, ((out, rows, latest), elapsed) in results.items():
+            with out:
+                out.seek(0)
+                stream.write(f'\n  {json.dumps(table_name)}: [')
+                shutil.copyfileobj(out, stream)
+                stream.write('\n  ],' if rows else '],')
+            finish(table_name, rows, latest, elapsed)
+
+    metadata = {
+        **(metadata or {}),
+        'exported_at': datetime.now().isoformat(),
+        'tables': [name for name in stats if not name.startswith('_')]
+    }
+    stream.write(f'\n  "_metadata": {dumps(metadata)}\n}}\n')
+    return stats
+
+def parse_watermarks(watermarks):
+    """將 sync_status.json 中的水位字串還原為 datetime（墓碑水位為整數 ID）"""
+    return {
+        name: value if name == '_tombstones' or value is None else datetime.fromisoformat(value)
+        for name, value in (watermarks or {}).items()
+    }
+
+def format_watermarks(tables):
+    """從匯出統計取出水位，轉為可寫入 JSON 的格式"""
+    return {
+        name: stats['watermark'].isoformat() if isinstance(stats['watermark'], datetime) else stats['watermark']
+        for name, stats in tables.items()
+    }
+
+def stream_export_db_to_json(filepath, batch_size=1000, on_table=None, since=None, workers=1):
+    """
+    以串流方式將資料庫匯出為 JSON 快照，記憶體用量與資料庫大小無關
+
+    依副檔名決定壓縮方式：.json、.json.gz（gzip）或 .json.zst（zstd）。
+    提供 since（parse_watermarks 的結果）時為增量匯出：只包含水位之後變更的記錄，
+    以及 _tombstones 刪除紀錄；沒有水位欄位的表格仍完整匯出。
+    workers 大於 1 時在資料庫允許的情況下同時匯出多個表格。
+
+    Returns:
+        匯出統計：{'kind': 'full' 或 'delta', 'tables': {...}, 'watermarks': {...},
+                   'rows': 總筆數, 'seconds': 秒數, 'rows_per_second': 每秒筆數}
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+    kind = 'full' if since is None else 'delta'
+    metadata = {'kind': kind}
+    if since is not None:
+        metadata['since'] = since
+
+    started = time.perf_counter()
+    with open_snapshot(filepath, 'w') as f:
+        tables = write_tables_json(f, get_export_models(), batch_size, on_table, since, metadata, workers)
+
+    elapsed = time.perf_counter() - started
+    total_rows = sum(table['rows'] for table in tables.values())
+    return {
+        'kind': kind,
+        'tables': tables,
+        'watermarks': format_watermarks(tables),
+        'rows': total_rows,
+        'seconds': elapsed,
+        'rows_per_second': total_rows / elapsed if elapsed > 0 else 0.0
+    }
+
+def prune_tombstones(up_to_id):
+    """刪除已包含在完整快照中的刪除紀錄"""
+    from app.models.sync import SyncTombstone
+    deleted = SyncTombstone.query.filter(SyncTombstone.id <= up_to_id).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
 # 將資料庫導出為 JSON
 def export_db_to_json(filepath=None):
     """
@@ -58,59 +288,282 @@ def export_db_to_json(filepath=None):
     Returns:
         如果指定了 filepath，則返回 True 表示成功；否則返回 JSON 字符串
     """
-    data = {}
-    
-    # 按照表名動態查找所有模型類
-    models_module = importlib.import_module('app.models')
-    model_classes = []
-    
-    # 獲取所有模型類
-    for item_name in dir(models_module):
-        item = getattr(models_module, item_name)
-        if isinstance(item, type) and hasattr(item, '__tablename__'):
-            model_classes.append(item)
-    
-    # 導出每個模型的數據
-    for model_class in model_classes:
-        table_name = model_class.__tablename__
-        records = model_class.query.all()
-        data[table_name] = [serialize_model(record) for record in records]
-    
-    # 添加元數據
-    data['_metadata'] = {
-        'exported_at': datetime.now().isoformat(),
-        'tables': list(data.keys())
-    }
-    
-    # 將數據轉換為 JSON，使用自定義編碼器
-    json_data = json.dumps(data, ensure_ascii=False, indent=2, cls=CustomJSONEncoder)
-    
-    # 如果指定了文件路徑，則保存到文件
+    # 如果指定了文件路徑，則以串流方式寫入文件
     if filepath:
-        os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(json_data)
+        stream_export_db_to_json(filepath)
         return True
     
     # 否則返回 JSON 字符串
-    return json_data
+    buffer = io.StringIO()
+    write_tables_json(buffer, get_export_models())
+    return buffer.getvalue()
+
+# 匯入時每批寫入的筆數
+IMPORT_CHUNK_SIZE = 1000
+
+def _chunks(iterable, size):
+    """將可迭代物件切成每批 size 筆的清單"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _coerce_decimal(value):
+    return Decimal(str(value)) if isinstance(value, (int, float)) else value
+
+def _coerce_datetime(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return value
+
+def _coerce_date(value):
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            pass
+    return value
+
+_COERCERS = {
+    Decimal: _coerce_decimal,
+    datetime: _coerce_datetime,
+    date: _coerce_date,
+}
+
+# 匯入以 bulk 寫入，不會觸發模型的 ORM 事件：由事件計算的欄位在轉換記錄時補上
+def _derive_conversation_key(row):
+    if not row.get('conversation_key') and row.get('sender_id') is not None and row.get('receiver_id') is not None:
+        from app.models.chat import make_conversation_key
+        row['conversation_key'] = make_conversation_key(row['sender_id'], row['receiver_id'])
+
+def _derive_geohash(row):
+    if 'latitude' not in row or 'longitude' not in row:
+        return
+    if row['latitude'] is None or row['longitude'] is None:
+        row['geohash'] = None
+    else:
+        row['geohash'] = encode_geohash(float(row['latitude']), float(row['longitude']))
+
+ROW_DERIVATIONS = {
+    'chat_message': _derive_conversation_key,
+    'accommodations': _derive_geohash,
+}
+
+# 房源的子表格：與 ORM 事件相同，寫入或刪除時遞增所屬房源的 version（見 models/accommodation.py）
+LISTING_CHILD_TABLES = {'accommodation_images', 'accommodation_amenities'}
+
+def _touch_listings(accommodation_ids, chunk_size=IMPORT_CHUNK_SIZE):
+    """遞增房源的 version 並更新 updated_at"""
+    from app.models.accommodation import Accommodation
+    accommodation_ids = list({i for i in accommodation_ids if i is not None})
+    for start in range(0, len(accommodation_ids), chunk_size):
+        db.session.execute(
+            update(Accommodation)
+            .where(Accommodation.accommodation_id.in_(accommodation_ids[start:start + chunk_size]))
+            .values(version=Accommodation.version + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+class TableImportPlan:
+    """單一表格的匯入計畫：欄位、主鍵與各欄位的型別轉換函式（每個表格只計算一次）"""
+
+    def __init__(self, model_class, table_name):
+        mapper = inspect(model_class)
+        self.model_class = model_class
+        self.table_name = table_name
+        self.pk_keys = [mapper.get_property_by_column(column).key for column in mapper.primary_key]
+        self.coercers = {}
+        for attr in mapper.column_attrs:
+            try:
+                python_type = attr.columns[0].type.python_type
+            except NotImplementedError:
+                python_type = None
+            self.coercers[attr.key] = _COERCERS.get(python_type)
+
+        # 相容性處理：舊格式以 '_id' 表示主鍵，或主鍵 id 以「表名單數_id」表示
+        singular_id = f"{table_name[:-1]}_id"
+        self.id_alias = 'id' if 'id' in self.coercers else (singular_id if singular_id in self.coercers else None)
+        self.pk_fallback = singular_id if 'id' in self.pk_keys and singular_id not in self.coercers else None
+        self.derive = ROW_DERIVATIONS.get(model_class.__tablename__)
+        # 有 version 欄位的表格：更新既有記錄時與 ORM 更新相同，遞增本地的 version
+        self.versioned = 'version' in self.coercers and len(self.pk_keys) == 1
+        self.listing_child = model_class.__tablename__ in LISTING_CHILD_TABLES
+
+    def _coerce(self, key, value):
+        coercer = self.coercers[key]
+        return coercer(value) if coercer and value is not None else value
+
+    def convert(self, record):
+        """轉換單筆記錄，只保留模型中存在的欄位"""
+        row = {}
+        for key, value in record.items():
+            if key == '_id':
+                key = self.id_alias
+            if key in self.coercers:
+                row[key] = self._coerce(key, value)
+        if self.pk_fallback and row.get('id') is None and record.get(self.pk_fallback) is not None:
+            row['id'] = self._coerce('id', record[self.pk_fallback])
+        if self.derive:
+            self.derive(row)
+        return row
+
+    def pk_of(self, row):
+        """取得主鍵值，缺少任何主鍵時回傳 None"""
+        values = tuple(row.get(key) for key in self.pk_keys)
+        return None if any(value is None for value in values) else values
+
+    def existing_pks(self):
+        """以單一查詢取得表格中所有既有主鍵"""
+        columns = [getattr(self.model_class, key) for key in self.pk_keys]
+        return {tuple(row) for row in db.session.query(*columns).all()}
+
+def _apply_tombstones(tombstones, models, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    套用增量快照中的刪除紀錄，回傳刪除筆數
+
+    以 Core DELETE 執行，不會觸發 ORM 事件，因此不會在本地產生新的刪除紀錄。
+    """
+    pks_by_table = defaultdict(list)
+    for tombstone in tombstones:
+        pks_by_table[tombstone['table']].append(tombstone['pk'])
+
+    deleted = 0
+    for table_name, pks in pks_by_table.items():
+        if table_name not in models:
+            current_app.logger.warning(f"找不到表 {table_name} 對應的模型類，略過刪除紀錄")
+            continue
+        plan = TableImportPlan(models[table_name], table_name)
+        table = plan.model_class.__table__
+        for start in range(0, len(pks), chunk_size):
+            conditions = [
+                and_(*[getattr(plan.model_class, key) == plan._coerce(key, pk.get(key)) for key in plan.pk_keys])
+                for pk in pks[start:start + chunk_size]
+            ]
+            deleted += db.session.execute(delete(table).where(or_(*conditions))).rowcount
+        if plan.listing_child:
+            # 設備的主鍵包含房源 ID；圖片的刪除紀錄只有圖片 ID，而圖片不影響搜尋與篩選索引
+            _touch_listings(plan._coerce('accommodation_id', pk.get('accommodation_id')) for pk in pks)
+    db.session.commit()
+    return deleted
+
+def _import_table(plan, records, update_existing=True, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    批次匯入單一表格
+
+    既有主鍵一次載入後在記憶體中比對，記錄每 chunk_size 筆為一批：新記錄以 bulk_insert_mappings、
+    既有記錄以 bulk_update_mappings 寫入，整個表格在同一個交易中提交。
+    records 只會被迭代一次，可以是逐批解碼的欄式快照表格。
+    bulk 寫入不會觸發 ORM 事件，彙總資料在所有表格匯入後由 _backfill_derived 補上。
+    """
+    table_results = {'processed': 0, 'inserted': 0, 'updated': 0, 'errors': 0}
+    existing = plan.existing_pks()
+
+    for chunk in _chunks(records, chunk_size):
+        # 同一主鍵重複出現時以最後一筆為準（已寫入的主鍵之後視為既有記錄）
+        rows_by_pk = {}
+        for record in chunk:
+            row = plan.convert(record)
+            pk = plan.pk_of(row)
+            if pk is None:
+                current_app.logger.warning(f"跳過缺少主鍵的記錄: {record}")
+                table_results['errors'] += 1
+                continue
+            rows_by_pk[pk] = row
+
+        inserts = [row for pk, row in rows_by_pk.items() if pk not in existing]
+        updates = [row for pk, row in rows_by_pk.items() if pk in existing] if update_existing else []
+        if inserts:
+            db.session.bulk_insert_mappings(plan.model_class, inserts)
+        if updates and plan.versioned:
+            updates = [{key: value for key, value in row.items() if key != 'version'} for row in updates]
+        if updates:
+            db.session.bulk_update_mappings(plan.model_class, updates)
+            if plan.versioned:
+                pk_column = getattr(plan.model_class, plan.pk_keys[0])
+                db.session.execute(
+                    update(plan.model_class)
+                    .where(pk_column.in_([row[plan.pk_keys[0]] for row in updates]))
+                    .values(version=plan.model_class.version + 1)
+                    .execution_options(synchronize_session=False)
+                )
+        if plan.listing_child:
+            _touch_listings(row.get('accommodation_id') for row in chain(inserts, updates))
+        existing.update(rows_by_pk)
+
+        table_results['inserted'] += len(inserts)
+        table_results['updated'] += len(updates)
+    db.session.commit()
+
+    table_results['processed'] = table_results['inserted'] + table_results['updated']
+    return table_results
+
+def _backfill_derived(tables):
+    """
+    以整批 SQL 補上匯入時未由 ORM 事件維護的資料，回傳執行的項目
+
+    tables 為本次有寫入或刪除記錄的表格：評論的讚數與回覆數、聊天對話摘要，
+    以及房源到各地點的距離（同時標記篩選索引重新載入有變動的房源）；
+    房源或其子表格有變動時，本行程已建立的搜尋與篩選索引立即重新載入 version 有變動的房源。
+    """
+    done = []
+    if tables & {'comments', 'comment_likes', 'replies', 'reply_likes'}:
+        from app.models.comments import recount_counters
+        recount_counters(db.session.connection())
+        done.append('comment_counters')
+    if 'chat_message' in tables:
+        from app.models.chat import Conversation
+        Conversation.backfill_from_messages()
+        done.append('chat_conversations')
+    db.session.commit()
+    if tables & {'accommodations', 'accommodation_distances'}:
+        from app.utils.distances import recompute_distances
+        recompute_distances()
+        done.append('accommodation_distances')
+    if tables & ({'accommodations'} | LISTING_CHILD_TABLES):
+        from app.utils.search import refresh_search_index
+        from app.utils.facets import refresh_facet_index
+        refresh_search_index(force=True)
+        refresh_facet_index(force=True)
+        done.extend(['search_index', 'facet_index'])
+    return done
+
+def _safe_import_table(plan, sources, update_existing):
+    """匯入單一表格（sources 為快照中對應到此表格的各記錄來源），失敗時回滾並將整個表格計為錯誤"""
+    try:
+        return _import_table(plan, chain.from_iterable(sources), update_existing=update_existing)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"匯入 {plan.table_name} 資料時出錯: {str(e)}")
+        return {'processed': 0, 'inserted': 0, 'updated': 0, 'errors': sum(len(records) for records in sources)}
 
 # 從 JSON 導入資料到資料庫
-def import_db_from_json(filepath=None, json_data=None, clear_existing=False, update_existing=True):
+def import_db_from_json(filepath=None, json_data=None, clear_existing=False, update_existing=True, data=None, workers=1):
     """
     從 JSON 文件或字符串導入數據到資料庫
     
+    表格依外鍵相依關係分層匯入：同一層的表格互不相依，workers 大於 1 且資料庫允許時同時匯入。
+    
     Args:
-        filepath: JSON 文件路徑
+        filepath: JSON 文件路徑（可為 .json.gz / .json.zst）
         json_data: JSON 字符串，與 filepath 二選一
         clear_existing: 是否清空現有數據
         update_existing: 是否更新已存在的記錄
+        data: 已解析的快照內容（各表格為記錄清單或 load_snapshot 回傳的 SnapshotTable），提供時忽略 filepath 與 json_data
+        workers: 同一層中同時匯入的表格數
         
     Returns:
-        導入結果統計
+        導入結果統計（每個表格包含所在層級與耗時；backfilled 為匯入後補上的彙總資料）
     """
-    if filepath:
-        with open(filepath, 'r', encoding='utf-8') as f:
+    if data is not None:
+        pass
+    elif filepath:
+        with open_snapshot(filepath) as f:
             data = json.load(f)
     elif json_data:
         data = json.loads(json_data)
@@ -121,180 +574,60 @@ def import_db_from_json(filepath=None, json_data=None, clear_existing=False, upd
     models = get_models_mapping()
     
     # 記錄導入結果
-    results = {'imported': 0, 'errors': 0, 'tables': {}}
+    results = {'imported': 0, 'errors': 0, 'deleted': 0, 'tables': {}}
+    
+    # 快照中有資料的表格（舊表名對應到實際的模型表名）；記錄保持原本的形式，匯入時才逐批讀取
+    snapshot_tables = {}
+    for name, records in data.items():
+        if name.startswith('_') or isinstance(records, (dict, str)) or len(records) == 0:
+            continue
+        if name not in models:
+            current_app.logger.warning(f"找不到表 {name} 對應的模型類")
+            results['tables'][name] = {'status': 'skipped', 'reason': 'no_model'}
+            continue
+        snapshot_tables.setdefault(models[name].__tablename__, []).append(records)
+    
+    plans = {name: TableImportPlan(models[name], name) for name in snapshot_tables}
+    levels = dependency_levels([plan.model_class.__table__ for plan in plans.values()])
     
-    # 開始導入
     try:
-        # 設定表格導入順序，先導入基本表格，再導入相依表格
-        table_order = [
-            "users",             # 用戶表通常是基礎表格
-            "amenities",         # 設施表通常無外鍵依賴
-            "accommodations",    # 房源表依賴用戶表
-            "accommodation_amenities",  # 依賴房源表和設施表
-            "accommodation_images",     # 依賴房源表
-            "reviews",           # 依賴用戶表和房源表
-            "favorites",         # 依賴用戶表和房源表
-            "sublets",           # 可能依賴用戶表和房源表
-            "leases",            # 依賴用戶表和房源表
-            "maintenance_requests",     # 依賴用戶表和房源表
-            "maintenance_images",       # 依賴維修請求表
-            "fraud_reports",     # 依賴用戶表和房源表
-            "chat_message",      # 依賴用戶表
-            "messages",          # 備選表名
-            "comments",          # 依賴用戶表和房源表
-            "replies",           # 依賴評論表和用戶表
-            "comment_likes",     # 依賴評論表和用戶表
-            "reply_likes",       # 依賴回覆表和用戶表
-            "notifications",     # 依賴用戶表
-            "verification_codes",  # 依賴用戶表
-            "password_resets"    # 依賴用戶表
-        ]
+        # 增量快照：先套用刪除，再寫入新增與修改的記錄（刪除後又以相同主鍵新增的記錄才會保留）
+        if data.get('_tombstones'):
+            results['deleted'] = _apply_tombstones(data['_tombstones'], models)
         
-        # 先處理有順序要求的表格
-        for table_name in table_order:
-            if table_name in data and isinstance(data[table_name], list) and len(data[table_name]) > 0:
-                # 檢查表名是否有對應的模型
-                if table_name not in models:
-                    current_app.logger.warning(f"找不到表 {table_name} 對應的模型類")
-                    results['tables'][table_name] = {'status': 'skipped', 'reason': 'no_model'}
-                    continue
-                
-                model_class = models[table_name]
-                table_results = {'processed': 0, 'errors': 0}
-                
-                # 如果需要清空現有數據
-                if clear_existing:
-                    model_class.query.delete()
-                    db.session.commit()
-                
-                # 檢查表的主鍵列
-                inspector = inspect(db.engine)
-                try:
-                    pk_columns = inspector.get_pk_constraint(table_name)['constrained_columns']
-                except:
-                    # 如果無法獲取主鍵信息，使用默認的 'id' 或表名+'_id'
-                    pk_columns = ['id'] if hasattr(model_class, 'id') else [f"{table_name[:-1]}_id"]
-                
-                # 導入記錄
-                for record_data in data[table_name]:
-                    try:
-                        # 檢查是否包含所有主鍵
-                        has_all_pks = True
-                        pk_values = {}
-                        for pk in pk_columns:
-                            if pk not in record_data or record_data[pk] is None:
-                                # 相容性處理: 如果是 user_id 但有 _id
-                                if pk == 'user_id' and '_id' in record_data:
-                                    record_data['user_id'] = record_data['_id']
-                                # 相容性處理: 如果是 id 但有 xxx_id
-                                elif pk == 'id' and f"{table_name[:-1]}_id" in record_data:
-                                    record_data['id'] = record_data[f"{table_name[:-1]}_id"]
-                                else:
-                                    has_all_pks = False
-                                    break
-                            else:
-                                pk_values[pk] = record_data[pk]
-                        
-                        # 如果缺少主鍵，跳過這條記錄
-                        if not has_all_pks:
-                            current_app.logger.warning(f"跳過缺少主鍵的記錄: {record_data}")
-                            table_results['errors'] += 1
-                            continue
-                        
-                        # 查詢是否已存在相同主鍵的記錄
-                        filter_conditions = []
-                        for pk, value in pk_values.items():
-                            filter_conditions.append(getattr(model_class, pk) == value)
-                        
-                        existing_record = None
-                        if filter_conditions:
-                            existing_record = model_class.query.filter(*filter_conditions).first()
-                        
-                        # 篩選有效的欄位
-                        valid_data = {}
-                        for key, value in record_data.items():
-                            # 特殊處理 '_id' 轉 'id' 或 'table_id'
-                            mapped_key = key
-                            if key == '_id':
-                                if hasattr(model_class, 'id'):
-                                    mapped_key = 'id'
-                                elif hasattr(model_class, f"{table_name[:-1]}_id"):
-                                    mapped_key = f"{table_name[:-1]}_id"
-                            
-                            # 確保該欄位存在於模型中
-                            if hasattr(model_class, mapped_key):
-                                # 處理特殊類型
-                                attr = getattr(model_class, mapped_key)
-                                if hasattr(attr, 'type') and hasattr(attr.type, 'python_type'):
-                                    column_type = attr.type.python_type
-                                    if column_type == Decimal and isinstance(value, (int, float)):
-                                        value = Decimal(str(value))
-                                    elif column_type == datetime and isinstance(value, str):
-                                        try:
-                                            value = datetime.fromisoformat(value)
-                                        except:
-                                            pass
-                                
-                                valid_data[mapped_key] = value
-                        
-                        # 如果記錄已存在且更新模式開啟，則更新現有記錄
-                        if existing_record and update_existing and not clear_existing:
-                            for key, value in valid_data.items():
-                                setattr(existing_record, key, value)
-                            
-                            # 更新會話
-                            db.session.add(existing_record)
-                            table_results['processed'] += 1
-                            results['imported'] += 1
-                        elif not existing_record:
-                            # 直接使用參數創建模型實例
-                            record = model_class(**valid_data)
-                            
-                            # 添加到會話
-                            db.session.add(record)
-                            table_results['processed'] += 1
-                            results['imported'] += 1
-                        
-                        # 每處理 50 筆記錄提交一次，避免事務過大
-                        if table_results['processed'] % 50 == 0:
-                            db.session.flush()
-                            
-                    except Exception as e:
-                        current_app.logger.error(f"導入 {table_name} 記錄時出錯: {str(e)}")
-                        table_results['errors'] += 1
-                        results['errors'] += 1
-                
-                # 每個表格導入完成後提交一次
-                try:
-                    db.session.commit()
-                except Exception as e:
-                    db.session.rollback()
-                    current_app.logger.error(f"提交 {table_name} 資料時出錯: {str(e)}")
-                    table_results['errors'] += len(data[table_name])
-                    results['errors'] += len(data[table_name])
-                    results['imported'] -= table_results['processed']
-                    table_results['processed'] = 0
-                
-                # 保存表結果
+        # 清空時由相依層級最深的表格開始刪除
+        if clear_existing:
+            for level in reversed(levels):
+                for table_name in level:
+                    plans[table_name].model_class.query.delete()
+            db.session.commit()
+        
+        workers = supported_workers(workers, write=True)
+        app = current_app._get_current_object()
+        for depth, level in enumerate(levels):
+            level_results = run_tables(
+                app, level,
+                lambda table_name: _safe_import_table(plans[table_name], snapshot_tables[table_name], update_existing),
+                workers
+            )
+            for table_name, (table_results, elapsed) in level_results.items():
+                results['imported'] += table_results['processed']
+                results['errors'] += table_results['errors']
                 results['tables'][table_name] = {
                     'status': 'imported' if table_results['processed'] > 0 else 'error',
-                    'processed': table_results['processed'],
-                    'errors': table_results['errors']
+                    **table_results,
+                    'level': depth,
+                    'seconds': elapsed
                 }
-                
                 current_app.logger.info(f"表 {table_name} 匯入完成: {table_results['processed']} 筆成功, {table_results['errors']} 筆失敗")
         
-        # 處理未在順序列表中的表格
-        for table_name, records in data.items():
-            if table_name not in table_order and not table_name.startswith('_') and isinstance(records, list) and len(records) > 0:
-                # 檢查表名是否有對應的模型
-                if table_name not in models:
-                    current_app.logger.warning(f"找不到表 {table_name} 對應的模型類")
-                    results['tables'][table_name] = {'status': 'skipped', 'reason': 'no_model'}
-                    continue
-                
-                # 這裡應該實現與上面相同的處理邏輯
-                # 為避免程式碼重複，您可以將處理表格的邏輯抽取到一個單獨的函數中
+        # 補上由 ORM 事件維護的計數器、對話摘要與距離
+        changed = {name for name, table in results['tables'].items() if table.get('processed')}
+        changed.update(
+            models[tombstone['table']].__tablename__
+            for tombstone in data.get('_tombstones') or () if tombstone['table'] in models
+        )
+        results['backfilled'] = _backfill_derived(changed)
                 
     except Exception as e:
         db.session.rollback()
@@ -304,43 +637,7 @@ def import_db_from_json(filepath=None, json_data=None, clear_existing=False, upd
     return results
 
 def get_models_mapping():
-    """獲取表格名稱到模型類的映射"""
-    from app.models.user import User, VerificationCode, PasswordReset
-    from app.models.accommodation import (
-        Accommodation, AccommodationImage, Amenity, 
-        AccommodationAmenity, Favorite
-    )
-    from app.models.review import Review
-    from app.models.sublet import Sublet
-    from app.models.lease import Lease
-    from app.models.maintenance import MaintenanceRequest, MaintenanceImage
-    from app.models.notification import Notification
-    from app.models.fraud import FraudReport
-    from app.models.chat import Message
-    from app.models.comments import Comment, Reply, CommentLike, ReplyLike, Report
-    
-    # 建立表格名稱到模型類的映射
-    return {
-        'users': User,
-        'verification_codes': VerificationCode,
-        'password_resets': PasswordReset,
-        'accommodations': Accommodation,
-        'accommodation_images': AccommodationImage,
-        'amenities': Amenity,
-        'accommodation_amenities': AccommodationAmenity,
-        'favorites': Favorite,
-        'reviews': Review,
-        'sublets': Sublet,
-        'leases': Lease,
-        'maintenance_requests': MaintenanceRequest,
-        'maintenance_images': MaintenanceImage,
-        'notifications': Notification,
-        'fraud_reports': FraudReport,
-        'messages': Message,  # 注意檢查實際表名是否為 'messages' 或 'chat_messages'
-        'chat_message': Message,  # 備選表名
-        'comments': Comment,
-        'replies': Reply,
-        'comment_likes': CommentLike,
-        'reply_likes': ReplyLike,
-        'reports': Report
-    }
\ No newline at end of file
+    """獲取表格名稱到模型類的映射（涵蓋所有模型，另保留舊快照使用的表名）"""
+    models = get_table_models()
+    models['messages'] = models['chat_message']  # 舊版快照的聊天訊息表名
+    return models
@@ -0,0 +1,128 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from flask import g, request, has_app_context, has_request_context # type: ignore
+from flask_sqlalchemy.session import Session # type: ignore
+from sqlalchemy import event # type: ignore
+
+# 讀寫分離：唯讀請求的查詢送往 replica，寫入一律送往主資料庫
+#
+# 設定 REPLICA_DATABASE_URL 後才會啟用（以 SQLALCHEMY_BINDS 的 'replica' 加入），未設定時行為不變。
+# 路由規則依序為：
+#   1. use_primary() / use_replica() 明確指定
+#   2. flush 與 INSERT / UPDATE / DELETE 一律走主資料庫；同一個 session 寫入過之後的讀取也改走主資料庫
+#   3. 沒有請求的背景工作走主資料庫
+#   4. GET / HEAD 請求走 replica，除非用戶在 REPLICA_STICKY_SECONDS 秒內寫入過（讀到自己剛寫入的資料）
+#      寫入成功後以獨立的短期 Cookie（primary_until）標記，不論以 session 或 JWT 驗證；
+#      讀取時只看這個 Cookie，不存取 session，公開列表的回應不會因此加上 Vary: Cookie
+#
+# 需要即時一致的讀取（例如剛寫入的資料）應包在 use_primary() 中。
+
+REPLICA_BIND = 'replica'
+READ_ONLY_METHODS = ('GET', 'HEAD')
+PRIMARY_COOKIE = 'primary_until'
+
+@contextmanager
+def _route(target):
+    if not has_app_context():
+        yield
+        return
+    previous = g.get('db_route')
+    g.db_route = target
+    try:
+        yield
+    finally:
+        g.db_route = previous
+
+def use_primary():
+    """區塊內的查詢一律送往主資料庫"""
+    return _route('primary')
+
+def use_replica():
+    """區塊內的讀取送往 replica（寫入仍走主資料庫），可用於背景報表等可容忍延遲的查詢"""
+    return _route('replica')
+
+
+class RoutingSession(Session):
+    """依請求與查詢種類在主資料庫與 replica 之間選擇連線"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if not has_app_context() or REPLICA_BIND not in self._db.engines:
+            return False
+        if self._flushing:
+            return False
+        if clause is not None and not getattr(clause, 'is_select', False):
+            if getattr(clause, 'is_dml', False):
+                self.info['wrote'] = True
+            return False
+        if self.info.get('wrote'):
+            return False
+
+        route = g.get('db_route')
+        if route is not None:
+            return route == 'replica'
+        if not has_request_context() or request.method not in READ_ONLY_METHODS:
+            return False
+        return _primary_until() < time.time()
+
+def _primary_until():
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0))
+    except ValueError:
+        return 0
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+
+def configure_replica(config):
+    """將 REPLICA_DATABASE_URL 加入 SQLALCHEMY_BINDS，需在 db.init_app 之前呼叫"""
+    replica_url = config.get('REPLICA_DATABASE_URL')
+    if replica_url:
+        config['SQLALCHEMY_BINDS'] = {**(config.get('SQLALCHEMY_BINDS') or {}), REPLICA_BIND: replica_url}
+    return bool(replica_url)
+
+def sync_sqlite_replica(db):
+    """以 SQLite backup API 將主資料庫完整複製到 replica 檔案（本機開發與測試用的 replica）"""
+    primary, replica = db.engines[None], db.engines[REPLICA_BIND]
+    if primary.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise RuntimeError("只有主資料庫與 replica 都是 SQLite 時才能以此方式同步")
+    source = primary.raw_connection()
+    target = sqlite3.connect(replica.url.database)
+    try:
+        source.driver_connection.backup(target)
+    finally:
+        target.close()
+        source.close()
+    # 既有連線可能仍持有舊的頁面快取
+    replica.dispose()
+
+def init_routing(app, db):
+    """註冊讀寫分離的請求掛鉤與 replica-sync 指令，需在 db.init_app 之後呼叫"""
+    if REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+
+    sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 10)
+
+    @app.after_request
+    def remember_write(response):
+        # 寫入成功後的一段時間內，此用戶端的讀取改走主資料庫
+        if db.session.info.get('wrote') and response.status_code < 400:
+            response.set_cookie(
+                PRIMARY_COOKIE, f'{time.time() + sticky_seconds:.3f}', max_age=sticky_seconds,
+                httponly=True, secure=app.config.get('SESSION_COOKIE_SECURE', False),
+                samesite=app.config.get('SESSION_COOKIE_SAMESITE', 'Lax')
+            )
+        return response
+
+    @app.cli.command('replica-sync')
+    def replica_sync():
+        """將 SQLite 主資料庫複製到 replica"""
+        sync_sqlite_replica(db)
+        print("已同步 replica")
@@ -0,0 +1,207 @@
+import math
+import time
+from datetime import datetime
+import numpy as np
+from flask import current_app, has_app_context # type: ignore
+from sqlalchemy import Float, bindparam, cast, event, func, inspect, select # type: ignore
+from app.extensions import db
+from app.models.accommodation import Accommodation, AccommodationDistance
+from app.utils.facets import record_changes
+from app.utils.geo import haversine
+
+# 房源到各地點的距離
+#
+# 地點由 POINTS_OF_INTEREST 設定，每個房源到各地點的距離存於 accommodation_distances，
+# distance_to_university 為到 UNIVERSITY_POI 的距離。
+# 新增房源或修改經緯度時由 ORM 事件計算；變更地點設定後以 flask recompute-distances 批次重算，
+# 批次重算以 numpy 一次計算所有房源與地點的距離矩陣。
+
+DEFAULT_POINTS_OF_INTEREST = {'main_gate': (24.97028, 121.19278)}
+DISTANCE_DECIMALS = 1  # 公尺以下一位，未超過此精度的差異不寫入
+
+def points_of_interest():
+    """{地點名稱: (緯度, 經度)}"""
+    if has_app_context():
+        return current_app.config.get('POINTS_OF_INTEREST') or DEFAULT_POINTS_OF_INTEREST
+    return DEFAULT_POINTS_OF_INTEREST
+
+def university_poi():
+    name = current_app.config.get('UNIVERSITY_POI') if has_app_context() else None
+    return name or next(iter(points_of_interest()))
+
+def distance_matrix(lat, lng, pois):
+    """各房源（列）到各地點（欄）的距離，單位公尺"""
+    poi_lat = np.array([point[0] for point in pois.values()], dtype=np.float64)
+    poi_lng = np.array([point[1] for point in pois.values()], dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)[:, None]
+    lng = np.asarray(lng, dtype=np.float64)[:, None]
+    return np.round(haversine(lat, lng, poi_lat[None, :], poi_lng[None, :]), DISTANCE_DECIMALS)
+
+def _load_coordinates():
+    """有經緯度的房源，依 ID 排序：(ids, lat, lng, distance_to_university)"""
+    # 以 Core 查詢並在資料庫端轉為浮點數，省去 ORM 與 Decimal 的轉換
+    rows = db.session.connection().execute(select(
+        Accommodation.accommodation_id,
+        cast(Accommodation.latitude, Float), cast(Accommodation.longitude, Float),
+        Accommodation.distance_to_university
+    ).where(
+        Accommodation.latitude.isnot(None), Accommodation.longitude.isnot(None)
+    ).order_by(Accommodation.accommodation_id)).fetchall()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0), np.zeros(0)
+    ids, lat, lng, current = zip(*rows)
+    return (
+        np.array(ids, dtype=np.int64), np.array(lat, dtype=np.float64), np.array(lng, dtype=np.float64),
+        np.array([np.nan if value is None else value for value in current], dtype=np.float64),
+    )
+
+def _stored_summaries():
+    """各地點已存距離的 (筆數, 距離總和, 距離乘以房源 ID 的總和)，用於判斷是否需要逐筆比對"""
+    distances = AccommodationDistance.__table__
+    rows = db.session.connection().execute(select(
+        distances.c.poi, func.count(), func.sum(distances.c.distance),
+        func.sum(distances.c.distance * distances.c.accommodation_id)
+    ).group_by(distances.c.poi)).fetchall()
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+def _unchanged(summary, ids, column):
+    count, total, weighted = summary
+    return (
+        count == len(ids)
+        and math.isclose(total or 0, float(column.sum()), rel_tol=1e-9, abs_tol=1e-6)
+        and math.isclose(weighted or 0, float((column * ids).sum()), rel_tol=1e-9, abs_tol=1e-6)
+    )
+
+def _stored_column(ids, poi):
+    """某地點已存的距離依 ids 排列（缺少為 NaN），以及不在 ids 中的房源 ID"""
+    distances = AccommodationDistance.__table__
+    rows = db.session.connection().execute(
+        select(distances.c.accommodation_id, distances.c.distance).where(distances.c.poi == poi)
+    ).fetchall()
+    column = np.full(len(ids), np.nan)
+    if not rows:
+        return column, []
+    row_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    values = np.array([row[1] for row in rows], dtype=np.float64)
+    positions = np.minimum(np.searchsorted(ids, row_ids), max(len(ids) - 1, 0))
+    valid = ids[positions] == row_ids if len(ids) else np.zeros(len(rows), dtype=bool)
+    column[positions[valid]] = values[valid]
+    return column, row_ids[~valid].tolist()
+
+def recompute_distances(chunk_size=5000):
+    """
+    重新計算所有房源的距離，只寫入有變動的值
+
+    distance_to_university 有變動的房源同時遞增 version 並更新 updated_at，讓列表快取與 ETag 失效，
+    並在提交後由篩選索引重新載入。
+    各地點先以筆數與總和比對，不一致時才逐筆讀出比對；已不在 POINTS_OF_INTEREST 中的地點
+    或已沒有經緯度的房源，其距離會被刪除。
+    回傳 {'total', 'updated', 'poi_updated', 'compute_seconds', 'seconds'}。
+    """
+    start = time.perf_counter()
+    pois = points_of_interest()
+    names = list(pois)
+    university = names.index(university_poi())
+    ids, lat, lng, current = _load_coordinates()
+
+    compute_start = time.perf_counter()
+    matrix = distance_matrix(lat, lng, pois)
+    changed = np.flatnonzero(matrix[:, university] != np.round(current, DISTANCE_DECIMALS))
+    compute_seconds = time.perf_counter() - compute_start
+
+    summaries = _stored_summaries()
+    stale, inserts = [], []
+    for col, poi in enumerate(names):
+        if poi in summaries and _unchanged(summaries[poi], ids, matrix[:, col]):
+            continue
+        stored, extra = _stored_column(ids, poi)
+        rows = np.flatnonzero(matrix[:, col] != stored)
+        stale += [(accommodation_id, poi) for accommodation_id in extra]
+        stale += [(accommodation_id, poi) for accommodation_id in ids[rows[~np.isnan(stored[rows])]].tolist()]
+        inserts += [
+            {'accommodation_id': accommodation_id, 'poi': poi, 'distance': distance}
+            for accommodation_id, distance in zip(ids[rows].tolist(), matrix[rows, col].tolist())
+        ]
+
+    connection = db.session.connection()
+    accommodations = Accommodation.__table__
+    distances = AccommodationDistance.__table__
+    update = accommodations.update().where(accommodations.c.accommodation_id == bindparam('b_id')).values(
+        distance_to_university=bindparam('b_distance'), version=accommodations.c.version + 1,
+        updated_at=datetime.utcnow()
+    )
+    delete = distances.delete().where(
+        (distances.c.accommodation_id == bindparam('b_id')) & (distances.c.poi == bindparam('b_poi'))
+    )
+    obsolete = [poi for poi in summaries if poi not in pois]
+    if obsolete:
+        connection.execute(distances.delete().where(distances.c.poi.in_(obsolete)))
+    for offset in range(0, len(changed), chunk_size):
+        chunk = changed[offset:offset + chunk_size]
+        connection.execute(update, [
+            {'b_id': accommodation_id, 'b_distance': distance}
+            for accommodation_id, distance in zip(ids[chunk].tolist(), matrix[chunk, university].tolist())
+        ])
+    # 先刪除所有舊的距離再寫入，避免同一房源與地點的新資料早於舊資料刪除而違反唯一鍵
+    for offset in range(0, len(stale), chunk_size):
+        connection.execute(delete, [
+            {'b_id': accommodation_id, 'b_poi': poi} for accommodation_id, poi in stale[offset:offset + chunk_size]
+        ])
+    for offset in range(0, len(inserts), chunk_size):
+        connection.execute(distances.insert(), inserts[offset:offset + chunk_size])
+    # Core UPDATE 不會觸發 ORM 事件，由此標記篩選索引需要重新載入這些房源
+    record_changes(db.session, ids[changed].tolist())
+    db.session.commit()
+    return {
+        'total': len(ids),
+        'updated': len(changed),
+        'poi_updated': len(inserts),
+        'compute_seconds': compute_seconds,
+        'seconds': time.perf_counter() - start,
+    }
+
+# 新增房源或經緯度變更時計算距離（未提供經緯度時保留手動填寫的 distance_to_university）
+@event.listens_for(Accommodation, 'before_insert')
+@event.listens_for(Accommodation, 'before_update')
+def _compute_distances(mapper, connection, target):
+    state = inspect(target)
+    if state.persistent and not (
+        state.attrs.latitude.history.has_changes() or state.attrs.longitude.history.has_changes()
+    ):
+        return
+    if target.latitude is None or target.longitude is None:
+        target._poi_distances = {}
+        return
+    pois = points_of_interest()
+    row = distance_matrix([float(target.latitude)], [float(target.longitude)], pois)[0].tolist()
+    target._poi_distances = dict(zip(pois, row))
+    target.distance_to_university = target._poi_distances[university_poi()]
+
+@event.listens_for(Accommodation, 'after_insert')
+@event.listens_for(Accommodation, 'after_update')
+def _store_distances(mapper, connection, target):
+    distances = target.__dict__.pop('_poi_distances', None)
+    if distances is None:
+        return
+    table = AccommodationDistance.__table__
+    connection.execute(table.delete().where(table.c.accommodation_id == target.accommodation_id))
+    if distances:
+        connection.execute(table.insert(), [
+            {'accommodation_id': target.accommodation_id, 'poi': name, 'distance': distance}
+            for name, distance in distances.items()
+        ])
+
+@event.listens_for(Accommodation, 'after_delete')
+def _delete_distances(mapper, connection, target):
+    table = AccommodationDistance.__table__
+    connection.execute(table.delete().where(table.c.accommodation_id == target.accommodation_id))
+
+def init_distances(app):
+    """註冊 recompute-distances 指令"""
+
+    @app.cli.command('recompute-distances')
+    def recompute_distances_command():
+        """依 POINTS_OF_INTEREST 重新計算所有房源的距離"""
+        result = recompute_distances()
+        print(f"已計算 {result['total']} 筆房源，{result['updated']} 筆的 distance_to_university 有變動，"
+              f"寫入 {result['poi_updated']} 筆地點距離（計算 {result['compute_seconds']:.3f} 秒，共 {result['seconds']:.2f} 秒）")
@@ -0,0 +1,303 @@
+import threading
+from functools import reduce
+from operator import and_, or_
+import numpy as np
+from sqlalchemy import event # type: ignore
+from sqlalchemy.orm import object_session # type: ignore
+from app.extensions import db
+from app.models.accommodation import Accommodation, AccommodationAmenity
+from app.utils.tx_hooks import on_commit
+from app.utils.listing_versions import ListingVersions
+
+# 房源篩選與各篩選值的筆數（facet counts）
+#
+# 每個篩選值對應一個以 Python int 表示的 bitmap，第 n 個 bit 代表第 n 個槽位的房源。
+# 篩選是 bitmap 的 AND / OR，筆數是 AND 之後的 bit_count()，不需要 GROUP BY 查詢。
+#   district / property_type / room_type / price  同一項中選多個值時取聯集
+#   feature / amenity                              同一項中選多個值時取交集（需全部具備）
+# 聯集類的筆數不套用該項自己的篩選，讓用戶看到改選其他值時的筆數。
+# 只收錄 status 為 available 的房源；房源變更在交易提交後標記，下一次查詢前重新載入這些房源，
+# 其他行程或匯入的寫入由 ListingVersions 定期比對 version 後一併重新載入。
+
+OR_FACETS = ('district', 'property_type', 'room_type', 'price')
+AND_FACETS = ('feature', 'amenity')
+FACETS = OR_FACETS + AND_FACETS
+
+FEATURE_COLUMNS = {
+    'furnished': 'is_furnished',
+    'internet': 'has_internet',
+    'water': 'has_water_bill',
+    'electricity': 'has_electricity_bill',
+}
+# 租金區間：(下限, 上限)，上限為 None 表示以上
+PRICE_BUCKETS = [(0, 3000), (3000, 5000), (5000, 7000), (7000, 10000), (10000, 15000), (15000, None)]
+
+SORT_KEYS = {
+    'price_low': ('price', False),
+    'price_high': ('price', True),
+    'distance': ('distance', False),
+    'newest': ('created', True),
+}
+
+def price_bucket(price):
+    for low, high in PRICE_BUCKETS:
+        if high is None or price < high:
+            return f'{low}-{high}' if high is not None else f'{low}+'
+    return None
+
+def facet_values(row, amenity_ids):
+    """房源在各篩選項的值：{facet: set(值)}"""
+    room_types = set()
+    if row.studio_available:
+        room_types.add('studio')
+    if row.single_available:
+        room_types.add('single')
+    price = float(row.rent_price or 0)
+    return {
+        'district': {row.district} if row.district else set(),
+        'property_type': {row.property_type} if row.property_type else set(),
+        'room_type': room_types,
+        'price': {price_bucket(price)},
+        'feature': {name for name, column in FEATURE_COLUMNS.items() if getattr(row, column)},
+        'amenity': set(amenity_ids),
+    }
+
+
+class FacetIndex:
+    """各篩選值的 bitmap 與排序用的欄位陣列，刪除的槽位會重複使用"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._bitmaps = {facet: {} for facet in FACETS}
+        self._all = 0
+        self._doc_slot = {}
+        self._slot_values = []  # 槽位 -> 上次寫入的 facet_values，用於清除舊值
+        self._free = []
+        self._columns = {name: np.zeros(0) for name in ('price', 'distance', 'created')}
+        self._ids = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._doc_slot)
+
+    def _allocate(self):
+        if self._free:
+            return self._free.pop()
+        slot = len(self._slot_values)
+        self._slot_values.append(None)
+        if slot >= len(self._ids):
+            size = max(1024, slot * 2)
+            self._ids = np.resize(self._ids, size)
+            for name, values in self._columns.items():
+                self._columns[name] = np.resize(values, size)
+        return slot
+
+    def _clear(self, slot):
+        mask = ~(1 << slot)
+        for facet, values in self._slot_values[slot].items():
+            bitmaps = self._bitmaps[facet]
+            for value in values:
+                bitmap = bitmaps[value] & mask
+                if bitmap:
+                    bitmaps[value] = bitmap
+                else:
+                    del bitmaps[value]
+        self._all &= mask
+        self._slot_values[slot] = None
+
+    def upsert(self, doc_id, values, price, distance, created):
+        """新增或更新房源，values 為 facet_values() 的結果"""
+        with self._lock:
+            slot = self._doc_slot.get(doc_id)
+            if slot is None:
+                slot = self._doc_slot[doc_id] = self._allocate()
+            else:
+                self._clear(slot)
+            bit = 1 << slot
+            for facet, facet_vals in values.items():
+                bitmaps = self._bitmaps[facet]
+                for value in facet_vals:
+                    bitmaps[value] = bitmaps.get(value, 0) | bit
+            self._all |= bit
+            self._slot_values[slot] = values
+            self._ids[slot] = doc_id
+            self._columns['price'][slot] = price
+            self._columns['distance'][slot] = np.inf if distance is None else distance
+            self._columns['created'][slot] = created
+
+    def load(self, docs):
+        """以 [(房源 ID, values, price, distance, created)] 重新建立索引，各 bitmap 一次產生"""
+        with self._lock:
+            self._reset()
+            slots = {facet: {} for facet in FACETS}
+            for doc_id, values, price, distance, created in docs:
+                slot = self._doc_slot[doc_id] = self._allocate()
+                self._slot_values[slot] = values
+                self._ids[slot] = doc_id
+                self._columns['price'][slot] = price
+                self._columns['distance'][slot] = np.inf if distance is None else distance
+                self._columns['created'][slot] = created
+                for facet, facet_vals in values.items():
+                    for value in facet_vals:
+                        slots[facet].setdefault(value, []).append(slot)
+            size = len(self._slot_values)
+            for facet, value_slots in slots.items():
+                for value, members in value_slots.items():
+                    mask = np.zeros(size, dtype=bool)
+                    mask[members] = True
+                    self._bitmaps[facet][value] = self._to_bitmap(mask)
+            self._all = (1 << size) - 1
+
+    def remove(self, doc_id):
+        with self._lock:
+            slot = self._doc_slot.pop(doc_id, None)
+            if slot is not None:
+                self._clear(slot)
+                self._free.append(slot)
+
+    def _to_bitmap(self, mask):
+        return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+    def _to_slots(self, bitmap):
+        size = len(self._slot_values)
+        raw = np.frombuffer(bitmap.to_bytes((size + 7) // 8, 'little'), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(raw, count=size, bitorder='little'))
+
+    def query(self, selected=None, min_price=None, max_price=None, sort_by='newest', offset=0, limit=20):
+        """
+        篩選房源並計算各篩選值的筆數
+
+        selected 為 {facet: [值]}，回傳 (符合筆數, [房源 ID], {facet: {值: 筆數}})
+        """
+        with self._lock:
+            base = self._all
+            if min_price is not None or max_price is not None:
+                size = len(self._slot_values)
+                prices = self._columns['price'][:size]
+                mask = np.ones(size, dtype=bool)
+                if min_price is not None:
+                    mask &= prices >= min_price
+                if max_price is not None:
+                    mask &= prices <= max_price
+                base &= self._to_bitmap(mask)
+
+            filters = {}
+            for facet, values in (selected or {}).items():
+                if facet in self._bitmaps and values:
+                    bitmaps = [self._bitmaps[facet].get(value, 0) for value in values]
+                    filters[facet] = reduce(and_ if facet in AND_FACETS else or_, bitmaps)
+            matched = reduce(and_, filters.values(), base)
+
+            counts = {}
+            for facet, bitmaps in self._bitmaps.items():
+                scope = reduce(and_, (bm for f, bm in filters.items() if f != facet or facet in AND_FACETS), base)
+                facet_counts = {value: (scope & bitmap).bit_count() for value, bitmap in bitmaps.items()}
+                counts[facet] = {value: count for value, count in facet_counts.items() if count}
+
+            slots = self._to_slots(matched)
+            total = len(slots)
+            column, descending = SORT_KEYS.get(sort_by, SORT_KEYS['newest'])
+            keys = self._columns[column][slots]
+            ids = self._ids[slots]
+            # 與列表頁相同：依排序欄位，再依房源 ID 同方向排序
+            order = np.lexsort((-ids, -keys)) if descending else np.lexsort((ids, keys))
+            return total, ids[order[offset:offset + limit]].tolist(), counts
+
+
+facet_index = FacetIndex()
+_state = {'built': False}
+_dirty = set()
+_dirty_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_versions = ListingVersions()
+
+FACET_COLUMNS = (
+    'accommodation_id', 'status', 'district', 'property_type', 'rent_price', 'distance_to_university',
+    'created_at', 'studio_available', 'single_available', *FEATURE_COLUMNS.values()
+)
+
+def _facet_docs(ids=None):
+    """由資料庫讀取房源，產生 (房源 ID, values, price, distance, created) 或不再可用時的 (房源 ID, None)"""
+    columns = [getattr(Accommodation, name) for name in FACET_COLUMNS]
+    chunks = [None] if ids is None else [ids[i:i + 500] for i in range(0, len(ids), 500)]
+    for chunk in chunks:
+        query = db.session.query(*columns)
+        amenity_query = db.session.query(AccommodationAmenity.accommodation_id, AccommodationAmenity.amenity_id)
+        if chunk is None:
+            query = query.filter(Accommodation.status == 'available')
+        else:
+            query = query.filter(Accommodation.accommodation_id.in_(chunk))
+            amenity_query = amenity_query.filter(AccommodationAmenity.accommodation_id.in_(chunk))
+        amenities = {}
+        for accommodation_id, amenity_id in amenity_query:
+            amenities.setdefault(accommodation_id, []).append(str(amenity_id))
+
+        seen = set()
+        for row in query:
+            seen.add(row.accommodation_id)
+            if row.status != 'available':
+                yield row.accommodation_id, None
+                continue
+            yield (
+                row.accommodation_id, facet_values(row, amenities.get(row.accommodation_id, ())),
+                float(row.rent_price or 0), row.distance_to_university,
+                row.created_at.timestamp() if row.created_at else 0
+            )
+        for accommodation_id in set(chunk or ()) - seen:
+            yield accommodation_id, None
+
+def _refresh(force=False):
+    with _dirty_lock:
+        dirty = set(_dirty)
+        _dirty.clear()
+    dirty.update(_versions.changed_ids(force))
+    for doc in _facet_docs(list(dirty)) if dirty else ():
+        if doc[1] is None:
+            facet_index.remove(doc[0])
+        else:
+            facet_index.upsert(*doc)
+
+def refresh_facet_index(force=False):
+    """
+    重新載入提交後有變更以及資料庫中 version 有變動的房源
+
+    未 force 時 version 的比對依檢查間隔節流，索引尚未建立時不做任何事。
+    """
+    with _refresh_lock:
+        if _state['built']:
+            _refresh(force)
+
+def get_facet_index():
+    """取得索引：尚未建立時由資料庫建立，否則先重新載入有變更的房源"""
+    global facet_index
+    with _refresh_lock:
+        if not _state['built']:
+            with _dirty_lock:
+                _dirty.clear()
+            _versions.reset()
+            index = FacetIndex()
+            index.load(_facet_docs())
+            facet_index = index
+            _state['built'] = True
+        else:
+            _refresh()
+    return facet_index
+
+# 房源或設備變更時記錄房源 ID，交易提交後才標記為需要重新載入
+def _mark_dirty(accommodation_ids):
+    with _dirty_lock:
+        _dirty.update(accommodation_ids)
+
+def record_changes(db_session, accommodation_ids):
+    """記錄不經過 ORM 修改的房源（例如 Core UPDATE），交易提交後重新載入"""
+    on_commit(db_session, 'facet_changes', accommodation_ids, _mark_dirty)
+
+@event.listens_for(Accommodation, 'after_insert')
+@event.listens_for(Accommodation, 'after_update')
+@event.listens_for(Accommodation, 'after_delete')
+@event.listens_for(AccommodationAmenity, 'after_insert')
+@event.listens_for(AccommodationAmenity, 'after_delete')
+def _accommodation_changed(mapper, connection, target):
+    record_changes(object_session(target), [target.accommodation_id])
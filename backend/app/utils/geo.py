@@ -0,0 +1,100 @@
+import math
+import numpy as np
+
+# 地理計算：geohash、範圍查詢的涵蓋格子、向量化的 haversine 距離與地圖標記分群
+#
+# 房源以 9 碼 geohash（約 5 公尺見方）存於 Accommodation.geohash 並建立索引。
+# 範圍查詢先以涵蓋格子的 geohash 前綴區間從資料庫取出候選房源，再以 numpy 精確篩選。
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS = 6371008.8  # 公尺
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    """將經緯度編碼為 geohash"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = bit_count = 0
+    even = True
+    while len(chars) < precision:
+        interval, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            interval[0] = mid
+        else:
+            bits = bits * 2
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+def cell_size(precision):
+    """geohash 格子的 (緯度高, 經度寬)，單位為度"""
+    bits = precision * 5
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+def covering_cells(south, west, north, east, max_cells=32):
+    """涵蓋範圍的 geohash 前綴：取格子數不超過 max_cells 的最精細層級"""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        row0, row1 = int((south + 90) // height), int((north + 90) // height)
+        col0, col1 = int((west + 180) // width), int((east + 180) // width)
+        if (row1 - row0 + 1) * (col1 - col0 + 1) <= max_cells or precision == 1:
+            return sorted({
+                encode_geohash(min(-90 + (row + 0.5) * height, 90), min(-180 + (col + 0.5) * width, 180), precision)
+                for row in range(row0, row1 + 1)
+                for col in range(col0, col1 + 1)
+            })
+
+def _successor(prefix):
+    """同長度的下一個 geohash，已是最後一個時回傳 None"""
+    chars = list(prefix)
+    for i in range(len(chars) - 1, -1, -1):
+        index = BASE32.index(chars[i])
+        if index < len(BASE32) - 1:
+            chars[i] = BASE32[index + 1]
+            return ''.join(chars)
+        chars[i] = BASE32[0]
+    return None
+
+def prefix_ranges(prefixes):
+    """將排序後的 geohash 前綴中相鄰者合併，回傳 [(起, 迄)] 字串區間（不含迄）"""
+    ranges = []
+    last = None
+    for prefix in prefixes:
+        if ranges and _successor(last) == prefix:
+            ranges[-1] = (ranges[-1][0], prefix + '{')
+        else:
+            ranges.append((prefix, prefix + '{'))  # '{' 排在 base32 的所有字元之後
+        last = prefix
+    return ranges
+
+def bbox_around(lat, lng, radius):
+    """以 (lat, lng) 為中心、半徑 radius 公尺的外接範圍 (south, west, north, east)"""
+    dlat = radius / METERS_PER_DEGREE
+    dlng = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+def haversine(lat, lng, lat0, lng0):
+    """兩組經緯度之間的距離（公尺），參數可為 numpy 陣列並依廣播規則計算"""
+    lat, lng, lat0, lng0 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat, lng, lat0, lng0))
+    a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat) * np.sin((lng - lng0) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def cluster_points(lat, lng, zoom, cell_pixels=60):
+    """
+    依地圖縮放層級將座標以網格分群，每格約 cell_pixels 像素
+
+    回傳 (各點所屬群組, 各群組點數, 群組中心緯度, 群組中心經度)
+    """
+    size = cell_pixels * 360.0 / (256 * 2 ** max(zoom, 0))
+    cols = int(360 / size) + 1
+    keys = np.floor((lat + 90) / size).astype(np.int64) * cols + np.floor((lng + 180) / size).astype(np.int64)
+    _, groups, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    return groups, counts, np.bincount(groups, weights=lat) / counts, np.bincount(groups, weights=lng) / counts
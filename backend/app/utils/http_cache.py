@@ -0,0 +1,49 @@
+import hashlib
+from flask import request, current_app # type: ignore
+from app.utils.compression import ENCODINGS
+
+# 條件式 GET
+#
+# 端點先以便宜的欄位（version、updated_at）計算強 ETag，在序列化之前呼叫 not_modified()：
+# If-None-Match 相符時直接回傳 304。壓縮後的回應 ETag 會加上 -br / -gzip（見 compression.py），比對時一併接受。
+
+# 各端點的 Cache-Control：公開內容允許快取但每次以 ETag 重新驗證，個人資料不快取
+PUBLIC_REVALIDATE = 'public, no-cache'
+PRIVATE_REVALIDATE = 'private, no-cache'
+PRIVATE_NO_STORE = 'private, no-store'
+
+def make_etag(*parts):
+    """由各部分的 repr 計算 ETag 值"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def _matching_tag(etag):
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return None
+    if if_none_match.star_tag:
+        return etag
+    for tag in (etag, *(f'{etag}-{encoding}' for encoding in ENCODINGS)):
+        if if_none_match.contains(tag):
+            return tag
+    return None
+
+def not_modified(etag, cache_control):
+    """If-None-Match 相符時回傳 304 回應，否則回傳 None"""
+    tag = _matching_tag(etag)
+    if tag is None:
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(tag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+def with_etag(response, etag, cache_control):
+    """設定回應的 ETag 與 Cache-Control"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,86 @@
+import dataclasses
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider # type: ignore
+
+try:
+    import orjson # type: ignore
+except ImportError:  # 未安裝時退回標準函式庫，輸出格式相同
+    orjson = None
+
+# 共用的 JSON 編碼
+#
+# API 回應（jsonify）與資料庫快照使用同一套規則：
+#   datetime / date  ISO 8601 字串（與 .isoformat() 相同）
+#   Decimal          數字（與 float() 相同）
+#   set / numpy 陣列  清單
+# 有安裝 orjson 時由 orjson 直接處理 datetime 與 numpy，其餘型別經由 _default 轉換。
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    if hasattr(obj, 'tolist'):  # numpy 陣列與純量
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_bytes(obj, indent=False):
+    """編碼為 UTF-8 bytes（緊湊格式，indent=True 時縮排 2 格）"""
+    if orjson is not None:
+        option = ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else ORJSON_OPTIONS
+        return orjson.dumps(obj, default=_default, option=option)
+    return dumps(obj, indent=indent).encode('utf-8')
+
+def dumps(obj, indent=False):
+    """編碼為字串（緊湊格式，不跳脫非 ASCII 字元）"""
+    if orjson is not None:
+        return dumps_bytes(obj, indent).decode('utf-8')
+    if indent:
+        return json.dumps(obj, default=_default, ensure_ascii=False, indent=2)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':'))
+
+def loads(s):
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask 的 JSON provider，jsonify 與 request.get_json 都經由 orjson 處理
+
+    與預設 provider 的差異：datetime 輸出 ISO 8601 而非 HTTP 日期，Decimal 輸出數字而非字串，
+    鍵值不排序。
+    """
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - {'separators'}:
+            # 呼叫端指定了其他 json.dumps 參數（例如 sort_keys），交由標準函式庫處理
+            kwargs.setdefault('default', _default)
+            kwargs.setdefault('ensure_ascii', False)
+            return json.dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,51 @@
+import time
+from flask import current_app # type: ignore
+from sqlalchemy import func # type: ignore
+from app.extensions import db
+from app.models.accommodation import Accommodation
+
+# 行程內房源索引（搜尋、篩選）與資料庫的比對
+#
+# 索引只會收到本行程 ORM 事件的增量更新，其他行程的寫入、db_sync 匯入與 Core UPDATE 都不會通知索引。
+# 房源本身、圖片或設備的每一條寫入路徑都會遞增房源的 version（ORM 事件、距離重算與匯入），
+# 因此索引記錄載入時各房源的 version：每隔 LISTING_INDEX_CHECK_INTERVAL 秒先以一次彙總查詢
+# （筆數、version 總和與最大 ID，走 ix_accommodations_version 覆蓋索引）比對，
+# 不一致時才讀出各房源的 version，回傳有差異的房源交由索引重新載入。
+
+def _current_versions():
+    return dict(db.session.query(Accommodation.accommodation_id, Accommodation.version).all())
+
+def _summary(versions):
+    return len(versions), sum(version or 0 for version in versions.values()), max(versions, default=None)
+
+
+class ListingVersions:
+    """索引載入時各房源的 version"""
+
+    def __init__(self):
+        self.versions = {}
+        self.checked_at = 0.0
+
+    def reset(self):
+        """建立索引前呼叫，記錄目前各房源的 version"""
+        self.versions = _current_versions()
+        self.checked_at = time.monotonic()
+
+    def changed_ids(self, force=False):
+        """距離上次比對超過檢查間隔（或 force）時，回傳 version 與記錄不同、新增或已刪除的房源 ID"""
+        now = time.monotonic()
+        if not force and now - self.checked_at < current_app.config.get('LISTING_INDEX_CHECK_INTERVAL', 2):
+            return []
+        self.checked_at = now
+        count, total, last_id = db.session.query(
+            func.count(), func.coalesce(func.sum(Accommodation.version), 0), func.max(Accommodation.accommodation_id)
+        ).one()
+        if (count, total, last_id) == _summary(self.versions):
+            return []
+        current = _current_versions()
+        changed = [
+            accommodation_id for accommodation_id in current.keys() | self.versions.keys()
+            if current.get(accommodation_id) != self.versions.get(accommodation_id)
+        ]
+        self.versions = current
+        return changed
@@ -0,0 +1,160 @@
+import base64
+import json
+from datetime import datetime, date
+from decimal import Decimal
+from sqlalchemy import and_, or_, false, literal, String # type: ignore
+
+# 游標（keyset）分頁工具
+#
+# 以 (排序欄位, 主鍵) 的組合做為定位點，下一頁直接以 WHERE 條件跳到上一頁最後一筆之後，
+# 不需要 COUNT(*) 也不需要 OFFSET 掃描，深層分頁與無限捲動的延遲不會隨資料量成長。
+# NULL 值一律視為最小值（與 SQLite / MySQL 預設相同）：升冪時排在最前、降冪時排在最後。
+#
+# SQLite 以字串儲存時間：func.now() 寫入的值沒有微秒（'2025-05-20 12:00:00'），
+# Python 端寫入的值一律帶微秒（'2025-05-20 12:00:00.000000'），同一時間點可能有兩種字串，
+# 因此在 SQLite 上比較時間時會同時考慮兩種格式（見 _SqliteTime）。
+
+class InvalidCursor(ValueError):
+    """游標格式錯誤或與排序方式不符"""
+
+
+class KeysetPage:
+    """游標分頁結果"""
+
+    def __init__(self, items, next_cursor, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+        self.total = total
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return value
+
+def encode_cursor(values):
+    """將排序欄位值編碼為 URL 安全的游標字串"""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, columns):
+    """解碼游標字串，並依欄位型別還原數值"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'無效的游標: {e}')
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursor('游標與排序方式不符')
+
+    try:
+        return [_decode_value(col, v) for col, v in zip(columns, values)]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'無效的游標: {e}')
+
+def _is_nullable(column):
+    return getattr(getattr(column, 'expression', column), 'nullable', False)
+
+def _order_clause(column, direction):
+    clause = column.desc() if direction == 'desc' else column.asc()
+    if _is_nullable(column):
+        clause = clause.nulls_last() if direction == 'desc' else clause.nulls_first()
+    return clause
+
+class _SqliteTime:
+    """SQLite 上同一時間點的兩種儲存字串：short 不含微秒（僅在微秒為 0 時存在）、full 含微秒"""
+
+    def __init__(self, value):
+        self.full = literal(value.strftime('%Y-%m-%d %H:%M:%S.%f'), String)
+        self.short = None if value.microsecond else literal(value.strftime('%Y-%m-%d %H:%M:%S'), String)
+
+def _after(column, direction, value):
+    """欄位值排在定位點之後的條件"""
+    if direction == 'desc':
+        if value is None:
+            return false()
+        if isinstance(value, _SqliteTime):
+            # 較短的字串排序在前，小於它的必然是更早的時間
+            value = value.short if value.short is not None else value.full
+        if _is_nullable(column):
+            return or_(column < value, column.is_(None))
+        return column < value
+    if value is None:
+        return column.isnot(None)
+    if isinstance(value, _SqliteTime):
+        value = value.full
+    return column > value
+
+def _equal(column, value):
+    if value is None:
+        return column.is_(None)
+    if isinstance(value, _SqliteTime):
+        if value.short is not None:
+            return column.in_([value.short, value.full])
+        return column == value.full
+    return column == value
+
+def _bind_values(values, dialect_name):
+    if dialect_name != 'sqlite':
+        return values
+    return [_SqliteTime(v) if isinstance(v, datetime) else v for v in values]
+
+def _seek_condition(order, values):
+    """建立 (k1, k2, ..., pk) > (v1, v2, ..., vpk) 的展開條件"""
+    (column, direction), value = order[0], values[0]
+    after = _after(column, direction, value)
+    if len(order) == 1:
+        return after
+    return or_(after, and_(_equal(column, value), _seek_condition(order[1:], values[1:])))
+
+def keyset_paginate(query, order, cursor=None, per_page=20, with_total=False):
+    """
+    以游標方式分頁查詢
+
+    Args:
+        query: 尚未排序的查詢
+        order: [(欄位, 'asc' 或 'desc'), ...]，最後一個欄位必須是唯一鍵（通常為主鍵）
+        cursor: 上一頁回傳的 next_cursor，空值表示第一頁
+        per_page: 每頁筆數
+        with_total: 是否另外計算總筆數（需要一次 COUNT 查詢）
+
+    Returns:
+        KeysetPage
+    """
+    columns = [column for column, _ in order]
+    total = query.order_by(None).count() if with_total else None
+
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        values = _bind_values(values, query.session.get_bind().dialect.name)
+        query = query.filter(_seek_condition(order, values))
+
+    query = query.order_by(*[_order_clause(column, direction) for column, direction in order])
+    rows = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+
+    return KeysetPage(rows, next_cursor, total)
@@ -0,0 +1,291 @@
+import math
+import re
+import threading
+import unicodedata
+from array import array
+import numpy as np
+from sqlalchemy import event # type: ignore
+from sqlalchemy.orm import object_session # type: ignore
+from app.extensions import db
+from app.models.accommodation import Accommodation
+from app.utils.tx_hooks import on_commit
+from app.utils.listing_versions import ListingVersions
+
+# 房源全文搜尋
+#
+# 以行程內的倒排索引搜尋 title / description / address / district：
+#   中文取相鄰兩字（bigram），英數字取整個字，全形字元先以 NFKC 轉為半形
+#   查詢的詞元全部出現才算命中，以 BM25 排序，title 的權重最高
+#   只查一個中文字時，改為比對所有包含該字的 bigram
+# 第一次搜尋時由資料庫建立索引，之後由 ORM 事件在交易提交後增量更新；
+# 只收錄 status 為 available 的房源。其他行程或匯入的寫入由 ListingVersions 定期比對 version 後重新載入。
+
+SEARCH_FIELDS = {'title': 3, 'district': 2, 'address': 2, 'description': 1}  # 欄位: 權重
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+CJK_CHARS = r'\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'  # 中日韓統一表意文字與相容表意文字
+TOKEN_PATTERN = re.compile(f'[{CJK_CHARS}]+|[0-9a-z]+')
+CJK_PATTERN = re.compile(f'[{CJK_CHARS}]')
+
+def tokenize(text):
+    """將文字切為詞元：中文取相鄰兩字（只有一個字時取單字），英數字取整個字"""
+    if not text:
+        return []
+    tokens = []
+    for run in TOKEN_PATTERN.findall(unicodedata.normalize('NFKC', text).lower()):
+        if len(run) > 1 and CJK_PATTERN.match(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class SearchIndex:
+    """
+    倒排索引：{詞元: (槽位, 加權詞頻)}
+
+    每個房源佔用一個遞增的槽位，因此各詞元的槽位陣列保持排序，可直接交集。
+    更新房源時配置新槽位並將舊槽位標為失效，失效槽位過多時整理索引。
+    """
+
+    def __init__(self, fields=SEARCH_FIELDS):
+        self.fields = fields
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._postings = {}  # 詞元 -> (array('I') 槽位, array('f') 詞頻)
+        self._char_tokens = {}  # 中文字 -> 包含該字的詞元
+        self._slot_doc = array('q')  # 槽位 -> 房源 ID
+        self._slot_len = array('f')  # 槽位 -> 加權詞元數
+        self._alive = bytearray()
+        self._doc_slot = {}
+        self._total_len = 0.0
+
+    def __len__(self):
+        return len(self._doc_slot)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def upsert(self, doc_id, values):
+        """新增或更新房源，values 為 {欄位: 文字}"""
+        with self._lock:
+            self._remove(doc_id)
+            counts = {}
+            for field, weight in self.fields.items():
+                for token in tokenize(values.get(field)):
+                    counts[token] = counts.get(token, 0) + weight
+            if not counts:
+                return
+
+            slot = len(self._slot_doc)
+            self._slot_doc.append(doc_id)
+            self._slot_len.append(sum(counts.values()))
+            self._alive.append(1)
+            self._doc_slot[doc_id] = slot
+            self._total_len += self._slot_len[slot]
+            for token, tf in counts.items():
+                posting = self._postings.get(token)
+                if posting is None:
+                    posting = self._postings[token] = (array('I'), array('f'))
+                    for char in set(token):
+                        if CJK_PATTERN.match(char):
+                            self._char_tokens.setdefault(char, set()).add(token)
+                posting[0].append(slot)
+                posting[1].append(tf)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        slot = self._doc_slot.pop(doc_id, None)
+        if slot is None:
+            return
+        self._alive[slot] = 0
+        self._total_len -= self._slot_len[slot]
+        dead = len(self._slot_doc) - len(self._doc_slot)
+        if dead > 1024 and dead > len(self._doc_slot):
+            self._compact()
+
+    def _compact(self):
+        """移除失效槽位並重新編號"""
+        alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+        remap = np.cumsum(alive, dtype=np.int64) - 1
+        postings = {}
+        for token, (slots, tfs) in self._postings.items():
+            slot_arr = np.frombuffer(slots, dtype=np.uint32)
+            keep = alive[slot_arr]
+            if keep.any():
+                postings[token] = (
+                    array('I', remap[slot_arr[keep]].astype(np.uint32).tobytes()),
+                    array('f', np.frombuffer(tfs, dtype=np.float32)[keep].tobytes()),
+                )
+        self._postings = postings
+        self._char_tokens = {
+            char: {token for token in tokens if token in postings}
+            for char, tokens in self._char_tokens.items()
+        }
+        self._slot_doc = array('q', np.frombuffer(self._slot_doc, dtype=np.int64)[alive].tobytes())
+        self._slot_len = array('f', np.frombuffer(self._slot_len, dtype=np.float32)[alive].tobytes())
+        self._alive = bytearray(b'\x01' * len(self._slot_doc))
+        self._doc_slot = {doc_id: slot for slot, doc_id in enumerate(self._slot_doc)}
+
+    def _term(self, token):
+        """查詢詞元的 (排序後的槽位, 詞頻)，不存在時回傳 None"""
+        if len(token) == 1 and CJK_PATTERN.match(token):
+            # 單一中文字：合併所有包含該字的詞元
+            tokens = [t for t in self._char_tokens.get(token, ()) if t in self._postings]
+            if not tokens:
+                return None
+            if len(tokens) > 1:
+                slots = np.concatenate([np.frombuffer(self._postings[t][0], dtype=np.uint32) for t in tokens])
+                tfs = np.concatenate([np.frombuffer(self._postings[t][1], dtype=np.float32) for t in tokens])
+                unique, inverse = np.unique(slots, return_inverse=True)
+                return unique, np.bincount(inverse, weights=tfs)
+            token = tokens[0]
+        posting = self._postings.get(token)
+        if posting is None:
+            return None
+        return np.frombuffer(posting[0], dtype=np.uint32), np.frombuffer(posting[1], dtype=np.float32)
+
+    def search(self, query, offset=0, limit=20):
+        """回傳 (命中總數, [房源 ID])，依相關度由高到低排序"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return 0, []
+        with self._lock:
+            # 陣列的 numpy 視圖存在時不能擴充陣列，查詢在鎖內完成並釋放所有視圖
+            return self._search(tokens, offset, limit)
+
+    def _search(self, tokens, offset, limit):
+        terms = []
+        for token in tokens:
+            term = self._term(token)
+            if term is None:
+                return 0, []
+            terms.append(term)
+        terms.sort(key=lambda term: len(term[0]))
+
+        candidates = terms[0][0]
+        for slots, _ in terms[1:]:
+            candidates = np.intersect1d(candidates, slots, assume_unique=True)
+        alive = np.frombuffer(self._alive, dtype=np.uint8)
+        candidates = candidates[alive[candidates].astype(bool)]
+        total = len(candidates)
+        if total == 0 or offset >= total:
+            return total, []
+
+        n_docs = len(self._doc_slot)
+        avg_len = self._total_len / n_docs
+        lengths = np.frombuffer(self._slot_len, dtype=np.float32)[candidates]
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_len)
+        scores = np.zeros(total)
+        for slots, tfs in terms:
+            idf = math.log(1 + (n_docs - len(slots) + 0.5) / (len(slots) + 0.5))
+            tf = tfs[np.searchsorted(slots, candidates)]
+            scores += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        # 只排序需要的前 offset + limit 筆；同分時較新的槽位在前
+        k = min(offset + limit, total)
+        top = np.argpartition(-scores, k - 1)[:k] if k < total else np.arange(total)
+        top = top[np.lexsort((-candidates[top].astype(np.int64), -scores[top]))]
+        doc_ids = np.frombuffer(self._slot_doc, dtype=np.int64)[candidates[top[offset:]]]
+        return total, doc_ids.tolist()
+
+
+search_index = SearchIndex()
+_state = {'built': False, 'replay': None}
+_versions = ListingVersions()
+_build_lock = threading.Lock()
+_changes_lock = threading.Lock()
+
+def _row_values(row):
+    return {field: getattr(row, field) for field in SEARCH_FIELDS}
+
+def _search_rows():
+    return db.session.query(
+        Accommodation.accommodation_id, Accommodation.status,
+        *[getattr(Accommodation, field) for field in SEARCH_FIELDS]
+    )
+
+def rebuild_search_index():
+    """由資料庫重新建立索引，回傳收錄的房源數"""
+    global search_index
+    with _build_lock:
+        with _changes_lock:
+            _state['replay'] = []
+        try:
+            _versions.reset()
+            rows = _search_rows().filter(Accommodation.status == 'available').yield_per(2000)
+            index = SearchIndex()
+            for row in rows:
+                index.upsert(row.accommodation_id, _row_values(row))
+            with _changes_lock:
+                # 建立期間提交的變更在新索引上重放
+                for doc_id, values in _state['replay']:
+                    _apply_change(index, doc_id, values)
+                search_index = index
+                _state['built'] = True
+        finally:
+            _state['replay'] = None
+    return len(search_index)
+
+def refresh_search_index(force=False):
+    """
+    重新載入資料庫中 version 有變動的房源，回傳重新載入的房源數
+
+    涵蓋其他行程、匯入與 Core UPDATE 的寫入；未 force 時依檢查間隔節流，索引尚未建立時不做任何事。
+    """
+    with _build_lock:
+        if not _state['built']:
+            return 0
+        ids = _versions.changed_ids(force)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            changes = dict.fromkeys(chunk)
+            for row in _search_rows().filter(Accommodation.accommodation_id.in_(chunk)):
+                changes[row.accommodation_id] = _row_values(row) if row.status == 'available' else None
+            with _changes_lock:
+                for doc_id, values in changes.items():
+                    _apply_change(search_index, doc_id, values)
+        return len(ids)
+
+def get_search_index():
+    """取得索引：尚未建立時先由資料庫建立，之後先重新載入 version 有變動的房源"""
+    if not _state['built']:
+        rebuild_search_index()
+    else:
+        refresh_search_index()
+    return search_index
+
+def _apply_change(index, doc_id, values):
+    if values is None:
+        index.remove(doc_id)
+    else:
+        index.upsert(doc_id, values)
+
+# 房源變更時記錄 {房源 ID: 欄位值或 None}，交易提交後才更新索引
+def _apply_committed(changes):
+    with _changes_lock:
+        if _state['replay'] is not None:
+            _state['replay'].extend(changes.items())
+        if _state['built']:
+            for doc_id, values in changes.items():
+                _apply_change(search_index, doc_id, values)
+
+def _record_change(target, deleted=False):
+    values = None if deleted or target.status != 'available' else _row_values(target)
+    on_commit(object_session(target), 'search_changes', {target.accommodation_id: values}, _apply_committed)
+
+@event.listens_for(Accommodation, 'after_insert')
+@event.listens_for(Accommodation, 'after_update')
+def _accommodation_saved(mapper, connection, target):
+    _record_change(target)
+
+@event.listens_for(Accommodation, 'after_delete')
+def _accommodation_deleted(mapper, connection, target):
+    _record_change(target, deleted=True)
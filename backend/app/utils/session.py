@@ -0,0 +1,151 @@
+import os
+from datetime import datetime
+from flask.sessions import SecureCookieSessionInterface # type: ignore
+from flask_session import Session # type: ignore
+from flask_session.base import ServerSideSession, ServerSideSessionInterface # type: ignore
+from sqlalchemy import select, update, insert, delete # type: ignore
+from app.extensions import db
+
+# 可切換的 Session 後端
+#
+#   filesystem  原本的 Flask-Session 檔案儲存（每個請求開檔、讀檔、反序列化，目錄會持續成長）
+#   sqlalchemy  以資料表 server_sessions 儲存，可在多台主機間共用；expiry 有索引，過期資料分批刪除
+#   cookie      Flask 內建的簽章 Cookie，伺服器端不保存任何狀態，讀取型請求完全不需存取儲存空間
+#
+# 以 SESSION_BACKEND 設定（或同名環境變數）選擇，預設為 sqlalchemy（需先執行 flask db upgrade 建立資料表）。
+
+SESSION_BACKENDS = ('filesystem', 'sqlalchemy', 'cookie')
+
+def _utcnow():
+    return datetime.utcnow()
+
+
+class _StoredData(dict):
+    """從資料表讀出的 Session 內容，附帶到期時間"""
+
+    def __init__(self, data, expiry):
+        super().__init__(data)
+        self.expiry = expiry
+
+
+class SqlSession(ServerSideSession):
+    """資料庫 Session，記住載入時的到期時間以判斷是否需要延長"""
+
+    def __init__(self, initial=None, sid=None, permanent=None):
+        super().__init__(initial, sid=sid, permanent=permanent)
+        self.expiry = getattr(initial, 'expiry', None)
+
+
+class SqlSessionInterface(ServerSideSessionInterface):
+    """
+    以 server_sessions 資料表儲存 Session
+
+    - 讀取只有一次主鍵查詢；過期的資料視為不存在，不在請求中刪除
+    - 未修改的 Session 只在剩餘效期不到一半時才延長，讀取型請求通常不需寫入
+    - 過期資料依 expiry 索引分批刪除，每批提交一次，避免長時間鎖住資料表
+    """
+
+    session_class = SqlSession
+    ttl = False
+
+    def __init__(self, app, key_prefix='session:', use_signer=False, permanent=True,
+                 sid_length=32, serialization_format='msgpack',
+                 cleanup_n_requests=None, cleanup_batch_size=500):
+        from app.models.session import ServerSession
+        self.table = ServerSession.__table__
+        self.cleanup_batch_size = cleanup_batch_size
+        super().__init__(app, key_prefix, use_signer, permanent, sid_length,
+                         serialization_format, cleanup_n_requests)
+
+    def should_set_storage(self, app, session):
+        if session.modified:
+            return True
+        if not app.config['SESSION_REFRESH_EACH_REQUEST']:
+            return False
+        expiry = getattr(session, 'expiry', None)
+        if expiry is None:
+            return True
+        # 剩餘效期超過一半時不延長，省下讀取型請求的寫入
+        return expiry - _utcnow() < app.permanent_session_lifetime / 2
+
+    # Session 資料表以自己的連線與交易存取（一律為主資料庫）：
+    # 寫入 Session 時不會一併提交請求處理中留下的未提交資料，剛寫入的 Session 也不會從 replica 讀取
+
+    def _retrieve_session_data(self, store_id):
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                select(self.table.c.data, self.table.c.expiry).where(self.table.c.session_id == store_id)
+            ).first()
+        if row is None or row.expiry <= _utcnow():
+            return None
+        return _StoredData(self.serializer.decode(row.data), row.expiry)
+
+    def _delete_session(self, store_id):
+        with db.engine.begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.session_id == store_id))
+
+    def _upsert_session(self, session_lifetime, session, store_id):
+        expiry = _utcnow() + session_lifetime
+        data = self.serializer.encode(session)
+        with db.engine.begin() as connection:
+            result = connection.execute(
+                update(self.table)
+                .where(self.table.c.session_id == store_id)
+                .values(data=data, expiry=expiry)
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(self.table).values(session_id=store_id, data=data, expiry=expiry))
+        session.expiry = expiry
+
+    def _delete_expired_sessions(self):
+        """分批刪除過期的 Session，每批一個交易，回傳刪除筆數"""
+        now = _utcnow()
+        deleted = 0
+        while True:
+            with db.engine.begin() as connection:
+                ids = connection.execute(
+                    select(self.table.c.session_id)
+                    .where(self.table.c.expiry <= now)
+                    .limit(self.cleanup_batch_size)
+                ).scalars().all()
+                if ids:
+                    connection.execute(delete(self.table).where(self.table.c.session_id.in_(ids)))
+            deleted += len(ids)
+            if len(ids) < self.cleanup_batch_size:
+                break
+        return deleted
+
+
+class CookieSessionInterface(SecureCookieSessionInterface):
+    """簽章 Cookie Session：有內容的 Session 依 SESSION_PERMANENT 設為永久，與伺服器端後端行為一致"""
+
+    def save_session(self, app, session, response):
+        if session and app.config.get('SESSION_PERMANENT', True) and not session.permanent:
+            session.permanent = True
+        return super().save_session(app, session, response)
+
+
+def init_session(app):
+    """依 SESSION_BACKEND 設定初始化 Session，需在 db.init_app 之後呼叫"""
+    backend = app.config.get('SESSION_BACKEND', 'sqlalchemy')
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"未知的 SESSION_BACKEND: {backend}（可用值: {', '.join(SESSION_BACKENDS)}）")
+
+    if backend == 'filesystem':
+        app.config['SESSION_TYPE'] = 'filesystem'
+        app.config.setdefault('SESSION_USE_SIGNER', True)
+        app.config.setdefault('SESSION_FILE_DIR', os.path.join(os.path.dirname(app.instance_path), 'flask_session'))
+        Session(app)
+    elif backend == 'sqlalchemy':
+        # server_sessions 資料表由 migration 建立（flask db upgrade）
+        app.session_interface = SqlSessionInterface(
+            app,
+            key_prefix=app.config.get('SESSION_KEY_PREFIX', 'session:'),
+            permanent=app.config.get('SESSION_PERMANENT', True),
+            cleanup_n_requests=app.config.get('SESSION_CLEANUP_N_REQUESTS'),
+            cleanup_batch_size=app.config.get('SESSION_CLEANUP_BATCH_SIZE', 500)
+        )
+    else:
+        app.session_interface = CookieSessionInterface()
+
+    return backend
@@ -0,0 +1,86 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# 依外鍵相依關係排程表格的匯出 / 匯入
+#
+# 相依關係直接由 SQLAlchemy metadata 推導，新增模型不需維護任何順序清單。
+# 同一層的表格彼此沒有外鍵相依，可以同時處理；匯入時必須等前一層完成才能開始下一層。
+
+def table_dependencies(tables):
+    """回傳 {table_name: {相依的 table_name}}，只包含 tables 之內的相依（忽略自我參照）"""
+    names = {table.name for table in tables}
+    dependencies = {}
+    for table in tables:
+        dependencies[table.name] = {
+            fk.column.table.name for fk in table.foreign_keys
+            if fk.column.table.name in names and fk.column.table.name != table.name
+        }
+    return dependencies
+
+def dependency_levels(tables):
+    """
+    將表格依外鍵分層：第 0 層沒有相依，第 n 層只相依於前幾層
+
+    Returns:
+        [[table_name, ...], ...]，每層內依名稱排序
+    """
+    remaining = table_dependencies(tables)
+    levels = []
+    done = set()
+    while remaining:
+        level = sorted(name for name, deps in remaining.items() if deps <= done)
+        if not level:
+            # 外鍵形成循環時無法排序，剩下的表格放在最後一層依序處理
+            logger.warning(f"表格外鍵形成循環: {', '.join(sorted(remaining))}")
+            levels.append(sorted(remaining))
+            break
+        levels.append(level)
+        done.update(level)
+        for name in level:
+            del remaining[name]
+    return levels
+
+def supported_workers(requested, write=False):
+    """
+    依資料庫種類決定可同時使用的連線數
+
+    SQLite 同一時間只允許一個寫入者，記憶體資料庫所有執行緒共用同一個連線，
+    這兩種情況只能循序處理；其他資料庫依要求的數量平行處理。
+    """
+    engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        if write or engine.url.database in (None, '', ':memory:'):
+            return 1
+    return max(1, requested or 1)
+
+def run_tables(app, table_names, func, workers=1):
+    """
+    對每個表格執行 func(table_name)，workers > 1 時以執行緒池同時處理
+
+    每個執行緒各自推入 app context，因此使用獨立的資料庫 session。
+
+    Returns:
+        {table_name: (func 的回傳值, 秒數)}，依 table_names 的順序
+    """
+    def timed(table_name):
+        started = time.perf_counter()
+        result = func(table_name)
+        return result, time.perf_counter() - started
+
+    def in_context(table_name):
+        with app.app_context():
+            try:
+                return timed(table_name)
+            finally:
+                db.session.remove()
+
+    if workers <= 1 or len(table_names) <= 1:
+        return {name: timed(name) for name in table_names}
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(table_names))) as pool:
+        futures = {name: pool.submit(in_context, name) for name in table_names}
+        return {name: futures[name].result() for name in table_names}
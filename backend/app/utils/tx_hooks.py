@@ -0,0 +1,39 @@
+from sqlalchemy import event # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+
+# 交易結束後才套用的變更
+#
+# ORM 事件在 flush 時觸發，此時交易仍可能回滾。各模組在事件中以 on_commit 記錄變更
+# （記在 session.info 中，依 key 累積），交易提交後一次交給 apply 處理，回滾時捨棄；
+# 清除快取這類回滾時也要執行的（丟棄本交易中以未提交資料建立的快取）以 on_rollback=True 記錄。
+
+PENDING_KEY = 'tx_hooks'
+
+def on_commit(db_session, key, items, apply, on_rollback=False):
+    """
+    記錄交易提交後要套用的變更
+
+    Args:
+        db_session: 變更所屬的 session，為 None 時不記錄
+        key: 變更種類，同一交易中相同 key 的 items 會合併後一次交給 apply
+        items: 可迭代的 ID（合併為 set），或 {ID: 值}（後記錄的值覆蓋先前的值）
+        apply: apply(合併後的 set 或 dict)
+        on_rollback: 回滾時是否也執行 apply
+    """
+    if db_session is None:
+        return
+    pending = db_session.info.setdefault(PENDING_KEY, {})
+    if key not in pending:
+        pending[key] = ({} if isinstance(items, dict) else set(), apply, on_rollback)
+    pending[key][0].update(items)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_committed(db_session):
+    for changes, apply, _ in db_session.info.pop(PENDING_KEY, {}).values():
+        apply(changes)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(db_session):
+    for changes, apply, on_rollback in db_session.info.pop(PENDING_KEY, {}).values():
+        if on_rollback:
+            apply(changes)
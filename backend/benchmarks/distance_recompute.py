@@ -0,0 +1,74 @@
+"""
+測量批次重算房源距離（app/utils/distances.py 的 recompute_distances）的耗時
+
+在暫存的 SQLite 檔案中以隨機經緯度建立房源，分別執行：
+  第一次重算  所有房源的 distance_to_university 與各地點距離都需要寫入
+  再次重算    距離沒有變動，只讀取與比對
+並與逐筆以 Python math 計算距離的方式比較計算時間。
+
+使用方式（於 backend 目錄）:
+    python benchmarks/distance_recompute.py [房源數]
+"""
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from app import create_app
+from app.extensions import db
+from app.models import User, Accommodation
+from app.utils.distances import recompute_distances, points_of_interest
+from app.utils.geo import EARTH_RADIUS
+
+def python_haversine(lat, lng, lat0, lng0):
+    lat, lng, lat0, lng0 = map(math.radians, (lat, lng, lat0, lng0))
+    a = math.sin((lat - lat0) / 2) ** 2 + math.cos(lat0) * math.cos(lat) * math.sin((lng - lng0) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+def seed(n, rng):
+    """以 Core 批次寫入房源（不經過 ORM 事件，距離保持空值）"""
+    db.session.add(User(user_id=1, username='bench', email='bench@example.com', password_hash='x'))
+    db.session.commit()
+    now = datetime.utcnow()
+    rows = [{
+        'owner_id': 1, 'title': f'房源 {i}', 'property_type': 'studio', 'contact_info': '0912-345-678',
+        'rent_price': 5000, 'address': '桃園市中壢區中大路', 'status': 'available', 'version': 1,
+        'latitude': 24.968 + rng.uniform(-0.05, 0.05), 'longitude': 121.195 + rng.uniform(-0.05, 0.05),
+        'created_at': now, 'updated_at': now,
+    } for i in range(n)]
+    db.session.execute(Accommodation.__table__.insert(), rows)
+    db.session.commit()
+    return rows
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    path = os.path.join(tempfile.mkdtemp(), 'distances.sqlite')
+    config.TestingConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        rows = seed(n, random.Random(42))
+        pois = points_of_interest()
+
+        start = time.perf_counter()
+        for row in rows:
+            for lat0, lng0 in pois.values():
+                python_haversine(row['latitude'], row['longitude'], lat0, lng0)
+        python_seconds = time.perf_counter() - start
+
+        print(f'{n} 筆房源 × {len(pois)} 個地點')
+        print(f'逐筆 Python 計算: {python_seconds:.3f} 秒')
+        for label in ('第一次重算', '再次重算'):
+            result = recompute_distances()
+            print(f"{label}: numpy 計算 {result['compute_seconds']:.3f} 秒，含讀寫共 {result['seconds']:.2f} 秒，"
+                  f"{result['updated']} 筆 distance_to_university 有變動，寫入 {result['poi_updated']} 筆地點距離")
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+測量篩選索引（app/utils/facets.py）在大量房源下的篩選與筆數計算耗時
+
+以隨機房源建立索引，對幾組常見的篩選條件各查詢多次，列出 p50 / p99 延遲。
+
+使用方式（於 backend 目錄）:
+    python benchmarks/facet_counts.py [房源數]
+"""
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.facets import FacetIndex, facet_values, FEATURE_COLUMNS
+
+DISTRICTS = ['中壢區', '平鎮區', '楊梅區', '桃園區', '八德區', '龍潭區']
+PROPERTY_TYPES = ['apartment', 'studio', 'house', 'shared_room', 'single_room']
+FILTERS = [
+    ('無條件', {}, {}),
+    ('行政區', {'district': ['中壢區']}, {}),
+    ('行政區 + 類型', {'district': ['中壢區', '平鎮區'], 'property_type': ['studio']}, {}),
+    ('設備 + 特色', {'amenity': ['1', '5'], 'feature': ['internet']}, {}),
+    ('租金範圍 + 空房', {'room_type': ['studio']}, {'min_price': 4000, 'max_price': 8000}),
+]
+
+def make_rows(n, rng):
+    for i in range(n):
+        row = SimpleNamespace(
+            accommodation_id=i + 1,
+            district=rng.choice(DISTRICTS),
+            property_type=rng.choice(PROPERTY_TYPES),
+            rent_price=rng.randrange(2500, 20000, 100),
+            distance_to_university=rng.uniform(100, 5000),
+            created_at=time.time() - rng.randrange(0, 86400 * 365),
+            studio_available=rng.randint(0, 3),
+            single_available=rng.randint(0, 3),
+            **{column: rng.random() < 0.5 for column in FEATURE_COLUMNS.values()}
+        )
+        yield row, [str(a) for a in rng.sample(range(1, 31), rng.randint(0, 10))]
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = random.Random(42)
+    docs = [
+        (row.accommodation_id, facet_values(row, amenities), float(row.rent_price),
+         row.distance_to_university, row.created_at)
+        for row, amenities in make_rows(n, rng)
+    ]
+    index = FacetIndex()
+    start = time.perf_counter()
+    index.load(docs)
+    print(f'建立索引: {n} 筆房源 {time.perf_counter() - start:.2f} 秒')
+
+    start = time.perf_counter()
+    for doc in docs[:5000]:
+        index.upsert(*doc)
+    print(f'增量更新: 5000 筆 {time.perf_counter() - start:.2f} 秒')
+
+    print(f"{'條件':<16}{'符合':>8}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for name, selected, price_range in FILTERS:
+        samples = []
+        for i in range(200):
+            start = time.perf_counter()
+            total, _, _ = index.query(selected, sort_by='price_low', offset=(i % 5) * 20, limit=20, **price_range)
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f'{name:<16}{total:>8}{percentile(samples, 0.5):>10.2f}{percentile(samples, 0.99):>10.2f}')
+
+if __name__ == '__main__':
+    main()
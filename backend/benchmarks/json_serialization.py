@@ -0,0 +1,95 @@
+"""
+比較 JSON 編碼方式處理一頁 100 筆房源的耗時
+
+  flask 預設      Flask 內建的 DefaultJSONProvider（標準函式庫 json，排序鍵值）
+  標準函式庫      json.dumps 加上 app.utils.json_provider 的型別轉換
+  FastJSON       app.utils.json_provider（有安裝 orjson 時使用 orjson）
+
+分別編碼列表頁的回應（serialize_accommodations 已轉換好的資料）
+與直接從資料表讀出、仍為 Decimal / datetime 的原始記錄。
+
+使用方式（於 backend 目錄）:
+    python benchmarks/json_serialization.py [重複次數]
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask # type: ignore
+from flask.json.provider import DefaultJSONProvider # type: ignore
+from sqlalchemy import inspect # type: ignore
+from app.extensions import db
+from app.models import User, Accommodation, AccommodationImage, Amenity
+from app.schemas.accommodation import serialize_accommodations
+from app.utils import json_provider
+from app.utils.json_provider import FastJSONProvider, _default
+
+PAGE_SIZE = 100
+
+def make_app():
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///:memory:', SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(user_id=1, username='bench', email='bench@example.com', password_hash='x'))
+        amenities = [Amenity(name=f'設備 {i}', category='appliance') for i in range(8)]
+        db.session.add_all(amenities)
+        now = datetime.utcnow()
+        for i in range(PAGE_SIZE):
+            acc = Accommodation(
+                owner_id=1, title=f'中央大學後門 套房 {i}', description='近後門，步行五分鐘，採光良好' * 4,
+                property_type='apartment', contact_info='0912-345-678', rent_price=Decimal(5000 + i * 10),
+                deposit=Decimal(10000), address=f'桃園市中壢區中大路 {i} 號', city='桃園市', district='中壢區',
+                latitude=Decimal('24.96812345'), longitude=Decimal('121.19512345'), status='available',
+                distance_to_university=350.5 + i, created_at=now - timedelta(days=i), updated_at=now
+            )
+            acc.amenities = amenities[: i % 8]
+            db.session.add(acc)
+            db.session.flush()
+            db.session.add_all([
+                AccommodationImage(accommodation_id=acc.accommodation_id, image_url=f'/uploads/{i}-{j}.jpg',
+                                   is_primary=j == 0)
+                for j in range(3)
+            ])
+        db.session.commit()
+    return app
+
+def measure(func, n):
+    func()  # 暖機
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - start) / n * 1e6
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    app = make_app()
+    with app.app_context():
+        accommodations = Accommodation.query.order_by(Accommodation.created_at.desc()).limit(PAGE_SIZE).all()
+        page = {'success': True, 'total': PAGE_SIZE, 'page': 1, 'items': serialize_accommodations(accommodations)}
+        columns = [attr.key for attr in inspect(Accommodation).column_attrs]
+        raw = {'items': [{key: getattr(acc, key) for key in columns} for acc in accommodations]}
+
+        flask_default = DefaultJSONProvider(app)
+        fast = FastJSONProvider(app)
+        encoders = [
+            ('flask 預設', lambda obj: flask_default.dumps(obj)),
+            ('標準函式庫', lambda obj: json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':'))),
+            ('FastJSON', lambda obj: fast.dumps(obj)),
+        ]
+
+        print(f"JSON 後端: {'orjson' if json_provider.orjson is not None else '標準函式庫'}，每頁 {PAGE_SIZE} 筆，重複 {n} 次")
+        print(f"{'編碼方式':<12}{'列表頁 (µs)':>14}{'原始記錄 (µs)':>16}")
+        for name, encode in encoders:
+            page_us = measure(lambda: encode(page), n)
+            raw_us = measure(lambda: encode(raw), n)
+            print(f"{name:<12}{page_us:>14.0f}{raw_us:>16.0f}")
+
+if __name__ == '__main__':
+    main()
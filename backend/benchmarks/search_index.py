@@ -0,0 +1,69 @@
+"""
+測量房源全文搜尋索引（app/utils/search.py）的建立時間與查詢延遲
+
+以隨機組合的中文房源文字建立索引，對常見與少見的關鍵字各查詢多次，
+列出 p50 / p99 延遲，並測量增量更新的速度。
+
+使用方式（於 backend 目錄）:
+    python benchmarks/search_index.py [房源數]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.search import SearchIndex
+
+DISTRICTS = ['中壢區', '平鎮區', '楊梅區', '桃園區', '八德區', '龍潭區']
+ROADS = ['中大路', '五權里', '環中東路', '中央路', '新中北路', '民族路', '後寮路']
+TYPES = ['套房', '雅房', '整層住家', '家庭式', '學舍']
+FEATURES = [
+    '近後門', '步行五分鐘', '採光良好', '有對外窗', '獨立洗衣機', '附冷氣', '可養寵物', '近便利商店',
+    '電梯大樓', '有機車位', '近公車站', '安靜住宅區', '新裝潢', '含網路', '房東親切', '可短租',
+    '附家具', '垃圾代收', '近捷運', '全天候保全', '女生限定', '可開伙', '有陽台', '近夜市',
+]
+QUERIES = ['套房', '中大路', '近後門', '獨立洗衣機', '近捷運 可養寵物', '平鎮區 雅房', '陽', '全天候保全 女生限定 有陽台']
+
+def make_docs(n, rng):
+    for i in range(n):
+        features = rng.sample(FEATURES, 6)
+        yield i + 1, {
+            'title': f'{rng.choice(ROADS)} {rng.choice(TYPES)} {features[0]}',
+            'district': rng.choice(DISTRICTS),
+            'address': f'桃園市{rng.choice(DISTRICTS)}{rng.choice(ROADS)}{rng.randint(1, 500)}號',
+            'description': '，'.join(features * 3),
+        }
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = random.Random(42)
+    docs = list(make_docs(n, rng))
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for doc_id, values in docs:
+        index.upsert(doc_id, values)
+    print(f'建立索引: {n} 筆房源 {time.perf_counter() - start:.2f} 秒')
+
+    print(f"{'關鍵字':<24}{'命中':>8}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for query in QUERIES:
+        samples = []
+        for i in range(200):
+            start = time.perf_counter()
+            total, _ = index.search(query, offset=(i % 5) * 20, limit=20)
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f'{query:<24}{total:>8}{percentile(samples, 0.5):>10.2f}{percentile(samples, 0.99):>10.2f}')
+
+    start = time.perf_counter()
+    for doc_id, values in docs[:5000]:
+        index.upsert(doc_id, dict(values, title=values['title'] + ' 已更新'))
+    print(f'增量更新: 5000 筆 {time.perf_counter() - start:.2f} 秒')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+比較各 Session 後端的每請求額外開銷
+
+以相同的最小應用程式分別套用 filesystem / sqlalchemy / cookie 後端，
+先登入寫入 Session，再量測讀取 Session 的 GET 請求與寫入 Session 的 POST 請求。
+
+使用方式（於 backend 目錄）:
+    python benchmarks/session_backends.py [請求數]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, session, jsonify # type: ignore
+from app.extensions import db
+from app.utils.session import init_session, SESSION_BACKENDS
+
+def make_app(backend, workdir):
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='bench',
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(workdir, f'{backend}.sqlite'),
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        SESSION_BACKEND=backend,
+        SESSION_PERMANENT=True,
+        PERMANENT_SESSION_LIFETIME=timedelta(days=7),
+        SESSION_FILE_DIR=os.path.join(workdir, 'flask_session'),
+    )
+    db.init_app(app)
+    if backend == 'sqlalchemy':
+        # 正式環境由 migration 建立 server_sessions
+        from app.models.session import ServerSession
+        with app.app_context():
+            ServerSession.__table__.create(db.engine, checkfirst=True)
+    init_session(app)
+
+    @app.route('/login', methods=['POST'])
+    def login():
+        session['user_id'] = 1
+        session['username'] = 'bench'
+        session['user_role'] = 'student'
+        return jsonify({'success': True})
+
+    @app.route('/me')
+    def me():
+        return jsonify({'user_id': session.get('user_id')})
+
+    @app.route('/touch', methods=['POST'])
+    def touch():
+        session['counter'] = session.get('counter', 0) + 1
+        return jsonify({'counter': session['counter']})
+
+    return app
+
+def measure(client, method, path, n):
+    call = getattr(client, method)
+    call(path)  # 暖機
+    start = time.perf_counter()
+    for _ in range(n):
+        response = call(path)
+        assert response.status_code == 200
+    return (time.perf_counter() - start) / n * 1e6
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workdir = tempfile.mkdtemp(prefix='session_bench_')
+    try:
+        print(f"{'後端':<12}{'讀取 GET (µs)':>16}{'寫入 POST (µs)':>16}")
+        for backend in SESSION_BACKENDS:
+            app = make_app(backend, workdir)
+            with app.test_client() as client:
+                client.post('/login')
+                read_us = measure(client, 'get', '/me', n)
+                write_us = measure(client, 'post', '/touch', n)
+            print(f"{backend:<12}{read_us:>16.1f}{write_us:>16.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
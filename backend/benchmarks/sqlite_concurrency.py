@@ -0,0 +1,110 @@
+"""
+比較 SQLite 調校前後的並行讀寫吞吐量
+
+以多個執行緒同時寫入聊天訊息、讀取房源列表，分別使用預設連線設定（rollback journal）
+與 app/extensions.py 的調校設定（WAL 等 PRAGMA 與連線池），統計每秒完成的讀寫次數
+以及 database is locked 錯誤數。
+
+使用方式（於 backend 目錄）:
+    python benchmarks/sqlite_concurrency.py [秒數] [寫入執行緒數] [讀取執行緒數]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask # type: ignore
+from sqlalchemy.exc import OperationalError # type: ignore
+from config import Config
+from app.extensions import db, init_db
+from app.models import User, Accommodation, Message
+
+def make_app(tuned, workdir):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(workdir, f"{'tuned' if tuned else 'default'}.sqlite"),
+        SQLITE_TUNING=tuned,
+    )
+    init_db(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(user_id=1, username='bench', email='bench@example.com', password_hash='x'))
+        db.session.add_all([
+            Accommodation(owner_id=1, title=f'房源 {i}', property_type='apartment', contact_info='x',
+                          rent_price=Decimal(5000 + i), address='桃園市中壢區', status='available',
+                          created_at=datetime.utcnow())
+            for i in range(500)
+        ])
+        db.session.commit()
+    return app
+
+def run(app, seconds, writers, readers):
+    counts = {'write': 0, 'read': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def write():
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                try:
+                    db.session.add(Message(sender_id=1, receiver_id=1, message='hello', time=datetime.utcnow()))
+                    db.session.commit()
+                    count('write')
+                except OperationalError:
+                    db.session.rollback()
+                    count('locked')
+            db.session.remove()
+
+    def read():
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                try:
+                    Accommodation.query.filter_by(status='available') \
+                        .order_by(Accommodation.created_at.desc()).limit(20).all()
+                    Message.query.order_by(Message.chat_id.desc()).limit(50).all()
+                    db.session.rollback()
+                    count('read')
+                except OperationalError:
+                    db.session.rollback()
+                    count('locked')
+            db.session.remove()
+
+    threads = [threading.Thread(target=write) for _ in range(writers)] + \
+              [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    readers = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    workdir = tempfile.mkdtemp(prefix='sqlite_bench_')
+    try:
+        print(f"{seconds:g} 秒，{writers} 個寫入執行緒，{readers} 個讀取執行緒")
+        print(f"{'設定':<10}{'寫入/秒':>12}{'讀取/秒':>12}{'locked 錯誤':>14}")
+        for tuned in (False, True):
+            app = make_app(tuned, workdir)
+            counts = run(app, seconds, writers, readers)
+            with app.app_context():
+                db.engine.dispose()
+            label = '調校後' if tuned else '預設'
+            print(f"{label:<10}{counts['write'] / seconds:>12.0f}{counts['read'] / seconds:>12.0f}{counts['locked']:>14}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
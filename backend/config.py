@@ -15,6 +15,51 @@ class Config:
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
     JWT_BLACKLIST_ENABLED = False
+    # 聊天訊息延遲寫入設定
+    CHAT_WRITE_BEHIND = True
+    CHAT_WRITE_BATCH_SIZE = 100  # 緩衝區達到此筆數立即寫入
+    CHAT_WRITE_FLUSH_INTERVAL = 0.5  # 最長等待秒數
+    CHAT_WRITE_MAX_RETRIES = 8  # 重試此次數仍失敗的訊息移至 CHAT_JOURNAL_PATH.dead
+    CHAT_JOURNAL_FSYNC = False  # 每筆訊息寫入日誌後是否 fsync
+    # Session 後端：filesystem / sqlalchemy / cookie（見 app/utils/session.py）
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND') or 'sqlalchemy'
+    SESSION_CLEANUP_N_REQUESTS = None  # 設定後平均每 N 個請求清理一次，否則使用 flask session_cleanup 指令
+    SESSION_CLEANUP_BATCH_SIZE = 500  # 每批刪除的過期 Session 數
+    # SQLite 檔案資料庫調校（見 app/extensions.py，使用其他資料庫時不套用）
+    SQLITE_TUNING = True
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # 讀取不被寫入阻擋
+        'synchronous': 'NORMAL',  # WAL 模式下僅在 checkpoint 時 fsync，斷電最多遺失最後幾筆交易
+        'busy_timeout': 5000,  # 毫秒，等待其他寫入者而不是立即回報 database is locked
+        'cache_size': -64000,  # 負值為 KiB，約 64 MB 頁面快取
+        'mmap_size': 268435456,  # 以 256 MB 記憶體對應讀取資料庫檔案
+        'temp_store': 'MEMORY',  # 排序與暫存表放在記憶體
+    }
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 10))  # 約等於同時處理的請求數
+    SQLITE_MAX_OVERFLOW = 20
+    SQLITE_POOL_TIMEOUT = 30  # 秒
+    # 讀寫分離（見 app/utils/db_routing.py），未設定 replica 時所有查詢都走主資料庫
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    REPLICA_STICKY_SECONDS = 10  # 用戶寫入後這段時間內的讀取改走主資料庫，應大於 replica 的複製延遲
+    # 地圖查詢（見 app/utils/geo.py）：未指定中心時以中央大學為中心
+    CAMPUS_LOCATION = (24.96812, 121.19508)
+    GEO_MAX_RADIUS = 20000  # 公尺
+    # 計算房源距離的地點（見 app/utils/distances.py），distance_to_university 為到 UNIVERSITY_POI 的距離
+    POINTS_OF_INTEREST = {
+        'main_gate': (24.97028, 121.19278),  # 中央大學正門
+        'back_gate': (24.96526, 121.19118),  # 中央大學後門
+        'library': (24.96839, 121.19434),  # 總圖書館
+        'mrt': (25.01290, 121.21496),  # 機場捷運 A18 高鐵桃園站
+    }
+    UNIVERSITY_POI = 'main_gate'
+    # 搜尋與篩選索引（見 app/utils/listing_versions.py）每隔這段時間比對一次資料庫中房源的 version
+    LISTING_INDEX_CHECK_INTERVAL = 2  # 秒
+    # 回應壓縮（見 app/utils/compression.py），有安裝 brotli 時優先使用 br
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 1024  # bytes，較小的回應不壓縮
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5  # 0-11，5 左右的壓縮率已接近 gzip -9 且速度較快
+    COMPRESS_CACHE_SIZE = 256  # 快取的壓縮結果數
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -22,6 +67,7 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    CHAT_WRITE_BEHIND = False
 
 class ProductionConfig(Config):
     DEBUG = False
@@ -13,12 +13,14 @@ from app.models.accommodation import (
 )
 from app.models.review import Review
 from app.models.comments import Comment, Reply, CommentLike, ReplyLike, Report
-from app.models.chat import Message
+from app.models.chat import Message, Conversation
 from app.models.notification import Notification
 from app.models.fraud import FraudReport
 from app.models.lease import Lease
 from app.models.maintenance import MaintenanceRequest, MaintenanceImage
 from app.models.sublet import Sublet
+from app.models.session import ServerSession
+from app.models.sync import SyncTombstone
 
 # 定義要檢查的所有模型和表格名稱
 MODEL_TABLES = [
@@ -37,12 +39,15 @@ MODEL_TABLES = [
     (ReplyLike, 'reply_likes'),
     (Report, 'reports'),
     (Message, 'chat_message'),
+    (Conversation, 'chat_conversations'),
     (Notification, 'notifications'),
     (FraudReport, 'fraud_reports'),
     (Lease, 'leases'),
     (MaintenanceRequest, 'maintenance_requests'),
     (MaintenanceImage, 'maintenance_images'),
-    (Sublet, 'sublets')
+    (Sublet, 'sublets'),
+    (ServerSession, 'server_sessions'),
+    (SyncTombstone, 'sync_tombstones')
 ]
 
 def create_backup(db_path):
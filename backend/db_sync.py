@@ -3,12 +3,22 @@ import json
 import os
 from datetime import datetime
 from app import create_app
-from app.utils.db_json import export_db_to_json, import_db_from_json
+from app.utils.db_json import (
+    import_db_from_json, SNAPSHOT_COMPRESSIONS, parse_watermarks, prune_tombstones
+)
+from app.utils.db_columnar import COLUMNAR_SUFFIX, export_snapshot, load_snapshot, convert_snapshot
 
 def get_app():
     """獲取 Flask 應用實例"""
     return create_app('development')
 
+def is_snapshot_file(filename):
+    """是否為匯出的快照檔（.json、壓縮後的 .json.gz / .json.zst 或欄式的 .npz）"""
+    if filename == 'sync_status.json':
+        return False
+    suffixes = ['.json', COLUMNAR_SUFFIX] + ['.json' + suffix for suffix in SNAPSHOT_COMPRESSIONS.values()]
+    return any(filename.endswith(suffix) for suffix in suffixes)
+
 def create_sync_folder():
     """創建同步資料夾"""
     sync_folder = os.path.join(os.path.dirname(__file__), 'db_sync')
@@ -21,36 +31,68 @@ def export_command(args):
     with app.app_context():
         sync_folder = create_sync_folder()
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        status_file = os.path.join(sync_folder, 'sync_status.json')
+        status = safe_load_json(status_file) if os.path.exists(status_file) else {}
+        
+        # 增量匯出需要先前匯出時記錄的水位
+        since = None
+        if args.incremental:
+            if not status.get('watermarks') or not status.get('chain'):
+                print("錯誤: 尚未有完整匯出的水位紀錄，請先執行一次完整匯出")
+                return
+            since = parse_watermarks(status['watermarks'])
         
-        # 使用指定的檔名或生成包含時間戳的檔名
-        filename = args.filename if args.filename else f"db_export_{timestamp}.json"
+        # 使用指定的檔名或生成包含時間戳的檔名，快照格式由副檔名決定
+        if args.format == 'npz':
+            if args.compress:
+                print("錯誤: 欄式快照不支援壓縮（需要以記憶體對應讀取）")
+                return
+            extension = COLUMNAR_SUFFIX
+        else:
+            extension = '.json' + SNAPSHOT_COMPRESSIONS.get(args.compress, '')
+        prefix = 'db_delta' if args.incremental else 'db_export'
+        filename = args.filename if args.filename else f"{prefix}_{timestamp}{extension}"
         filepath = os.path.join(sync_folder, filename)
         
-        # 匯出資料庫
-        export_db_to_json(filepath)
+        # 以串流方式匯出資料庫，逐表顯示進度
+        def report(table_name, rows, seconds):
+            rate = rows / seconds if seconds > 0 else 0
+            print(f"  {table_name}: {rows} 筆 ({seconds:.2f} 秒, {rate:.0f} 筆/秒)")
+        
+        result = export_snapshot(filepath, batch_size=args.batch_size, on_table=report, since=since,
+                                 workers=args.workers)
         print(f"資料庫已匯出至: {filepath}")
+        if args.incremental:
+            print(f"刪除紀錄: {result['tables']['_tombstones']['rows']} 筆")
+        print(f"共 {result['rows']} 筆記錄，耗時 {result['seconds']:.2f} 秒 ({result['rows_per_second']:.0f} 筆/秒)")
         
-        # 更新同步狀態檔
-        status_file = os.path.join(sync_folder, 'sync_status.json')
-        status = {
-            'last_export': {
-                'timestamp': timestamp,
-                'filename': filename,
-                'user': os.environ.get('USERNAME', 'unknown')
-            }
+        # 更新同步狀態檔：水位供下次增量匯出使用，chain 為完整快照加上其後的增量快照
+        status['last_export'] = {
+            'timestamp': timestamp,
+            'filename': filename,
+            'kind': result['kind'],
+            'user': os.environ.get('USERNAME', 'unknown')
         }
+        status['watermarks'] = result['watermarks']
+        status['chain'] = status['chain'] + [filename] if args.incremental else [filename]
         
         with open(status_file, 'w', encoding='utf-8') as f:
             json.dump(status, f, ensure_ascii=False, indent=2)
+        
+        # 完整快照已包含所有刪除結果，之前的刪除紀錄不再需要
+        if not args.incremental:
+            prune_tombstones(result['watermarks']['_tombstones'])
 
-        files = [f for f in os.listdir(sync_folder) if f.endswith('.json') and f != 'sync_status.json']
+        files = [f for f in os.listdir(sync_folder) if is_snapshot_file(f)]
         if len(files) > 15:
             # 根據文件修改時間排序
             files_with_time = [(f, os.path.getmtime(os.path.join(sync_folder, f))) for f in files]
             sorted_files = sorted(files_with_time, key=lambda x: x[1], reverse=True)
             
-            # 刪除舊文件
+            # 刪除舊文件（目前 chain 中的快照必須保留）
             for old_file, _ in sorted_files[15:]:
+                if old_file in status['chain']:
+                    continue
                 try:
                     os.remove(os.path.join(sync_folder, old_file))
                     print(f"已刪除舊備份: {old_file}")
@@ -93,6 +135,11 @@ def import_command(args):
     with app.app_context():
         sync_folder = create_sync_folder()
         
+        # 依序重播完整快照與其後的增量快照
+        if args.chain:
+            chain_import(args, sync_folder)
+            return
+        
         # 使用指定的檔名或最新的匯出檔
         if args.filename:
             filepath = os.path.join(sync_folder, args.filename)
@@ -127,29 +174,86 @@ def import_command(args):
                 return
         
         # 匯入資料庫
-        result = import_db_from_json(filepath, clear_existing=args.clear)
+        result = import_db_from_json(data=load_snapshot(filepath), clear_existing=args.clear, workers=args.workers)
+        print_import_tables(result)
         print(f"資料庫匯入完成: {result['imported']} 筆記錄成功，{result['errors']} 筆記錄失敗")
         
-        # 更新同步狀態檔
-        status_file = os.path.join(sync_folder, 'sync_status.json')
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        if os.path.exists(status_file):
-            status = safe_load_json(status_file)
-        else:
-            status = {}
-        
-        status['last_import'] = {
-            'timestamp': timestamp,
-            'filename': os.path.basename(filepath),
-            'user': os.environ.get('USERNAME', 'unknown')
-        }
-        
-        try:
-            with open(status_file, 'w', encoding='utf-8') as f:
-                json.dump(status, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"寫入同步狀態檔時出錯: {str(e)}")
+        record_import(sync_folder, os.path.basename(filepath))
+
+def chain_import(args, sync_folder):
+    """依 sync_status.json 的 chain 依序匯入完整快照與增量快照"""
+    status_file = os.path.join(sync_folder, 'sync_status.json')
+    status = safe_load_json(status_file) if os.path.exists(status_file) else {}
+    chain = status.get('chain')
+    if not chain:
+        print("錯誤: 同步狀態檔中沒有快照鏈，請先執行完整匯出")
+        return
+    
+    filepaths = [os.path.join(sync_folder, filename) for filename in chain]
+    missing = [path for path in filepaths if not os.path.exists(path)]
+    if missing:
+        print(f"錯誤: 找不到快照鏈中的檔案 {', '.join(missing)}")
+        return
+    
+    # 確認匯入
+    if not args.force:
+        confirm = input(f"將依序匯入 {len(chain)} 個快照（{chain[0]} 起），繼續嗎? [y/N] ")
+        if confirm.lower() not in ['y', 'yes']:
+            print("匯入已取消")
+            return
+    
+    for index, filepath in enumerate(filepaths):
+        # 只有完整快照可以清空現有資料
+        result = import_db_from_json(data=load_snapshot(filepath), clear_existing=args.clear and index == 0,
+                                     workers=args.workers)
+        print_import_tables(result)
+        print(f"{os.path.basename(filepath)}: {result['imported']} 筆記錄成功，"
+              f"{result['errors']} 筆記錄失敗，刪除 {result['deleted']} 筆")
+    
+    record_import(sync_folder, chain[-1])
+
+def print_import_tables(result):
+    """依相依層級列出每個表格的匯入筆數與耗時"""
+    tables = [(name, info) for name, info in result['tables'].items() if 'level' in info]
+    for name, info in sorted(tables, key=lambda item: (item[1]['level'], item[0])):
+        print(f"  [{info['level']}] {name}: 新增 {info['inserted']} 筆，更新 {info['updated']} 筆，"
+              f"失敗 {info['errors']} 筆 ({info['seconds']:.2f} 秒)")
+
+def record_import(sync_folder, filename):
+    """更新同步狀態檔的最後匯入紀錄"""
+    status_file = os.path.join(sync_folder, 'sync_status.json')
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    if os.path.exists(status_file):
+        status = safe_load_json(status_file)
+    else:
+        status = {}
+    
+    status['last_import'] = {
+        'timestamp': timestamp,
+        'filename': filename,
+        'user': os.environ.get('USERNAME', 'unknown')
+    }
+    
+    try:
+        with open(status_file, 'w', encoding='utf-8') as f:
+            json.dump(status, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"寫入同步狀態檔時出錯: {str(e)}")
+
+def convert_command(args):
+    """在 JSON 與欄式快照之間轉換"""
+    app = get_app()
+    with app.app_context():
+        sync_folder = create_sync_folder()
+        source = os.path.join(sync_folder, args.filename)
+        if not os.path.exists(source):
+            print(f"錯誤: 找不到檔案 {source}")
+            return
+        target = os.path.join(sync_folder, args.output)
+        convert_snapshot(source, target)
+        print(f"已轉換 {args.filename} -> {args.output} "
+              f"({os.path.getsize(source) / 1024:.1f} KB -> {os.path.getsize(target) / 1024:.1f} KB)")
 
 def status_command(args):
     """查看同步狀態"""
@@ -174,9 +278,12 @@ def status_command(args):
         print(f"最後匯入: {import_info['timestamp']} (由 {import_info['user']} 執行)")
         print(f"匯入檔案: {import_info['filename']}")
     
+    if status.get('chain'):
+        print(f"快照鏈: {' -> '.join(status['chain'])}")
+    
     # 列出所有匯出檔
     print("\n可用的匯出檔:")
-    files = [f for f in os.listdir(sync_folder) if f.endswith('.json') and f != 'sync_status.json']
+    files = [f for f in os.listdir(sync_folder) if is_snapshot_file(f)]
     for file in sorted(files, reverse=True):
         file_path = os.path.join(sync_folder, file)
         file_size = os.path.getsize(file_path) / 1024  # KB
@@ -190,12 +297,24 @@ if __name__ == '__main__':
     # 匯出命令
     export_parser = subparsers.add_parser('export', help='匯出資料庫')
     export_parser.add_argument('-f', '--filename', help='指定匯出檔名')
+    export_parser.add_argument('-c', '--compress', choices=list(SNAPSHOT_COMPRESSIONS), help='壓縮格式（zstd 需安裝 zstandard）')
+    export_parser.add_argument('--format', choices=['json', 'npz'], default='json', help='快照格式（未指定檔名時使用；npz 為欄式格式）')
+    export_parser.add_argument('--batch-size', type=int, default=1000, help='每批讀取的筆數')
+    export_parser.add_argument('-i', '--incremental', action='store_true', help='只匯出上次匯出後變更的記錄')
+    export_parser.add_argument('--workers', type=int, default=4, help='同時匯出的表格數（SQLite 記憶體資料庫固定為 1）')
     
     # 匯入命令
     import_parser = subparsers.add_parser('import', help='匯入資料庫')
     import_parser.add_argument('-f', '--filename', help='指定匯入檔名')
     import_parser.add_argument('--clear', action='store_true', help='清空現有資料')
     import_parser.add_argument('--force', action='store_true', help='不詢問確認')
+    import_parser.add_argument('--chain', action='store_true', help='依序匯入最近的完整快照及其後的增量快照')
+    import_parser.add_argument('--workers', type=int, default=4, help='同一相依層級中同時匯入的表格數（SQLite 固定為 1）')
+    
+    # 轉換命令
+    convert_parser = subparsers.add_parser('convert', help='轉換快照格式（依副檔名判斷）')
+    convert_parser.add_argument('-f', '--filename', required=True, help='來源快照檔名')
+    convert_parser.add_argument('-o', '--output', required=True, help='輸出快照檔名（.json / .json.gz / .npz）')
     
     # 狀態命令
     status_parser = subparsers.add_parser('status', help='查看同步狀態')
@@ -206,6 +325,8 @@ if __name__ == '__main__':
         export_command(args)
     elif args.command == 'import':
         import_command(args)
+    elif args.command == 'convert':
+        convert_command(args)
     elif args.command == 'status':
         status_command(args)
     else:
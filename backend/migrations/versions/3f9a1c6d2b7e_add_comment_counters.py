@@ -0,0 +1,48 @@
+"""add like / reply counters to comments and replies
+
+Revision ID: 3f9a1c6d2b7e
+Revises: 0c73e5daaf17
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c6d2b7e'
+down_revision = '0c73e5daaf17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('replies', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+
+    # 以現有資料回填計數器
+    op.execute(
+        "UPDATE comments SET like_count = "
+        "(SELECT COUNT(*) FROM comment_likes WHERE comment_likes.comment_id = comments.id)"
+    )
+    op.execute(
+        "UPDATE comments SET reply_count = "
+        "(SELECT COUNT(*) FROM replies WHERE replies.comment_id = comments.id)"
+    )
+    op.execute(
+        "UPDATE replies SET like_count = "
+        "(SELECT COUNT(*) FROM reply_likes WHERE reply_likes.reply_id = replies.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('replies', schema=None) as batch_op:
+        batch_op.drop_column('like_count')
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_column('reply_count')
+        batch_op.drop_column('like_count')
@@ -0,0 +1,31 @@
+"""add server_sessions table for database-backed sessions
+
+Revision ID: 5e1d7a93c0b4
+Revises: c82b5e07d9a4
+Create Date: 2026-10-18 13:05:42.118304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1d7a93c0b4'
+down_revision = 'c82b5e07d9a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('server_sessions',
+    sa.Column('session_id', sa.String(length=255), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('expiry', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('session_id')
+    )
+    op.create_index('ix_server_sessions_expiry', 'server_sessions', ['expiry'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_server_sessions_expiry', table_name='server_sessions')
+    op.drop_table('server_sessions')
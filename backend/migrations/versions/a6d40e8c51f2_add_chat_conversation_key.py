@@ -0,0 +1,37 @@
+"""add conversation key and index to chat_message
+
+Revision ID: a6d40e8c51f2
+Revises: 3f9a1c6d2b7e
+Create Date: 2026-10-18 11:03:52.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d40e8c51f2'
+down_revision = '3f9a1c6d2b7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('chat_message', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('conversation_key', sa.String(length=41), nullable=True))
+
+    # 回填既有訊息的對話鍵："較小ID:較大ID"
+    op.execute(
+        "UPDATE chat_message SET conversation_key = CASE "
+        "WHEN sender_id < receiver_id THEN CAST(sender_id AS VARCHAR) || ':' || CAST(receiver_id AS VARCHAR) "
+        "ELSE CAST(receiver_id AS VARCHAR) || ':' || CAST(sender_id AS VARCHAR) END"
+    )
+
+    with op.batch_alter_table('chat_message', schema=None) as batch_op:
+        batch_op.create_index('ix_chat_message_conversation_time', ['conversation_key', 'time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chat_message', schema=None) as batch_op:
+        batch_op.drop_index('ix_chat_message_conversation_time')
+        batch_op.drop_column('conversation_key')
@@ -0,0 +1,36 @@
+"""add accommodation_distances table
+
+Revision ID: a91e4d7c3b58
+Revises: f6c2b8d1a934
+Create Date: 2026-10-18 18:41:09.832715
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91e4d7c3b58'
+down_revision = 'f6c2b8d1a934'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 建立後執行 flask recompute-distances 計算現有房源的距離
+    op.create_table('accommodation_distances',
+        sa.Column('accommodation_id', sa.Integer(), nullable=False),
+        sa.Column('poi', sa.String(length=32), nullable=False),
+        sa.Column('distance', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['accommodation_id'], ['accommodations.accommodation_id'], ),
+        sa.PrimaryKeyConstraint('accommodation_id', 'poi')
+    )
+    with op.batch_alter_table('accommodation_distances', schema=None) as batch_op:
+        batch_op.create_index('ix_accommodation_distances_poi_distance', ['poi', 'distance', 'accommodation_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('accommodation_distances', schema=None) as batch_op:
+        batch_op.drop_index('ix_accommodation_distances_poi_distance')
+
+    op.drop_table('accommodation_distances')
@@ -0,0 +1,68 @@
+"""add composite indexes for list filters and sort orders
+
+Revision ID: b51f3e8d27a9
+Revises: e4b7c19a2f63
+Create Date: 2026-10-18 16:05:41.287930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b51f3e8d27a9'
+down_revision = 'e4b7c19a2f63'
+branch_labels = None
+depends_on = None
+
+
+# {表格: [(索引名稱, 欄位), ...]}，與模型的 __table_args__ 一致
+INDEXES = {
+    'accommodations': [
+        ('ix_accommodations_status_created', ['status', 'created_at', 'accommodation_id']),
+        ('ix_accommodations_status_price', ['status', 'rent_price', 'accommodation_id']),
+        ('ix_accommodations_status_distance', ['status', 'distance_to_university', 'accommodation_id']),
+        ('ix_accommodations_created', ['created_at']),
+    ],
+    'accommodation_images': [
+        ('ix_accommodation_images_accommodation', ['accommodation_id', 'image_id']),
+    ],
+    'comments': [
+        ('ix_comments_property_created', ['property_id', 'created_at', 'id']),
+        ('ix_comments_created', ['created_at', 'id']),
+    ],
+    'replies': [
+        ('ix_replies_comment_created', ['comment_id', 'created_at', 'id']),
+    ],
+    'reports': [
+        ('ix_reports_content', ['content_type', 'content_id']),
+        ('ix_reports_reporter_created', ['reporter_id', 'created_at']),
+        ('ix_reports_status_created', ['status', 'created_at', 'id']),
+        ('ix_reports_created', ['created_at', 'id']),
+    ],
+    'sublets': [
+        ('ix_sublets_status_created', ['status', 'created_at', 'sublet_id']),
+        ('ix_sublets_status_price', ['status', 'asking_price', 'sublet_id']),
+        ('ix_sublets_status_available', ['status', 'available_from', 'sublet_id']),
+        ('ix_sublets_poster_created', ['poster_id', 'created_at']),
+        ('ix_sublets_accommodation_status', ['accommodation_id', 'status', 'created_at']),
+        ('ix_sublets_created', ['created_at']),
+    ],
+    'users': [
+        ('ix_users_created', ['created_at', 'user_id']),
+    ],
+}
+
+
+def upgrade():
+    for table_name, indexes in INDEXES.items():
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            for index_name, columns in indexes:
+                batch_op.create_index(index_name, columns, unique=False)
+
+
+def downgrade():
+    for table_name, indexes in INDEXES.items():
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            for index_name, _ in indexes:
+                batch_op.drop_index(index_name)
@@ -0,0 +1,27 @@
+"""add reviews accommodation index
+
+Revision ID: c4e9a2d6b7f1
+Revises: a91e4d7c3b58
+Create Date: 2026-10-18 19:32:17.405126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e9a2d6b7f1'
+down_revision = 'a91e4d7c3b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 依房源查詢評價，管理後台的評價總數也能改用此索引計算
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.create_index('ix_reviews_accommodation', ['accommodation_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.drop_index('ix_reviews_accommodation')
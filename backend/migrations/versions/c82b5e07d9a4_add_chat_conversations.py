@@ -0,0 +1,51 @@
+"""add chat_conversations inbox summary table
+
+Revision ID: c82b5e07d9a4
+Revises: a6d40e8c51f2
+Create Date: 2026-10-18 11:41:07.530912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c82b5e07d9a4'
+down_revision = 'a6d40e8c51f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chat_conversations',
+    sa.Column('conversation_key', sa.String(length=41), nullable=False),
+    sa.Column('user_low', sa.Integer(), nullable=False),
+    sa.Column('user_high', sa.Integer(), nullable=False),
+    sa.Column('last_message', sa.Text(), nullable=True),
+    sa.Column('last_sender_id', sa.Integer(), nullable=True),
+    sa.Column('last_time', sa.DateTime(), nullable=True),
+    sa.Column('unread_low', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('unread_high', sa.Integer(), nullable=False, server_default='0'),
+    sa.PrimaryKeyConstraint('conversation_key')
+    )
+    op.create_index('ix_chat_conversations_low_time', 'chat_conversations', ['user_low', 'last_time'], unique=False)
+    op.create_index('ix_chat_conversations_high_time', 'chat_conversations', ['user_high', 'last_time'], unique=False)
+
+    # 以每組對話的最後一則訊息回填摘要（既有訊息的已讀狀態未知，未讀數從 0 開始）
+    op.execute(
+        "INSERT INTO chat_conversations "
+        "(conversation_key, user_low, user_high, last_message, last_sender_id, last_time, unread_low, unread_high) "
+        "SELECT m.conversation_key, "
+        "CASE WHEN m.sender_id < m.receiver_id THEN m.sender_id ELSE m.receiver_id END, "
+        "CASE WHEN m.sender_id < m.receiver_id THEN m.receiver_id ELSE m.sender_id END, "
+        "m.message, m.sender_id, m.time, 0, 0 "
+        "FROM chat_message m "
+        "JOIN (SELECT conversation_key, MAX(chat_id) AS last_id FROM chat_message "
+        "GROUP BY conversation_key) latest ON m.chat_id = latest.last_id"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_chat_conversations_high_time', table_name='chat_conversations')
+    op.drop_index('ix_chat_conversations_low_time', table_name='chat_conversations')
+    op.drop_table('chat_conversations')
@@ -0,0 +1,26 @@
+"""add version column to accommodations
+
+Revision ID: d3a8f61c4e25
+Revises: b51f3e8d27a9
+Create Date: 2026-10-18 17:20:12.514309
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8f61c4e25'
+down_revision = 'b51f3e8d27a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('accommodations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('accommodations', schema=None) as batch_op:
+        batch_op.drop_column('version')
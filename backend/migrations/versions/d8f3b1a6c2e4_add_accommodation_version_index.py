@@ -0,0 +1,27 @@
+"""add accommodation version index
+
+Revision ID: d8f3b1a6c2e4
+Revises: c4e9a2d6b7f1
+Create Date: 2026-10-18 21:05:42.118604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f3b1a6c2e4'
+down_revision = 'c4e9a2d6b7f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 搜尋與篩選索引定期比對各房源的 version，以覆蓋索引取代全表掃描
+    with op.batch_alter_table('accommodations', schema=None) as batch_op:
+        batch_op.create_index('ix_accommodations_version', ['version'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('accommodations', schema=None) as batch_op:
+        batch_op.drop_index('ix_accommodations_version')
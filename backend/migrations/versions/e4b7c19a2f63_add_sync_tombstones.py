@@ -0,0 +1,31 @@
+"""add sync_tombstones table for incremental snapshots
+
+Revision ID: e4b7c19a2f63
+Revises: 5e1d7a93c0b4
+Create Date: 2026-10-18 14:22:09.604517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c19a2f63'
+down_revision = '5e1d7a93c0b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sync_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('pk', sa.Text(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+
+
+def downgrade():
+    op.drop_table('sync_tombstones')
@@ -0,0 +1,42 @@
+"""add geohash column to accommodations
+
+Revision ID: f6c2b8d1a934
+Revises: d3a8f61c4e25
+Create Date: 2026-10-18 18:02:47.106538
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.geo import encode_geohash
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6c2b8d1a934'
+down_revision = 'd3a8f61c4e25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('accommodations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index('ix_accommodations_status_geohash', ['status', 'geohash'], unique=False)
+
+    # 以現有經緯度回填
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(
+        "SELECT accommodation_id, latitude, longitude FROM accommodations "
+        "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+    )).fetchall()
+    if rows:
+        connection.execute(
+            sa.text("UPDATE accommodations SET geohash = :geohash WHERE accommodation_id = :id"),
+            [{'id': row[0], 'geohash': encode_geohash(float(row[1]), float(row[2]))} for row in rows]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('accommodations', schema=None) as batch_op:
+        batch_op.drop_index('ix_accommodations_status_geohash')
+        batch_op.drop_column('geohash')
@@ -0,0 +1,69 @@
+import os
+import sys
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.extensions import db
+from app.models import (
+    User, Accommodation, AccommodationImage, Comment, Reply, Report, Sublet, Message
+)
+from app.utils.distances import recompute_distances
+
+def seed(count=30):
+    """測試資料：管理員、房東與學生各一位，以及房源、評論、舉報、轉租與聊天訊息"""
+    start = datetime(2025, 5, 1, 12, 0, 0)
+    db.session.add_all([
+        User(username='admin', email='admin@example.com', password_hash='x', user_role='admin'),
+        User(username='landlord', email='landlord@example.com', password_hash='x', user_role='landlord'),
+        User(username='student', email='student@example.com', password_hash='x', user_role='student'),
+    ])
+    db.session.flush()
+
+    for i in range(count):
+        accommodation = Accommodation(
+            owner_id=2, title=f'中央大學旁套房 {i}', description='近後門', property_type='apartment',
+            contact_info='0900000000', rent_price=Decimal(3000 + i * 100), deposit=Decimal(6000),
+            address=f'桃園市中壢區中大路{i}號', city='桃園市', district='中壢區',
+            status='available' if i % 5 else 'pending',
+            latitude=Decimal('24.968') + Decimal(i) / 2000, longitude=Decimal('121.195') - Decimal(i) / 2000,
+            created_at=start + timedelta(hours=i)
+        )
+        db.session.add(accommodation)
+        db.session.flush()
+        db.session.add(AccommodationImage(
+            accommodation_id=accommodation.accommodation_id, image_url=f'/uploads/{i}.jpg', is_primary=True))
+        db.session.add(Sublet(
+            accommodation_id=accommodation.accommodation_id, poster_id=3, title=f'轉租 {i}',
+            asking_price=Decimal(2500 + i * 50), available_from=date(2025, 7, 1) + timedelta(days=i),
+            available_to=date(2026, 6, 30), status='active', is_verified=bool(i % 2),
+            created_at=start + timedelta(hours=i)
+        ))
+
+    for i in range(count):
+        comment = Comment(property_id=1 + i % 3, user_id=3, content=f'評論 {i}', rating=4,
+                          created_at=start + timedelta(hours=i))
+        db.session.add(comment)
+        db.session.flush()
+        db.session.add(Reply(comment_id=comment.id, user_id=2, content='謝謝', created_at=start + timedelta(hours=i)))
+        db.session.add(Report(reporter_id=3, content_type='comment', content_id=comment.id, reasons='spam',
+                              created_at=start + timedelta(hours=i)))
+        db.session.add(Message(sender_id=1 + i % 2, receiver_id=2 - i % 2, message=f'訊息 {i}',
+                               time=start + timedelta(minutes=i)))
+    db.session.commit()
+    recompute_distances()
+
+@pytest.fixture(scope='module')
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        seed()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
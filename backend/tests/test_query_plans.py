@@ -0,0 +1,128 @@
+"""
+各 API 主要查詢的 SQLite 查詢計畫不得有全表掃描
+
+實際呼叫端點並記錄送出的 SELECT（游標分頁同時檢查第一頁與帶游標的下一頁），
+再以 EXPLAIN QUERY PLAN 確認沒有未使用索引的 SCAN <資料表>。
+"""
+from urllib.parse import urlencode, urlsplit, parse_qsl, urlunsplit
+
+import pytest
+from sqlalchemy import event # type: ignore
+from flask_jwt_extended import create_access_token # type: ignore
+
+from app.extensions import db
+from app.utils.facets import get_facet_index
+from app.utils.search import get_search_index
+
+# (請求, 登入的用戶)，游標分頁的請求會再以回傳的游標取下一頁
+HOT_PATHS = [
+    ('GET /api/accommodations', None),
+    ('GET /api/accommodations?sort_by=price_low', None),
+    ('GET /api/accommodations?sort_by=price_high', None),
+    ('GET /api/accommodations?sort_by=distance', None),
+    ('GET /api/accommodations?sort_by=distance_library', None),
+    ('GET /api/accommodations?sort_by=newest&cursor=&per_page=5', None),
+    ('GET /api/accommodations?sort_by=price_low&cursor=&per_page=5', None),
+    ('GET /api/accommodations?sort_by=price_high&cursor=&per_page=5', None),
+    ('GET /api/accommodations?sort_by=distance&cursor=&per_page=5', None),
+    ('GET /api/accommodations/filter?sort_by=distance', None),
+    ('GET /api/accommodations/search?q=套房', None),
+    ('GET /api/accommodations/geo?bbox=24.96,121.18,24.99,121.21', None),
+    ('GET /api/accommodations/geo?radius=2000&zoom=15', None),
+    ('GET /api/accommodations/2', None),
+    ('GET /api/accommodations/1/sublets', None),
+    ('GET /api/accommodations/favorites', 3),
+    ('GET /api/comments/property/1', None),
+    ('GET /api/comments/property/1?cursor=&per_page=3', None),
+    ('GET /api/comments/1/replies', None),
+    ('POST /api/comments/1/like', 3),
+    ('GET /api/comments/reports', 3),
+    ('GET /api/sublets', None),
+    ('GET /api/sublets?sort_by=price_low&cursor=&per_page=5', None),
+    ('GET /api/sublets?sort_by=price_high&cursor=&per_page=5', None),
+    ('GET /api/sublets?sort_by=date_asc&cursor=&per_page=5', None),
+    ('GET /api/sublets?sort_by=date_desc&cursor=&per_page=5', None),
+    ('GET /api/sublets?sort_by=created_at&cursor=&per_page=5', None),
+    ('GET /api/users/sublets', 3),
+    ('GET /api/sublets/admin?status=active', 1),
+    ('GET /api/chat/history?sender_id=1&receiver_id=2&limit=5', 1),
+    ('GET /api/chat/conversations', 1),
+    ('GET /api/admin/dashboard', 1),
+    ('GET /api/admin/users?cursor=&per_page=2', 1),
+    ('GET /api/admin/reports?status=pending&cursor=&per_page=5', 1),
+    ('GET /api/admin/reports?cursor=&per_page=5', 1),
+    ('GET /api/admin/comments', 1),
+    ('GET /api/admin/comments?include_relations=true', 1),
+]
+
+def next_page_url(url, body):
+    """以回應中的游標組出下一頁的網址，沒有下一頁時回傳 None"""
+    if not isinstance(body, dict):
+        return None
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    if body.get('next_cursor') and 'cursor' in query:
+        query['cursor'] = body['next_cursor']
+    elif body.get('next_before') and '/chat/history' in parts.path:
+        query['before'] = body['next_before']
+    else:
+        return None
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def full_scans(plan, table_names):
+    """查詢計畫中沒有使用索引的 SCAN <資料表>"""
+    scans = []
+    for row in plan:
+        words = row[-1].split()
+        if len(words) >= 2 and words[0] == 'SCAN' and words[1] in table_names and 'USING' not in words:
+            scans.append(row[-1])
+    return scans
+
+@pytest.fixture(scope='module')
+def indexes(app):
+    """搜尋與篩選索引在啟動時一次載入整張表，不屬於每個請求的查詢"""
+    with app.app_context():
+        get_search_index()
+        get_facet_index()
+
+@pytest.mark.parametrize('request_line,user_id', HOT_PATHS)
+def test_hot_path_uses_indexes(app, indexes, request_line, user_id):
+    method, url = request_line.split(' ', 1)
+    client = app.test_client()
+    headers = {}
+    if user_id is not None:
+        # 部分端點以 session 驗證，轉租相關端點以 JWT 驗證
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+        with app.app_context():
+            headers['Authorization'] = f'Bearer {create_access_token(identity=str(user_id))}'
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.open(url, method=method, headers=headers)
+        assert response.status_code < 400, response.get_data(as_text=True)
+        next_url = next_page_url(url, response.get_json(silent=True))
+        if next_url:
+            response = client.open(next_url, method=method, headers=headers)
+            assert response.status_code < 400, response.get_data(as_text=True)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert statements
+    with app.app_context():
+        table_names = set(db.metadata.tables)
+        connection = db.session.connection()
+        scans = {
+            statement: full_scans(connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall(),
+                                  table_names)
+            for statement, parameters in statements
+        }
+    assert not {statement: found for statement, found in scans.items() if found}
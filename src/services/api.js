@@ -235,6 +235,11 @@ export const apiService = {
   accommodations: {
     getAccommodations: () => apiService.get("/api/accommodations"),
     getById: (id) => apiService.get(`/api/accommodations/${id}`),
+    // 地圖查詢：{ bbox: "south,west,north,east" } 或 { radius }，指定 zoom 時回傳分群結果
+    getGeo: (params = {}) => {
+      const queryString = new URLSearchParams(params).toString();
+      return apiService.get(`/api/accommodations/geo?${queryString}`);
+    },
     create: (data) => apiService.post("/api/accommodations", data),
     update: (id, data) => apiService.put(`/api/accommodations/${id}`, data),
     delete: (id) => apiService.delete(`/api/accommodations/${id}`),
@@ -419,7 +419,7 @@ export default {
             commentId,
             data: {
               likes: response.likes,
-              likedBy: response.likedBy,
+              isLiked: response.isLiked,
             },
           });
         }
@@ -461,7 +461,7 @@ export default {
           replyId,
           data: {
             like_count: response.like_count,
-            likes: response.likes,
+            isLiked: response.isLiked,
           },
         });
 